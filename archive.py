@@ -0,0 +1,232 @@
+"""
+Cold storage for old habit completions.
+
+HabitTracker.archive_completions moves completions older than a horizon out of the hot
+habit_completions table into a separate archive database (habit_completions_archive.db). Rows are
+stored as zlib-compressed JSON blocks, one or more per habit per month, and blocks are only ever
+appended or dropped with their habit. Alongside the blocks the archive keeps per-habit daily
+rollups (completion count and total duration), so totals and statistics stay correct without
+decompressing anything.
+
+Reads go through CompletionArchive.read, which only decompresses blocks overlapping the requested
+date range. HabitTracker.get_completions calls it automatically when a range reaches back past
+the archive horizon.
+"""
+import json
+import os
+import sqlite3
+import zlib
+
+import storage
+import timestamps
+from timestamps import to_epoch
+
+ARCHIVE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS archive_blocks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    habit_id INTEGER NOT NULL,
+    start_time INTEGER NOT NULL,
+    end_time INTEGER NOT NULL,
+    row_count INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_archive_blocks_habit_time ON archive_blocks (habit_id, start_time, end_time);
+
+CREATE TABLE IF NOT EXISTS completion_rollups (
+    habit_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    completions INTEGER NOT NULL,
+    total_duration INTEGER NOT NULL,
+    PRIMARY KEY (habit_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS archive_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+'''
+
+# Archives written before timestamps became epoch seconds hold ISO strings here
+ARCHIVE_TIMESTAMP_COLUMNS = {
+    'archive_blocks': ['start_time', 'end_time'],
+    'archive_meta': ['value'],
+}
+
+
+def encode_block(columns, rows):
+    """Compress a list of row tuples into a block payload."""
+    return zlib.compress(json.dumps({'columns': columns, 'rows': rows}).encode("utf-8"), 9)
+
+
+def decode_block(payload):
+    """Expand a block payload into a list of row dicts."""
+    data = json.loads(zlib.decompress(payload))
+    columns = data['columns']
+    rows = [dict(zip(columns, row)) for row in data['rows']]
+    # Blocks are never rewritten, so older ones still carry ISO strings
+    if rows and not isinstance(rows[0]['completion_time'], int):
+        for row in rows:
+            row['completion_time'] = to_epoch(row['completion_time'])
+    return rows
+
+
+class CompletionArchive:
+    """
+    Access to the archive database.
+
+    Args:
+        db_file (str): Path of the archive database
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+
+    def exists(self):
+        """Whether anything has been archived yet (reads skip the archive entirely otherwise)."""
+        return os.path.exists(self.db_file)
+
+    def ensure_schema(self):
+        """Create the archive database and its tables if needed."""
+        conn = storage.connect(self.db_file)
+        try:
+            conn.executescript(ARCHIVE_SCHEMA)
+            timestamps.migrate_columns(conn, ARCHIVE_TIMESTAMP_COLUMNS, 1)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def write_rows(self, cursor, columns, rows, schema_name="archive"):
+        """
+        Append rows as compressed blocks and update the rollups.
+
+        Runs on the caller's cursor (with the archive attached) so archiving and deleting the hot
+        rows commit together.
+
+        Args:
+            cursor: Cursor with the archive database attached as schema_name
+            columns (list): Column names of the rows
+            rows (list): Row tuples sorted by habit_id, then completion_time (epoch seconds)
+        """
+        habit_index = columns.index('habit_id')
+        time_index = columns.index('completion_time')
+        duration_index = columns.index('duration_seconds')
+
+        # One block per habit per (local) month, rollups per local day
+        blocks = {}
+        rollups = {}
+        for row in rows:
+            habit_id = row[habit_index]
+            day = timestamps.local_date(row[time_index])
+            blocks.setdefault((habit_id, day[:7]), []).append(row)
+
+            day_key = (habit_id, day)
+            count, duration = rollups.get(day_key, (0, 0))
+            rollups[day_key] = (count + 1, duration + (row[duration_index] or 0))
+
+        cursor.executemany(f'''
+        INSERT INTO {schema_name}.archive_blocks (habit_id, start_time, end_time, row_count, payload)
+        VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (habit_id, block_rows[0][time_index], block_rows[-1][time_index], len(block_rows),
+             encode_block(columns, [list(row) for row in block_rows]))
+            for (habit_id, month), block_rows in blocks.items()
+        ])
+
+        cursor.executemany(f'''
+        INSERT INTO {schema_name}.completion_rollups (habit_id, day, completions, total_duration)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (habit_id, day) DO UPDATE SET
+            completions = completions + excluded.completions,
+            total_duration = total_duration + excluded.total_duration
+        ''', [(habit_id, day, count, duration) for (habit_id, day), (count, duration) in rollups.items()])
+
+        latest = max(row[time_index] for row in rows)
+        cursor.execute(f'''
+        INSERT INTO {schema_name}.archive_meta (key, value) VALUES ('archived_until', ?)
+        ON CONFLICT (key) DO UPDATE SET value = MAX(CAST(value AS INTEGER), excluded.value)
+        ''', (latest,))
+
+    def archived_until(self):
+        """Latest completion_time (epoch seconds) held in the archive, or None if it is empty."""
+        if not self.exists():
+            return None
+        conn = storage.connect(self.db_file)
+        try:
+            row = conn.execute("SELECT value FROM archive_meta WHERE key = 'archived_until'").fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        conn.close()
+        return to_epoch(row[0]) if row else None
+
+    def read(self, habit_id=None, start_date=None, end_date=None):
+        """
+        Read archived completions, decompressing only blocks that overlap the range.
+
+        Args:
+            habit_id (int, optional): Only this habit's completions
+            start_date (int, optional): Inclusive lower bound on completion_time (epoch seconds)
+            end_date (int, optional): Inclusive upper bound on completion_time (epoch seconds)
+
+        Returns:
+            list: Completion dicts, in no particular order
+        """
+        if not self.exists():
+            return []
+
+        query = "SELECT payload FROM archive_blocks WHERE 1 = 1"
+        params = []
+        if habit_id is not None:
+            query += " AND habit_id = ?"
+            params.append(habit_id)
+        if start_date is not None:
+            query += " AND end_time >= ?"
+            params.append(start_date)
+        if end_date is not None:
+            query += " AND start_time <= ?"
+            params.append(end_date)
+
+        conn = storage.connect(self.db_file)
+        payloads = [row[0] for row in conn.execute(query, params)]
+        conn.close()
+
+        results = []
+        for payload in payloads:
+            for row in decode_block(payload):
+                if start_date is not None and row['completion_time'] < start_date:
+                    continue
+                if end_date is not None and row['completion_time'] > end_date:
+                    continue
+                results.append(row)
+        return results
+
+    def get_rollup_totals(self):
+        """
+        Get archived completion totals per habit from the rollups.
+
+        Returns:
+            dict: habit_id -> (completion count, total duration in seconds)
+        """
+        if not self.exists():
+            return {}
+        conn = storage.connect(self.db_file)
+        totals = {
+            habit_id: (count, duration)
+            for habit_id, count, duration in conn.execute(
+                "SELECT habit_id, SUM(completions), SUM(total_duration) FROM completion_rollups GROUP BY habit_id"
+            )
+        }
+        conn.close()
+        return totals
+
+    def delete_habit(self, habit_id):
+        """Drop a deleted habit's blocks and rollups."""
+        if not self.exists():
+            return
+        conn = storage.connect(self.db_file)
+        try:
+            conn.execute("DELETE FROM archive_blocks WHERE habit_id = ?", (habit_id,))
+            conn.execute("DELETE FROM completion_rollups WHERE habit_id = ?", (habit_id,))
+            conn.commit()
+        finally:
+            conn.close()
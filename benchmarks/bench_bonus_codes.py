@@ -0,0 +1,85 @@
+"""
+Benchmark for bonus code generation and redemption.
+
+Generates a large batch of unique codes, then measures redemptions per second, both from one
+thread and from several threads racing to redeem the same codes (which also checks that no code
+is ever redeemed twice).
+
+Run with:
+    python benchmarks/bench_bonus_codes.py --codes 100000 --redemptions 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import HabitTracker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark bonus code generation and redemption.")
+    parser.add_argument("--codes", type=int, default=100000)
+    parser.add_argument("--redemptions", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    tracker = HabitTracker(data_dir=tempfile.mkdtemp(prefix="habit_bench_"))
+    tracker.enable_wal()
+    habit = tracker.add_habit("Benchmark habit", "daily", 1)
+
+    start = time.perf_counter()
+    codes = tracker.generate_bonus_codes(args.codes, 0.10)
+    elapsed = time.perf_counter() - start
+    print(f"generated {len(codes):,} codes in {elapsed:.2f}s ({len(codes) / elapsed:,.0f} codes/s)")
+    if len(set(codes)) != args.codes:
+        print("FAILED: generated codes are not unique")
+        return 1
+
+    start = time.perf_counter()
+    next_code = tracker.get_next_bonus_code()
+    print(f"get_next_bonus_code: {(time.perf_counter() - start) * 1000:.2f} ms ({next_code['code']})")
+
+    # Single-threaded redemptions
+    single = codes[:args.redemptions]
+    start = time.perf_counter()
+    for code in single:
+        tracker.use_bonus_code(code, habit_id=habit['id'])
+    elapsed = time.perf_counter() - start
+    print(f"single thread: {len(single) / elapsed:,.0f} redemptions/s")
+
+    # Several threads all trying to redeem the same codes
+    contested = codes[args.redemptions:args.redemptions * 2]
+    successes = []
+    lock = threading.Lock()
+
+    def redeem_all():
+        local = 0
+        for code in contested:
+            if tracker.use_bonus_code(code, habit_id=habit['id'])['success']:
+                local += 1
+        with lock:
+            successes.append(local)
+
+    threads = [threading.Thread(target=redeem_all) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    attempts = len(contested) * args.threads
+    print(f"{args.threads} threads racing: {attempts / elapsed:,.0f} attempts/s, "
+          f"{sum(successes):,} successful redemptions of {len(contested):,} codes")
+
+    if sum(successes) != len(contested):
+        print("FAILED: a code was redeemed more than once or not at all")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
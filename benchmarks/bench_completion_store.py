@@ -0,0 +1,63 @@
+"""
+Benchmark for the compact completion store.
+
+Fills a completions database, then compares load time and memory of get_all_completions (one
+dict per row) with get_completion_columns (array columns).
+
+Run with:
+    python benchmarks/bench_completion_store.py --completions 1000000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import HabitTracker
+
+
+def measure(label, func):
+    """Run func, printing its duration and peak memory; returns its result."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label}: {elapsed:.2f}s, {current / 1e6:,.1f} MB retained, {peak / 1e6:,.1f} MB peak")
+    return result, current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the compact completion store.")
+    parser.add_argument("--completions", type=int, default=1000000)
+    parser.add_argument("--habits", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    tracker = HabitTracker(data_dir=tempfile.mkdtemp(prefix="habit_bench_"))
+    habit_ids = [tracker.add_habit(f"Habit {i}", "daily", 1)['id'] for i in range(args.habits)]
+
+    start_time = int(time.time()) - args.completions * 60
+    conn = sqlite3.connect(tracker.completions_db_file)
+    conn.executemany(
+        "INSERT INTO habit_completions (habit_id, completion_time, duration_seconds, notes) VALUES (?, ?, ?, ?)",
+        ((habit_ids[i % args.habits], start_time + i * 60, 60, "")
+         for i in range(args.completions))
+    )
+    conn.commit()
+    conn.close()
+    print(f"{args.completions:,} completions across {args.habits} habits")
+
+    dicts, dict_bytes = measure("get_all_completions", tracker.get_all_completions)
+    del dicts
+    columns, column_bytes = measure("get_completion_columns", tracker.get_completion_columns)
+    print(f"{len(columns):,} rows, {dict_bytes / max(column_bytes, 1):.1f}x less memory")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Benchmark for encrypted-at-rest storage against plaintext.
+
+Creates two stores with the same --habits habits, one plaintext and one converted with
+storage.encrypt_data_dir, then times the same work on both:
+
+    open        a connection plus its first query (plaintext, cached raw key, passphrase per open)
+    complete    record_completion, one transaction per call as the app does it
+    bulk        record_completions with --bulk rows in one executemany
+    habits      get_habits
+    history     get_all_completions over everything recorded above
+
+Needs the sqlite3 module to run on SQLCipher (see storage.py).
+
+Run with:
+    python benchmarks/bench_encryption.py --habits 1000 --bulk 10000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+from main import HabitTracker
+
+PASSPHRASE = "benchmark passphrase"
+
+
+def seed_tracker(habits, encrypted):
+    """Create a store with `habits` habits, encrypted or not."""
+    data_dir = tempfile.mkdtemp(prefix="habit_bench_encryption_")
+    tracker = HabitTracker(data_dir=data_dir)
+    now = int(time.time())
+    conn = storage.connect(tracker.habits_db_file)
+    conn.executemany(
+        "INSERT INTO habits (name, description, frequency_type, frequency_count, duration_seconds, created_at) "
+        "VALUES (?, '', 'daily', 1, 0, ?)",
+        ((f"Habit {i}", now) for i in range(habits))
+    )
+    conn.commit()
+    conn.close()
+    if encrypted:
+        storage.encrypt_data_dir(data_dir, PASSPHRASE)
+    return tracker
+
+
+def median_us(func, runs):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1e6
+
+
+def open_with_passphrase(db_file):
+    """What a connection costs when SQLCipher derives the key itself (PBKDF2) on every open."""
+    conn = sqlite3.connect(db_file)
+    conn.execute(f"PRAGMA key = '{PASSPHRASE}'")
+    conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+    conn.close()
+
+
+def open_cached(db_file):
+    conn = storage.connect(db_file)
+    conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+    conn.close()
+
+
+def run(tracker, args, rng):
+    """Time every operation on one store; returns {operation: microseconds}."""
+    habit_ids = [habit['id'] for habit in tracker.get_habits()]
+    results = {'open': median_us(lambda: open_cached(tracker.habits_db_file), args.runs)}
+    results['complete'] = median_us(lambda: tracker.record_completion(rng.choice(habit_ids)), args.runs)
+
+    completions = [{'habit_id': rng.choice(habit_ids), 'notes': f"note {i}"} for i in range(args.bulk)]
+    start = time.perf_counter()
+    tracker.record_completions(completions)
+    results['bulk'] = (time.perf_counter() - start) * 1e6
+
+    results['habits'] = median_us(tracker.get_habits, max(args.runs // 10, 1))
+    results['history'] = median_us(tracker.get_all_completions, max(args.runs // 10, 1))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark encrypted storage against plaintext.")
+    parser.add_argument("--habits", type=int, default=1000)
+    parser.add_argument("--bulk", type=int, default=10_000, help="Rows recorded by one record_completions call")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    if not storage.supported():
+        print("The sqlite3 module isn't built with SQLCipher; nothing to compare.")
+        return 1
+
+    plaintext = run(seed_tracker(args.habits, encrypted=False), args, random.Random(args.seed))
+    encrypted_tracker = seed_tracker(args.habits, encrypted=True)
+    encrypted = run(encrypted_tracker, args, random.Random(args.seed))
+
+    for name, unit in (("open", "per connection"), ("complete", "per call"), ("bulk", f"per {args.bulk:,} rows"),
+                       ("habits", "per call"), ("history", "per call")):
+        overhead = (encrypted[name] / plaintext[name] - 1) * 100
+        print(f"{name:<9} {plaintext[name]:12.1f} us plaintext  {encrypted[name]:12.1f} us encrypted"
+              f"  ({overhead:+.0f}%)  {unit}")
+    print(f"per row   {plaintext['bulk'] / args.bulk:12.2f} us plaintext  {encrypted['bulk'] / args.bulk:12.2f} us encrypted")
+
+    runs = max(args.runs // 20, 1)
+    print(f"open with passphrase  {median_us(lambda: open_with_passphrase(encrypted_tracker.habits_db_file), runs):12.1f} us"
+          f"  (SQLCipher key derivation on every open, which the cached key skips)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
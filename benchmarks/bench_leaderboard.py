@@ -0,0 +1,106 @@
+"""
+Benchmark for leaderboard queries.
+
+Seeds a fresh store with --habits habits (random streaks and reward balances from a fixed seed),
+then compares the in-memory leaderboard (leaderboard.py) with the equivalent SQL on the indexed
+habits table:
+
+    load      building both boards from their index scans
+    rank      a habit's rank (SQL: COUNT of habits with a higher value)
+    page      a 20-entry page at a random offset (SQL: ORDER BY ... LIMIT ... OFFSET)
+    update    changing one habit's value (in memory only; the SQL side has nothing to maintain)
+
+Run with:
+    python benchmarks/bench_leaderboard.py --habits 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import leaderboard
+from main import HabitTracker
+
+PAGE_SIZE = 20
+
+
+def seed_tracker(habits, seed):
+    """Create a store with `habits` habits."""
+    rng = random.Random(seed)
+    tracker = HabitTracker(data_dir=tempfile.mkdtemp(prefix="habit_bench_leaderboard_"))
+    now = int(time.time())
+
+    conn = sqlite3.connect(tracker.habits_db_file)
+    conn.executemany(
+        "INSERT INTO habits (name, description, frequency_type, frequency_count, duration_seconds, created_at, streak, reward_balance) "
+        "VALUES (?, '', 'daily', 1, 0, ?, ?, ?)",
+        ((f"Habit {i}", now, int(rng.expovariate(1 / 10)), round(rng.uniform(0, 50), 2)) for i in range(habits))
+    )
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return tracker
+
+
+def median_us(func, runs):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark leaderboard rank and page queries.")
+    parser.add_argument("--habits", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--metric", default="streak", choices=leaderboard.METRICS)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    tracker = seed_tracker(args.habits, args.seed)
+    rng = random.Random(args.seed)
+    metric = args.metric
+
+    start = time.perf_counter()
+    boards = tracker._leaderboards()
+    print(f"load     {(time.perf_counter() - start) * 1000:10.1f} ms  ({args.habits:,} habits, both boards)")
+    board = boards.boards[metric]
+
+    conn = sqlite3.connect(tracker.habits_db_file)
+
+    def sql_rank():
+        habit_id = rng.randint(1, args.habits)
+        conn.execute(f"SELECT COUNT(*) + 1 FROM habits WHERE {metric} > (SELECT {metric} FROM habits WHERE id = ?)",
+                     (habit_id,)).fetchone()
+
+    def sql_page():
+        conn.execute(f"SELECT id, name, {metric} FROM habits ORDER BY {metric} DESC, id LIMIT ? OFFSET ?",
+                     (PAGE_SIZE, rng.randrange(args.habits))).fetchall()
+
+    def memory_update():
+        board.set(rng.randint(1, args.habits), int(rng.expovariate(1 / 10)))
+
+    results = [
+        ("rank", lambda: board.rank(rng.randint(1, args.habits)), sql_rank),
+        ("page", lambda: board.top(PAGE_SIZE, rng.randrange(args.habits)), sql_page),
+        ("update", memory_update, None),
+    ]
+    for name, memory, sql in results:
+        line = f"{name:<8} {median_us(memory, args.runs):10.1f} us in memory"
+        if sql is not None:
+            line += f"   {median_us(sql, args.runs):10.1f} us in SQL"
+        print(line)
+    conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Benchmark for the milestone particle simulation.
+
+Emits one burst per particle count and times each frame's simulation step plus vertex array
+build (the CPU work ParticleSystem does per frame), until every particle has died. Runs the
+NumPy implementation when NumPy is installed and the plain-Python one always.
+
+Run with:
+    python benchmarks/bench_particles.py --counts 1000,5000,16000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import particles
+from particles import ParticleField
+
+FRAME_BUDGET = 1 / 60
+
+
+def run_burst(count, use_numpy, seed):
+    """Per-frame CPU times (seconds) of one burst of count particles at a fixed 60 fps step."""
+    field = ParticleField(count, seed=seed, use_numpy=use_numpy)
+    field.emit(200, 300, count)
+    field.indices()
+    frame_times = []
+    while True:
+        start = time.perf_counter()
+        alive = field.step(FRAME_BUDGET)
+        field.vertices()
+        frame_times.append(time.perf_counter() - start)
+        if not alive:
+            return frame_times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the milestone particle simulation.")
+    parser.add_argument("--counts", default="1000,5000,16000", help="Comma-separated particle counts")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    implementations = [('python', False)]
+    if particles.numpy is not None:
+        implementations.insert(0, ('numpy', True))
+    else:
+        print("NumPy is not installed; timing the plain-Python implementation only")
+
+    for count in (int(count) for count in args.counts.split(",")):
+        for label, use_numpy in implementations:
+            frame_times = sorted(run_burst(count, use_numpy, args.seed))
+            over = sum(1 for frame in frame_times if frame > FRAME_BUDGET)
+            print(f"{count:>7,} particles  {label:<7} median {statistics.median(frame_times) * 1000:7.2f} ms  "
+                  f"p95 {frame_times[int(len(frame_times) * 0.95)] * 1000:7.2f} ms  "
+                  f"max {frame_times[-1] * 1000:7.2f} ms  ({over}/{len(frame_times)} frames over 16.7 ms)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Benchmark for raffle draws over a large local store.
+
+Seeds a fresh store with --entrants habits (random streaks and reward balances from a fixed seed),
+then times:
+
+    load      the entrant query (raffle.load_entrants)
+    build     AliasTable and FenwickTree construction
+    draws     --draws draws with replacement (alias table) and without (Fenwick tree)
+    baseline  the same draws with random.choices, which rebuilds its cumulative weights per call
+
+and checks that the same seed gives the same winners twice.
+
+Run with:
+    python benchmarks/bench_raffle.py --entrants 1000000 --draws 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import raffle
+from main import HabitTracker
+
+FREQUENCIES = ['daily', 'weekly', 'monthly', 'yearly']
+
+
+def seed_tracker(entrants, seed):
+    """Create a store with `entrants` habits."""
+    rng = random.Random(seed)
+    tracker = HabitTracker(data_dir=tempfile.mkdtemp(prefix="habit_bench_raffle_"))
+    now = int(time.time())
+
+    conn = sqlite3.connect(tracker.habits_db_file)
+    conn.executemany(
+        "INSERT INTO habits (name, description, frequency_type, frequency_count, duration_seconds, created_at, streak, reward_balance) "
+        "VALUES (?, '', ?, 1, 0, ?, ?, ?)",
+        ((f"Habit {i}", rng.choice(FREQUENCIES), now, int(rng.expovariate(1 / 10)), round(rng.uniform(0, 50), 2))
+         for i in range(entrants))
+    )
+    conn.commit()
+    conn.close()
+    return tracker
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark weighted raffle draws.")
+    parser.add_argument("--entrants", type=int, default=1_000_000)
+    parser.add_argument("--draws", type=int, default=100_000)
+    parser.add_argument("--baseline-draws", type=int, default=20, help="random.choices calls to time (each is O(n))")
+    parser.add_argument("--weight-by", default="streak", choices=sorted(raffle.WEIGHT_SQL))
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    tracker, seconds = timed(lambda: seed_tracker(args.entrants, args.seed))
+    print(f"seeded {args.entrants:,} habits in {seconds:.1f} s")
+
+    conn = sqlite3.connect(tracker.habits_db_file)
+    (habit_ids, weights), seconds = timed(lambda: raffle.load_entrants(conn.cursor(), args.weight_by))
+    conn.close()
+    print(f"load       {seconds * 1000:9.1f} ms  ({len(habit_ids):,} entrants with weight > 0)")
+
+    table, seconds = timed(lambda: raffle.AliasTable(weights))
+    print(f"alias      {seconds * 1000:9.1f} ms  build")
+    tree, seconds = timed(lambda: raffle.FenwickTree(weights))
+    print(f"fenwick    {seconds * 1000:9.1f} ms  build")
+
+    rng = random.Random(args.seed)
+    _, seconds = timed(lambda: [table.sample(rng) for _ in range(args.draws)])
+    print(f"alias      {seconds / args.draws * 1e6:9.2f} us  per draw with replacement")
+
+    rng = random.Random(args.seed)
+
+    def draw_unique():
+        for _ in range(args.draws):
+            index = tree.sample(rng)
+            tree.update(index, 0)
+
+    _, seconds = timed(draw_unique)
+    print(f"fenwick    {seconds / args.draws * 1e6:9.2f} us  per draw without replacement (sample + update)")
+
+    rng = random.Random(args.seed)
+    _, seconds = timed(lambda: [rng.choices(habit_ids, weights) for _ in range(args.baseline_draws)])
+    print(f"baseline   {seconds / args.baseline_draws * 1e6:9.2f} us  per random.choices draw")
+
+    first = tracker.run_raffle(10, weight_by=args.weight_by, seed=args.seed)
+    second = tracker.run_raffle(10, weight_by=args.weight_by, seed=args.seed)
+    print(f"reproducible: {first['winners'] == second['winners']} (seed {args.seed}: {first['winners'][:5]}...)")
+    return 0 if first['winners'] == second['winners'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
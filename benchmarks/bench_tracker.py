@@ -0,0 +1,205 @@
+"""
+Benchmark suite for the HabitTracker hot paths.
+
+For each database size, a fresh store is seeded with synthetic data (size habits, 10 completions
+per habit and size unused bonus codes, generated from a fixed seed), and then each operation is
+timed:
+
+    add_habit, get_habits, get_habit, record_completion, get_completions,
+    get_all_completions, use_bonus_code, delete_habit
+
+Each operation runs until it has used --min-time seconds (at least --min-runs and at most
+--max-runs calls). Its latency percentiles and throughput are reported. Results are written as
+JSON, and comparing against an earlier result fails the run when an operation's median latency got
+more than --threshold slower.
+
+Run with:
+    python benchmarks/bench_tracker.py --sizes 100,1000,10000 --output results.json
+    python benchmarks/bench_tracker.py --baseline results.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import HabitTracker
+
+COMPLETIONS_PER_HABIT = 10
+FREQUENCIES = ['daily', 'weekly', 'monthly', 'yearly']
+
+
+def seed_tracker(size, seed):
+    """Create a store with `size` habits, 10 completions per habit and `size` unused bonus codes."""
+    rng = random.Random(seed)
+    tracker = HabitTracker(data_dir=tempfile.mkdtemp(prefix=f"habit_bench_{size}_"))
+    now = int(time.time())
+
+    conn = sqlite3.connect(tracker.habits_db_file)
+    conn.executemany(
+        "INSERT INTO habits (name, description, frequency_type, frequency_count, duration_seconds, created_at, streak) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(f"Habit {i}", "", rng.choice(FREQUENCIES), rng.randint(1, 3), rng.randint(0, 3600),
+          now - rng.randint(0, 365 * 86400), rng.randint(1, 30)) for i in range(size)]
+    )
+    habit_ids = [row[0] for row in conn.execute("SELECT id FROM habits ORDER BY id")]
+    conn.executemany(
+        "INSERT INTO preferred_times (habit_id, time) VALUES (?, ?)",
+        [(habit_id, f"{rng.randint(0, 23):02d}:{rng.choice(['00', '30'])}") for habit_id in habit_ids]
+    )
+    conn.executemany(
+        "INSERT INTO bonus_codes (code, value, description, created_at, used) VALUES (?, ?, '', ?, 0)",
+        [(f"BENCH{i:08d}", 0.1, now) for i in range(size)]
+    )
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(tracker.completions_db_file)
+    conn.executemany(
+        "INSERT INTO habit_completions (habit_id, completion_time, duration_seconds, notes) VALUES (?, ?, ?, '')",
+        [(habit_id, now - rng.randint(0, 365 * 86400), rng.randint(0, 3600))
+         for habit_id in habit_ids for _ in range(COMPLETIONS_PER_HABIT)]
+    )
+    conn.commit()
+    conn.close()
+
+    return tracker, habit_ids
+
+
+def operations(tracker, habit_ids, size, rng):
+    """The benchmarked operations, each a zero-argument callable; later ones may consume data."""
+    counter = iter(range(10 ** 9))
+    codes = iter(f"BENCH{i:08d}" for i in range(size))
+    # Deleting walks the seeded habits from the end so the other operations keep valid IDs
+    doomed = iter(reversed(habit_ids))
+
+    return [
+        ('add_habit', lambda: tracker.add_habit(f"Bench habit {next(counter)}", "daily", 1, 60, ["08:00"])),
+        ('get_habits', tracker.get_habits),
+        ('get_habit', lambda: tracker.get_habit(rng.choice(habit_ids))),
+        ('record_completion', lambda: tracker.record_completion(rng.choice(habit_ids))),
+        ('get_completions', lambda: tracker.get_completions(rng.choice(habit_ids))),
+        ('get_all_completions', tracker.get_all_completions),
+        ('use_bonus_code', lambda: tracker.use_bonus_code(next(codes), habit_id=rng.choice(habit_ids))),
+        ('delete_habit', lambda: tracker.delete_habit(next(doomed))),
+    ]
+
+
+def time_operation(func, min_time, min_runs, max_runs):
+    """Call func repeatedly, returning the latencies in seconds."""
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < max_runs and (len(latencies) < min_runs or time.perf_counter() - started < min_time):
+        start = time.perf_counter()
+        try:
+            func()
+        except StopIteration:
+            # Ran out of seeded codes or habits to consume
+            break
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(latencies):
+    """Latency percentiles in milliseconds plus throughput."""
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {
+        'runs': len(ordered),
+        'median_ms': round(statistics.median(ordered) * 1000, 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+        'ops_per_second': round(len(ordered) / total, 1) if total else None,
+    }
+
+
+def run_suite(sizes, seed=1234, min_time=0.5, min_runs=5, max_runs=1000):
+    """Run every operation against each size and return the JSON-serializable results."""
+    results = {
+        'created_at': int(time.time()),
+        'environment': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        },
+        'seed': seed,
+        'sizes': {},
+    }
+
+    for size in sizes:
+        tracker, habit_ids = seed_tracker(size, seed)
+        rng = random.Random(seed)
+        size_results = {}
+        for name, func in operations(tracker, habit_ids, size, rng):
+            latencies = time_operation(func, min_time, min_runs, min(max_runs, size))
+            if latencies:
+                size_results[name] = summarize(latencies)
+                print(f"size {size:>7,}  {name:<20} median {size_results[name]['median_ms']:>9.3f} ms  "
+                      f"p95 {size_results[name]['p95_ms']:>9.3f} ms  {size_results[name]['ops_per_second']:>10,.1f} ops/s")
+        results['sizes'][str(size)] = size_results
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Find operations whose median latency regressed by more than threshold (0.25 = 25%).
+
+    Returns:
+        list: Human-readable regression descriptions
+    """
+    regressions = []
+    for size, operations_results in results['sizes'].items():
+        for name, current in operations_results.items():
+            previous = baseline.get('sizes', {}).get(size, {}).get(name)
+            if not previous or not previous['median_ms']:
+                continue
+            change = current['median_ms'] / previous['median_ms'] - 1
+            if change > threshold:
+                regressions.append(f"size {size} {name}: {previous['median_ms']:.3f} ms -> "
+                                   f"{current['median_ms']:.3f} ms (+{change:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the HabitTracker hot paths.")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Comma-separated numbers of habits to seed")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to spend on each operation")
+    parser.add_argument("--min-runs", type=int, default=5)
+    parser.add_argument("--max-runs", type=int, default=1000)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed median slowdown before failing")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = run_suite(sizes, args.seed, args.min_time, args.min_runs, args.max_runs)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("FAILED: regressions beyond the threshold:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
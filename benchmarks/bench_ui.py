@@ -0,0 +1,168 @@
+"""
+Frame-time benchmark for the Kivy screens.
+
+Builds MyHabitsPage and HabitsHistoryPage against seeded databases of several sizes (the same
+number of habits and completions) and measures, per screen and size:
+
+    * construction   time to create the screen (which loads all rows)
+    * refresh        time to reload the rows (load_habits / load_habit_history)
+    * memory         Python memory retained by the screen (tracemalloc)
+    * scroll frames  frame times while scrolling from top to bottom, one step per frame
+
+Frames are driven through Kivy's EventLoop, and frame times come from Clock.frametime, so they
+include layout and drawing work. Results print as a table and can be saved as JSON for comparison.
+
+Needs a window provider. On a machine without a display, run it under a virtual one:
+    xvfb-run python benchmarks/bench_ui.py --sizes 10,1000,50000 --output ui.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Keep Kivy from parsing our arguments and from flooding the output with its log
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed_database(data_dir, rows, seed):
+    """Seed `rows` habits and `rows` completions spread over the last year."""
+    from main import HabitTracker
+
+    rng = random.Random(seed)
+    tracker = HabitTracker(data_dir=data_dir)
+    now = int(time.time())
+
+    conn = sqlite3.connect(tracker.habits_db_file)
+    conn.executemany(
+        "INSERT INTO habits (name, description, frequency_type, frequency_count, duration_seconds, created_at, streak) "
+        "VALUES (?, ?, 'daily', 1, ?, ?, ?)",
+        [(f"Habit {i}", "", rng.randint(0, 3600), now, rng.randint(1, 30)) for i in range(rows)]
+    )
+    habit_ids = [row[0] for row in conn.execute("SELECT id FROM habits")]
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(tracker.completions_db_file)
+    conn.executemany(
+        "INSERT INTO habit_completions (habit_id, completion_time, duration_seconds, notes) VALUES (?, ?, ?, '')",
+        [(rng.choice(habit_ids), now - rng.randint(0, 365 * 86400), rng.randint(0, 3600)) for _ in range(rows)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_frames(count):
+    """Render `count` frames and return their frame times in seconds."""
+    from kivy.base import EventLoop
+    from kivy.clock import Clock
+
+    frame_times = []
+    for _ in range(count):
+        EventLoop.idle()
+        frame_times.append(Clock.frametime)
+    return frame_times
+
+
+def measure_screen(screen_class, refresh_name, scroll_steps):
+    """Construct, refresh and scroll one screen, returning its measurements."""
+    from kivy.base import EventLoop
+
+    window = EventLoop.window
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    screen = screen_class(name="bench")
+    construction = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    window.add_widget(screen)
+    # Let the first layout pass settle before timing anything else
+    first_frames = run_frames(3)
+
+    start = time.perf_counter()
+    getattr(screen, refresh_name)()
+    refresh = time.perf_counter() - start
+
+    scroll_frames = []
+    for step in range(scroll_steps + 1):
+        screen.scroll_view.scroll_y = 1 - step / scroll_steps
+        scroll_frames.extend(run_frames(1))
+
+    window.remove_widget(screen)
+
+    ordered = sorted(scroll_frames)
+    return {
+        'construction_ms': round(construction * 1000, 2),
+        'first_frames_ms': [round(frame * 1000, 2) for frame in first_frames],
+        'refresh_ms': round(refresh * 1000, 2),
+        'memory_mb': round(memory / 1e6, 2),
+        'scroll_frame_median_ms': round(statistics.median(ordered) * 1000, 2),
+        'scroll_frame_p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        'scroll_frame_max_ms': round(ordered[-1] * 1000, 2),
+        'frames_over_16ms': sum(1 for frame in scroll_frames if frame > 1 / 60),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Kivy screen construction, refresh and scrolling.")
+    parser.add_argument("--sizes", default="10,1000,50000", help="Comma-separated row counts to seed")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--scroll-steps", type=int, default=60, help="Frames used to scroll top to bottom")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = {
+        'created_at': int(time.time()),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'seed': args.seed,
+        'sizes': {},
+    }
+
+    original_dir = os.getcwd()
+    for size in sizes:
+        # Screens create HabitTracker() themselves, so point them at the seeded data directory
+        data_dir = tempfile.mkdtemp(prefix=f"habit_ui_bench_{size}_")
+        seed_database(data_dir, size, args.seed)
+        os.environ["HABIT_TRACKER_DATA_DIR"] = data_dir
+        # Settings and daily tracking files are read from the working directory
+        os.chdir(data_dir)
+
+        from kivy.base import EventLoop
+        EventLoop.ensure_window()
+        from pages.my_habits_page import MyHabitsPage
+        from pages.habits_history_page import HabitsHistoryPage
+
+        size_results = {}
+        for label, screen_class, refresh_name in (
+                ('MyHabitsPage', MyHabitsPage, 'load_habits'),
+                ('HabitsHistoryPage', HabitsHistoryPage, 'load_habit_history')):
+            size_results[label] = result = measure_screen(screen_class, refresh_name, args.scroll_steps)
+            print(f"size {size:>7,}  {label:<18} construct {result['construction_ms']:>10.1f} ms  "
+                  f"refresh {result['refresh_ms']:>10.1f} ms  memory {result['memory_mb']:>8.1f} MB  "
+                  f"scroll p95 {result['scroll_frame_p95_ms']:>7.1f} ms  "
+                  f"({result['frames_over_16ms']} frames over 16 ms)")
+        results['sizes'][str(size)] = size_results
+        os.chdir(original_dir)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"results written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Benchmark for completion token verification (verification.py).
+
+Measures verifications per second for single tokens and for batches, with an in-memory replay
+store and with one persisted to SQLite. Exits with status 1 if any mode falls below --min-rate.
+
+Run with:
+    python benchmarks/bench_verification.py --tokens 20000
+"""
+import argparse
+import os
+import secrets
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from verification import CompletionTokenSigner, CompletionVerifier, ReplayStore
+
+
+def make_tokens(signer, count):
+    return [signer.sign(habit_id=i % 500, duration_seconds=60, streak=i % 30) for i in range(count)]
+
+
+def measure(name, verifier, tokens, batch_size):
+    start = time.perf_counter()
+    if batch_size == 1:
+        for token in tokens:
+            verifier.verify(token)
+    else:
+        for i in range(0, len(tokens), batch_size):
+            results = verifier.verify_batch(tokens[i:i + batch_size])
+            if not all(result['success'] for result in results):
+                raise RuntimeError("Valid token rejected during benchmark")
+    elapsed = time.perf_counter() - start
+    rate = len(tokens) / elapsed
+    print(f"{name:<40} {rate:>12,.0f} verifications/s")
+    return rate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark completion token verification.")
+    parser.add_argument("--tokens", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--min-rate", type=float, default=1000, help="Fail below this many verifications/s")
+    args = parser.parse_args(argv)
+
+    secret = secrets.token_bytes(32)
+    signer = CompletionTokenSigner(secret)
+    db_file = os.path.join(tempfile.mkdtemp(prefix="habit_bench_"), "replay.db")
+
+    rates = [
+        measure("single, in-memory replay store", CompletionVerifier(secret),
+                make_tokens(signer, args.tokens), 1),
+        measure(f"batch of {args.batch_size}, in-memory replay store", CompletionVerifier(secret),
+                make_tokens(signer, args.tokens), args.batch_size),
+        measure(f"batch of {args.batch_size}, SQLite replay store", CompletionVerifier(secret, ReplayStore(db_file)),
+                make_tokens(signer, args.tokens), args.batch_size),
+    ]
+
+    # Single verifications against SQLite commit once per token, so use fewer of them
+    single_count = min(args.tokens, 2000)
+    rates.append(measure("single, SQLite replay store",
+                         CompletionVerifier(secret, ReplayStore(db_file + ".single")),
+                         make_tokens(signer, single_count), 1))
+
+    if min(rates) < args.min_rate:
+        print(f"FAILED: slowest mode is below {args.min_rate:,.0f} verifications/s")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Load test for the local HTTP API server (server.py).
+
+Starts a server on a free localhost port against a throwaway data directory (or targets an
+already running server with --url), then hammers it from several keep-alive client threads.
+
+Run with:
+    python benchmarks/load_test.py --clients 8 --requests 500
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import HabitTracker
+from server import HabitAPIServer
+
+
+def seed(tracker, habit_count):
+    """Create habit_count habits to serve."""
+    for i in range(habit_count):
+        tracker.add_habit(f"Load test habit {i}", "daily", 3, duration_seconds=60)
+
+
+def run_client(host, port, request_count, habit_ids, latencies, status_counts, lock):
+    """Issue a mix of reads and writes over a single keep-alive connection."""
+    conn = http.client.HTTPConnection(host, port)
+    etag = None
+    local_latencies = []
+    local_statuses = {}
+
+    for i in range(request_count):
+        headers = {}
+        if i % 10 == 9:
+            # One in ten requests is a completion write
+            habit_id = habit_ids[i % len(habit_ids)]
+            method, path, body = "POST", f"/habits/{habit_id}/complete", b"{}"
+            headers["Content-Type"] = "application/json"
+        else:
+            method, path, body = "GET", "/habits", None
+            if etag:
+                headers["If-None-Match"] = etag
+
+        start = time.perf_counter()
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        local_latencies.append(time.perf_counter() - start)
+
+        if method == "GET" and response.getheader("ETag"):
+            etag = response.getheader("ETag")
+        local_statuses[response.status] = local_statuses.get(response.status, 0) + 1
+
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        for status, count in local_statuses.items():
+            status_counts[status] = status_counts.get(status, 0) + count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the habit tracker HTTP API.")
+    parser.add_argument("--url", help="Base URL of a running server (default: start one on localhost)")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per client")
+    parser.add_argument("--habits", type=int, default=50, help="Habits to seed when starting a server")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+        conn = http.client.HTTPConnection(host, port)
+        conn.request("GET", "/habits")
+        habit_ids = [habit['id'] for habit in json.loads(conn.getresponse().read())]
+        conn.close()
+    else:
+        data_dir = tempfile.mkdtemp(prefix="habit_load_test_")
+        tracker = HabitTracker(data_dir=data_dir)
+        seed(tracker, args.habits)
+        server = HabitAPIServer(("127.0.0.1", 0), tracker)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = "127.0.0.1", server.server_port
+        habit_ids = [habit['id'] for habit in tracker.get_habits()]
+
+    if not habit_ids:
+        print("No habits to test against.")
+        return 1
+
+    latencies = []
+    status_counts = {}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=run_client,
+                         args=(host, port, args.requests, habit_ids, latencies, status_counts, lock))
+        for _ in range(args.clients)
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    if server:
+        server.shutdown()
+        server.server_close()
+
+    latencies.sort()
+    total = len(latencies)
+    print(f"{total} requests from {args.clients} clients in {elapsed:.2f}s ({total / elapsed:.0f} req/s)")
+    print(f"latency p50 {statistics.median(latencies) * 1000:.2f} ms, "
+          f"p95 {latencies[int(total * 0.95) - 1] * 1000:.2f} ms, "
+          f"max {latencies[-1] * 1000:.2f} ms")
+    print("status codes: " + ", ".join(f"{status}: {count}" for status, count in sorted(status_counts.items())))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
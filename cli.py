@@ -0,0 +1,389 @@
+"""
+Command-line interface for the habit tracker.
+
+Runs directly on HabitTracker without loading Kivy, so it can be used from cron jobs and scripts.
+
+Examples:
+    python cli.py add "Read" --frequency daily --count 1 --duration-minutes 20
+    python cli.py --json list
+    python cli.py complete 3 --notes "before bed"
+    python cli.py export backup.json
+    python cli.py batch < commands.txt   (one command per line, e.g. "complete 3"; exits 1 if any fails)
+    python cli.py encrypt                (encrypt the databases; later runs ask for the passphrase)
+"""
+import argparse
+import getpass
+import json
+import os
+import shlex
+import sys
+import time
+
+from instrumentation import Instrumentation
+from sql_profiler import SQLProfiler
+import storage
+from main import HabitTracker, default_data_dir
+from maintenance import MaintenanceScheduler
+from reminders import ConsoleNotifier, ReminderScheduler
+
+
+def build_parser():
+    """Build the argument parser shared by normal and batch mode."""
+    parser = argparse.ArgumentParser(prog="cli.py", description="Manage habits without the GUI.")
+    parser.add_argument("--data-dir", help="Directory holding the database files")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON output")
+    parser.add_argument("--account", metavar="EMAIL", help="Only list this account's habits, completions and stats; new habits join it")
+    parser.add_argument("--metrics", help="Record per-method metrics and write them to this file (.prom for Prometheus text, JSON otherwise)")
+    parser.add_argument("--profile-sql", metavar="LOGFILE", help="Log slow SQL statements with their query plans to this file")
+    parser.add_argument("--slow-ms", type=float, default=50, help="Statements at least this slow are logged by --profile-sql")
+    parser.add_argument("--profile-sql-params", action="store_true",
+                        help="Log bound parameter values with --profile-sql (only their types by default)")
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Add a new habit")
+    add_parser.add_argument("name")
+    add_parser.add_argument("--frequency", default="daily", choices=["daily", "weekly", "monthly", "yearly"])
+    add_parser.add_argument("--count", type=int, default=1, help="Times per frequency period")
+    add_parser.add_argument("--duration-minutes", type=float, default=0)
+    add_parser.add_argument("--description", default="")
+    add_parser.add_argument("--time", action="append", dest="preferred_times", help="Preferred time (HH:MM), repeatable")
+    add_parser.add_argument("--hardcore", action="store_true", help="Reset the streak whenever a period ends with fewer than --count completions")
+    add_parser.set_defaults(handler=cmd_add)
+
+    accounts_parser = subparsers.add_parser("accounts", help="List accounts")
+    accounts_parser.set_defaults(handler=cmd_accounts)
+
+    add_account_parser = subparsers.add_parser("add-account", help="Add an account and make it the current one")
+    add_account_parser.add_argument("email")
+    add_account_parser.set_defaults(handler=cmd_add_account)
+
+    list_parser = subparsers.add_parser("list", help="List all habits")
+    list_parser.set_defaults(handler=cmd_list)
+
+    complete_parser = subparsers.add_parser("complete", help="Record a habit completion")
+    complete_parser.add_argument("habit_id", type=int)
+    complete_parser.add_argument("--duration", type=int, help="Duration in seconds (defaults to the habit's duration)")
+    complete_parser.add_argument("--notes", default="")
+    complete_parser.set_defaults(handler=cmd_complete)
+
+    redeem_parser = subparsers.add_parser("redeem", help="Redeem a bonus code")
+    redeem_parser.add_argument("code")
+    redeem_parser.add_argument("--habit", type=int, dest="habit_id", help="Habit to credit")
+    redeem_parser.set_defaults(handler=cmd_redeem)
+
+    raffle_parser = subparsers.add_parser("raffle", help="Draw raffle winners weighted by streak or reward balance")
+    raffle_parser.add_argument("--winners", type=int, default=1)
+    raffle_parser.add_argument("--weight-by", default="streak", choices=["streak", "reward_balance"])
+    raffle_parser.add_argument("--seed", type=int, help="Replay the draw made with this seed")
+    raffle_parser.add_argument("--repeat-winners", action="store_true", help="Let one habit win several prizes")
+    raffle_parser.set_defaults(handler=cmd_raffle)
+
+    leaderboard_parser = subparsers.add_parser("leaderboard", help="Show habits ranked by streak or reward balance")
+    leaderboard_parser.add_argument("--by", default="streak", choices=["streak", "reward_balance"])
+    leaderboard_parser.add_argument("--limit", type=int, default=10)
+    leaderboard_parser.add_argument("--offset", type=int, default=0)
+    leaderboard_parser.set_defaults(handler=cmd_leaderboard)
+
+    rank_parser = subparsers.add_parser("rank", help="Show a habit's leaderboard rank")
+    rank_parser.add_argument("habit_id", type=int)
+    rank_parser.add_argument("--by", default="streak", choices=["streak", "reward_balance"])
+    rank_parser.set_defaults(handler=cmd_rank)
+
+    export_parser = subparsers.add_parser("export", help="Export all data as JSON")
+    export_parser.add_argument("file", nargs="?", help="Output file (defaults to stdout)")
+    export_parser.set_defaults(handler=cmd_export)
+
+    import_parser = subparsers.add_parser("import", help="Import data exported with 'export'")
+    import_parser.add_argument("file", nargs="?", help="Input file (defaults to stdin)")
+    import_parser.set_defaults(handler=cmd_import)
+
+    recompute_parser = subparsers.add_parser("recompute-streaks", help="Rebuild streaks from completion history")
+    recompute_parser.set_defaults(handler=cmd_recompute_streaks)
+
+    hardcore_parser = subparsers.add_parser("enforce-hardcore", help="Reset hardcore habits that missed a period since the last run")
+    hardcore_parser.set_defaults(handler=cmd_enforce_hardcore)
+
+    rollover_parser = subparsers.add_parser("rollover", help="Reset lapsed streaks and enforce hardcore mode for every period that ended")
+    rollover_parser.set_defaults(handler=cmd_rollover)
+
+    vacuum_parser = subparsers.add_parser("vacuum", help="Compact the database files")
+    vacuum_parser.set_defaults(handler=cmd_vacuum)
+
+    archive_parser = subparsers.add_parser("archive", help="Move old completions to the compressed archive")
+    archive_parser.add_argument("--days", type=int, default=365, help="Archive completions older than this many days")
+    archive_parser.set_defaults(handler=cmd_archive)
+
+    maintenance_parser = subparsers.add_parser("maintenance", help="Run every maintenance job once")
+    maintenance_parser.set_defaults(handler=cmd_maintenance)
+
+    reminders_parser = subparsers.add_parser("reminders", help="Print reminders at preferred times until interrupted")
+    reminders_parser.set_defaults(handler=cmd_reminders)
+
+    stats_parser = subparsers.add_parser("stats", help="Show summary statistics")
+    stats_parser.set_defaults(handler=cmd_stats)
+
+    encrypt_parser = subparsers.add_parser("encrypt", help="Encrypt the database files with a passphrase (needs SQLCipher)")
+    encrypt_parser.set_defaults(handler=cmd_encrypt)
+
+    batch_parser = subparsers.add_parser("batch", help="Run one command per line read from stdin")
+    batch_parser.set_defaults(handler=cmd_batch)
+
+    return parser
+
+
+# Command handlers. Each returns (result, text) where result is JSON-serializable.
+def cmd_add(tracker, args):
+    habit = tracker.add_habit(
+        name=args.name,
+        frequency_type=args.frequency,
+        frequency_count=args.count,
+        duration_seconds=tracker.minutes_to_seconds(args.duration_minutes),
+        preferred_times=args.preferred_times,
+        description=args.description,
+        hardcore=args.hardcore
+    )
+    return habit, f"Added habit {habit['id']}: {habit['name']}"
+
+
+def cmd_accounts(tracker, args):
+    accounts = tracker.get_accounts()
+    if not accounts:
+        return accounts, "No accounts found."
+    current = tracker.get_current_account()
+    lines = [f"{'*' if account['id'] == current['id'] else ' '} {account['id']:>4}  {account['email']}"
+             for account in accounts]
+    return accounts, "\n".join(lines)
+
+
+def cmd_add_account(tracker, args):
+    account = tracker.add_account(args.email)
+    return account, f"Added account {account['id']}: {account['email']}"
+
+
+def cmd_list(tracker, args):
+    habits = tracker.get_habits()
+    if not habits:
+        return habits, "No habits found."
+    lines = [
+        f"{habit['id']:>4}  {habit['name']}  ({habit['frequency_count']}x {habit['frequency_type']}, "
+        f"streak {habit['streak']}, balance ${habit['reward_balance']:.2f})"
+        for habit in habits
+    ]
+    return habits, "\n".join(lines)
+
+
+def cmd_complete(tracker, args):
+    habit = tracker.record_completion(args.habit_id, duration_seconds=args.duration, notes=args.notes)
+    return habit, f"Completed '{habit['name']}' (streak {habit['streak']})"
+
+
+def cmd_redeem(tracker, args):
+    result = tracker.use_bonus_code(args.code, habit_id=args.habit_id)
+    return result, result['message']
+
+
+def cmd_raffle(tracker, args):
+    result = tracker.run_raffle(args.winners, weight_by=args.weight_by, seed=args.seed, unique=not args.repeat_winners)
+    lines = [f"Drew {len(result['winners'])} winners from {result['entrants']} habits (seed {result['seed']})"]
+    lines += [f"  {place}. habit {habit_id}" for place, habit_id in enumerate(result['winners'], 1)]
+    return result, "\n".join(lines)
+
+
+def cmd_leaderboard(tracker, args):
+    page = tracker.get_leaderboard(args.by, limit=args.limit, offset=args.offset)
+    if not page:
+        return page, "No habits found."
+    return page, "\n".join(f"{entry['rank']:>4}. {entry['name']}  ({args.by} {entry['value']})" for entry in page)
+
+
+def cmd_rank(tracker, args):
+    rank = tracker.get_rank(args.habit_id, args.by)
+    if rank is None:
+        raise ValueError(f"Habit with ID {args.habit_id} not found.")
+    return rank, f"Habit {args.habit_id} is #{rank['rank']} of {rank['entrants']} by {args.by} ({rank['value']})"
+
+
+def cmd_export(tracker, args):
+    data = tracker.export_data()
+    if args.file:
+        with open(args.file, "w") as file:
+            json.dump(data, file, indent=2)
+        summary = {key: len(data[key]) for key in ('habits', 'completions', 'bonus_codes')}
+        return summary, f"Exported {summary['habits']} habits and {summary['completions']} completions to {args.file}"
+    # Writing to stdout: the export itself is the output
+    return data, json.dumps(data, indent=2)
+
+
+def cmd_import(tracker, args):
+    if args.file:
+        with open(args.file, "r") as file:
+            data = json.load(file)
+    else:
+        data = json.load(sys.stdin)
+    counts = tracker.import_data(data)
+    return counts, (f"Imported {counts['habits']} habits, {counts['completions']} completions "
+                    f"and {counts['bonus_codes']} bonus codes")
+
+
+def cmd_recompute_streaks(tracker, args):
+    streaks = tracker.recompute_streaks()
+    return {str(habit_id): streak for habit_id, streak in streaks.items()}, f"Recomputed streaks for {len(streaks)} habits"
+
+
+def cmd_enforce_hardcore(tracker, args):
+    failures = tracker.enforce_hardcore()
+    lines = [f"Reset {len(failures)} hardcore habits"]
+    lines += [f"  habit {habit_id}: {completed}/{required} in the period starting {key}"
+              for habit_id, missed in failures.items() for key, completed, required in missed]
+    return {str(habit_id): missed for habit_id, missed in failures.items()}, "\n".join(lines)
+
+
+def cmd_rollover(tracker, args):
+    result = tracker.rollover()
+    summary = {'lapsed': result['lapsed'], 'hardcore': {str(habit_id): missed for habit_id, missed in result['hardcore'].items()}}
+    return summary, f"Reset {len(result['lapsed'])} lapsed streaks and {len(result['hardcore'])} hardcore habits"
+
+
+def cmd_vacuum(tracker, args):
+    tracker.vacuum()
+    return {'success': True}, "Databases vacuumed."
+
+
+def cmd_archive(tracker, args):
+    archived = tracker.archive_completions(older_than_days=args.days)
+    return {'archived': archived}, f"Archived {archived} completions older than {args.days} days"
+
+
+def cmd_maintenance(tracker, args):
+    results = MaintenanceScheduler(tracker).run_all()
+    lines = [f"{name}: {result}" for name, result in results.items()]
+    return results, "\n".join(lines)
+
+
+def cmd_encrypt(tracker, args):
+    passphrase = os.environ.get(storage.PASSPHRASE_ENV)
+    if passphrase is None:
+        passphrase = getpass.getpass("New passphrase: ")
+        if getpass.getpass("Repeat passphrase: ") != passphrase:
+            raise ValueError("Passphrases don't match.")
+    if not passphrase:
+        raise ValueError("The passphrase can't be empty.")
+    try:
+        converted = storage.encrypt_data_dir(tracker.data_dir, passphrase)
+    except storage.EncryptionError as e:
+        raise ValueError(str(e))
+    return {'encrypted': converted}, f"Encrypted {len(converted)} database files in {tracker.data_dir}"
+
+
+def cmd_reminders(tracker, args):
+    scheduler = ReminderScheduler(tracker, notifier=ConsoleNotifier())
+    scheduler.start()
+    print(f"Watching {len(scheduler)} reminders (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+    return {'success': True}, "Stopped."
+
+
+def cmd_stats(tracker, args):
+    stats = tracker.get_stats()
+    lines = [f"{key.replace('_', ' ').capitalize()}: {value}" for key, value in stats.items()]
+    return stats, "\n".join(lines)
+
+
+def cmd_batch(tracker, args):
+    """
+    Run commands read line by line from stdin against a single tracker.
+
+    Each line is parsed like a normal command line (without the global options). Blank lines and
+    lines starting with '#' are ignored. A failing line is reported and does not stop the batch,
+    but makes the batch exit with status 1 once it has finished.
+    """
+    parser = build_parser()
+    results = []
+    succeeded = 0
+
+    for line_number, line in enumerate(sys.stdin, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        try:
+            line_args = parser.parse_args(shlex.split(line))
+            if line_args.handler is cmd_batch:
+                raise ValueError("Nested batch commands are not allowed.")
+            result, text = line_args.handler(tracker, line_args)
+            # Redeeming a bad code is reported in the result rather than raised
+            ok = not (isinstance(result, dict) and result.get('success') is False)
+            entry = {'line': line_number, 'success': ok, 'result': result}
+            succeeded += ok
+        except SystemExit:
+            # argparse already printed its usage error to stderr
+            entry = {'line': line_number, 'success': False, 'error': f"Invalid command: {line}"}
+            text = entry['error']
+        except (ValueError, KeyError, TypeError) as e:
+            entry = {'line': line_number, 'success': False, 'error': str(e)}
+            text = f"Line {line_number}: {e}"
+
+        # Stream results so long batches can be followed as they run
+        if args.json:
+            print(json.dumps(entry))
+        else:
+            print(text)
+        results.append(entry)
+
+    summary = {'processed': len(results), 'succeeded': succeeded, 'failed': len(results) - succeeded}
+    return summary, f"Processed {summary['processed']} commands ({summary['failed']} failed)"
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        storage.unlock(args.data_dir if args.data_dir is not None else default_data_dir())
+    except storage.EncryptionError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    tracker = HabitTracker(data_dir=args.data_dir)
+    if args.account:
+        account = tracker.get_user_by_email(args.account)
+        if account is None:
+            print(f"Error: Account '{args.account}' not found.", file=sys.stderr)
+            return 1
+        tracker.account_id = account['id']
+    instrumentation = Instrumentation().attach(tracker) if args.metrics else None
+    if args.profile_sql:
+        SQLProfiler(args.profile_sql, slow_ms=args.slow_ms, log_params=args.profile_sql_params).attach(tracker)
+
+    try:
+        result, text = args.handler(tracker, args)
+    except ValueError as e:
+        if args.json:
+            print(json.dumps({'success': False, 'error': str(e)}))
+        else:
+            print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if instrumentation:
+            instrumentation.export(args.metrics)
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(text)
+
+    # Redeeming a bad code is reported in the result rather than raised
+    if isinstance(result, dict) and result.get('success') is False:
+        return 1
+    if args.handler is cmd_batch and result['failed']:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
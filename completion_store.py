@@ -0,0 +1,173 @@
+"""
+Compact in-memory storage for large numbers of completions.
+
+HabitTracker.get_completions returns one dict per completion, which costs several hundred bytes
+per row. CompletionColumns instead keeps id, habit_id, completion time (Unix epoch seconds) and
+duration in parallel array('q') columns, about 32 bytes per row. Notes are rarely needed in bulk,
+so they are only fetched from the database when first asked for.
+
+Indexing returns a CompletionView, a small __slots__ object that reads from the columns. It
+supports both attribute access (view.habit_id) and dict-style access (view['habit_id']).
+
+Build one with HabitTracker.get_completion_columns. If NumPy is installed, to_numpy() exposes the
+columns as NumPy arrays without copying.
+"""
+from array import array
+
+import storage
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Stored in the duration column for completions without a duration
+NO_DURATION = -1
+
+
+class CompletionView:
+    """A read-only view of one row of a CompletionColumns."""
+
+    __slots__ = ('_columns', '_index')
+
+    def __init__(self, columns, index):
+        self._columns = columns
+        self._index = index
+
+    @property
+    def id(self):
+        return self._columns.ids[self._index]
+
+    @property
+    def habit_id(self):
+        return self._columns.habit_ids[self._index]
+
+    @property
+    def completion_time(self):
+        """Completion time as Unix epoch seconds."""
+        return self._columns.times[self._index]
+
+    @property
+    def duration_seconds(self):
+        duration = self._columns.durations[self._index]
+        return None if duration == NO_DURATION else duration
+
+    @property
+    def notes(self):
+        return self._columns.get_notes(self.id)
+
+    def __getitem__(self, key):
+        if key not in ('id', 'habit_id', 'completion_time', 'duration_seconds', 'notes'):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def as_dict(self):
+        """The row as a dict shaped like a get_completions row (completion_time in epoch seconds)."""
+        return {
+            'id': self.id,
+            'habit_id': self.habit_id,
+            'completion_time': self.completion_time,
+            'duration_seconds': self.duration_seconds,
+            'notes': self.notes
+        }
+
+    def __repr__(self):
+        return f"CompletionView(id={self.id}, habit_id={self.habit_id}, completion_time={self.completion_time})"
+
+
+class CompletionColumns:
+    """
+    Completions stored column-wise.
+
+    Args:
+        db_file (str, optional): Completions database that lazily loaded notes are read from
+    """
+
+    def __init__(self, db_file=None):
+        self.db_file = db_file
+        self.ids = array('q')
+        self.habit_ids = array('q')
+        self.times = array('q')
+        self.durations = array('q')
+        # Notes that are already known (archived rows) or were loaded on demand, by completion ID
+        self._notes = {}
+
+    def append(self, completion_id, habit_id, completion_time, duration_seconds, notes=None):
+        """
+        Add a row; completion_time is epoch seconds, notes=None means load lazily.
+
+        Durations are kept in whole seconds, so one stored as a float (older versions wrote
+        whatever they were given) is truncated like HabitTracker does on write.
+        """
+        self.ids.append(completion_id)
+        self.habit_ids.append(habit_id)
+        self.times.append(int(completion_time))
+        self.durations.append(NO_DURATION if duration_seconds is None else int(duration_seconds))
+        if notes is not None:
+            self._notes[completion_id] = notes
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.ids)
+        if not 0 <= index < len(self.ids):
+            raise IndexError("completion index out of range")
+        return CompletionView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.ids)):
+            yield CompletionView(self, index)
+
+    def get_notes(self, completion_id):
+        """Notes of one completion, loaded from the database on first access."""
+        if completion_id not in self._notes:
+            notes = None
+            if self.db_file:
+                conn = storage.connect(self.db_file)
+                row = conn.execute("SELECT notes FROM habit_completions WHERE id = ?", (completion_id,)).fetchone()
+                conn.close()
+                notes = row[0] if row else None
+            self._notes[completion_id] = notes
+        return self._notes[completion_id]
+
+    def sort_by_time(self, reverse=True):
+        """Reorder all columns by completion time (newest first by default)."""
+        order = sorted(range(len(self.ids)), key=self.times.__getitem__, reverse=reverse)
+        for name in ('ids', 'habit_ids', 'times', 'durations'):
+            column = getattr(self, name)
+            setattr(self, name, array('q', [column[i] for i in order]))
+
+    # Aggregates used by statistics and the history page
+    def habit_counts(self):
+        """Number of completions per habit ID."""
+        counts = {}
+        for habit_id in self.habit_ids:
+            counts[habit_id] = counts.get(habit_id, 0) + 1
+        return counts
+
+    def total_duration(self):
+        """Sum of all known durations in seconds."""
+        return sum(duration for duration in self.durations if duration != NO_DURATION)
+
+    def times_by_habit(self):
+        """Completion times (epoch seconds) per habit ID, in column order."""
+        times = {}
+        for habit_id, completion_time in zip(self.habit_ids, self.times):
+            times.setdefault(habit_id, []).append(completion_time)
+        return times
+
+    def to_numpy(self):
+        """
+        The columns as NumPy arrays sharing memory with this store.
+
+        Raises:
+            ImportError: If NumPy isn't installed
+        """
+        if numpy is None:
+            raise ImportError("NumPy is required for CompletionColumns.to_numpy()")
+        return {
+            name: numpy.frombuffer(getattr(self, name), dtype=numpy.int64)
+            for name in ('ids', 'habit_ids', 'times', 'durations')
+        }
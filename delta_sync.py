@@ -0,0 +1,783 @@
+"""
+Delta sync between several devices sharing the same habits.
+
+Installing a DeltaSyncEngine on a HabitTracker adds row-level change tracking to both databases:
+triggers append every change to habits, preferred_times and habit_completions to a `change_log`
+table with a monotonic sequence number. Two stores then only exchange the rows that changed since
+the sequence number the other side last acknowledged, instead of re-uploading everything.
+
+Each store has a device ID and remembers, per peer, the last sequence numbers it has applied from
+that peer (a vector clock over devices). A sync round is:
+
+    1. pull: ask the peer for its changes since our entry for it; apply them; remember its cursor
+    2. push: send our changes since the peer's entry for us; the peer applies them
+
+Rows are matched across devices by habit name and by a random `sync_id` on each completion. Habit
+names are only unique per account, so syncing refuses to run while two accounts of a store share a
+name; habits received from a peer join the tracker's account (or the current one). Conflicts are resolved deterministically:
+    * habit settings (description, frequency, duration, preferred times): last writer wins,
+      comparing (changed_at, origin device ID)
+    * completions are immutable, so they are simply unioned (deletes win)
+    * streak and last_completed are recomputed from the merged completions (streaks only from
+      after the local hardcore/lapse reset, habits.streak_reset_at), and reward_balance is
+      0.25 per merged completion plus the larger of the two sides' bonus credit
+
+The change log is pruned after every sync round: entries every known peer has acknowledged (its
+clock entry for this store) are deleted, and the highest pruned sequence number is remembered.
+Tombstones of deleted and renamed habits (habit_versions rows without a habit) are pruned along
+with the last change-log entry for them. A peer asking for changes from before that point (a new
+device, or one restored from a backup) gets a snapshot of every row instead, archived completions
+included, which the conflict rules above merge like any other change; deletions older than the
+pruned point are no longer in it.
+
+Example (two local stores):
+    engine_a = DeltaSyncEngine(HabitTracker(data_dir="device_a"))
+    engine_b = DeltaSyncEngine(HabitTracker(data_dir="device_b"))
+    engine_a.sync(InProcessTransport(engine_b))
+"""
+import json
+import sqlite3
+import uuid
+from datetime import datetime
+
+import storage
+from main import _ensure_column, _whole_seconds
+from timestamps import to_epoch
+
+# Must match the reward added per completion in HabitTracker.record_completion
+COMPLETION_REWARD = 0.25
+
+# Trigger-side context: the origin device and timestamp to record for a change. Normal writes use
+# this device's ID and the current time; applying a peer's change temporarily overrides both.
+CHANGE_ORIGIN = "(SELECT value FROM sync_state WHERE key = 'origin')"
+CHANGED_AT = ("COALESCE((SELECT value FROM sync_state WHERE key = 'changed_at'), "
+              "strftime('%Y-%m-%dT%H:%M:%f', 'now'))")
+
+HABIT_FIELDS = ['description', 'frequency_type', 'frequency_count', 'duration_seconds']
+
+HABITS_SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    changed_at TIMESTAMP NOT NULL
+);
+
+-- Last-writer-wins version of each habit's settings (kept after deletion as a tombstone)
+CREATE TABLE IF NOT EXISTS habit_versions (
+    name TEXT PRIMARY KEY,
+    changed_at TIMESTAMP NOT NULL,
+    origin TEXT NOT NULL,
+    renamed_to TEXT
+);
+
+-- Highest sequence numbers applied from each peer, and of ours acknowledged by it
+CREATE TABLE IF NOT EXISTS sync_peers (
+    peer_id TEXT PRIMARY KEY,
+    habits_seq INTEGER NOT NULL DEFAULT 0,
+    completions_seq INTEGER NOT NULL DEFAULT 0,
+    acked_habits_seq INTEGER NOT NULL DEFAULT 0,
+    acked_completions_seq INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS habits_log_insert AFTER INSERT ON habits BEGIN
+    INSERT INTO change_log (table_name, row_key, origin, changed_at)
+    VALUES ('habits', NEW.name, {CHANGE_ORIGIN}, {CHANGED_AT});
+    INSERT OR REPLACE INTO habit_versions (name, changed_at, origin)
+    VALUES (NEW.name, {CHANGED_AT}, {CHANGE_ORIGIN});
+END;
+
+-- Only changes a peer uses are logged: streak and last_completed are recomputed on every device,
+-- so rollover resets and streak rebuilds don't add entries
+DROP TRIGGER IF EXISTS habits_log_update;
+CREATE TRIGGER habits_log_update AFTER UPDATE ON habits
+WHEN OLD.name IS NOT NEW.name OR OLD.description IS NOT NEW.description
+  OR OLD.frequency_type IS NOT NEW.frequency_type OR OLD.frequency_count IS NOT NEW.frequency_count
+  OR OLD.duration_seconds IS NOT NEW.duration_seconds OR OLD.reward_balance IS NOT NEW.reward_balance BEGIN
+    INSERT INTO change_log (table_name, row_key, origin, changed_at)
+    VALUES ('habits', NEW.name, {CHANGE_ORIGIN}, {CHANGED_AT});
+END;
+
+CREATE TRIGGER IF NOT EXISTS habits_log_rename AFTER UPDATE OF name ON habits
+WHEN OLD.name != NEW.name BEGIN
+    INSERT INTO change_log (table_name, row_key, origin, changed_at)
+    VALUES ('habits', OLD.name, {CHANGE_ORIGIN}, {CHANGED_AT});
+    INSERT OR REPLACE INTO habit_versions (name, changed_at, origin, renamed_to)
+    VALUES (OLD.name, {CHANGED_AT}, {CHANGE_ORIGIN}, NEW.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS habits_version_update
+AFTER UPDATE OF name, description, frequency_type, frequency_count, duration_seconds ON habits BEGIN
+    INSERT OR REPLACE INTO habit_versions (name, changed_at, origin)
+    VALUES (NEW.name, {CHANGED_AT}, {CHANGE_ORIGIN});
+END;
+
+CREATE TRIGGER IF NOT EXISTS habits_log_delete AFTER DELETE ON habits BEGIN
+    INSERT INTO change_log (table_name, row_key, origin, changed_at)
+    VALUES ('habits', OLD.name, {CHANGE_ORIGIN}, {CHANGED_AT});
+    INSERT OR REPLACE INTO habit_versions (name, changed_at, origin)
+    VALUES (OLD.name, {CHANGED_AT}, {CHANGE_ORIGIN});
+END;
+
+CREATE TRIGGER IF NOT EXISTS preferred_times_log_insert AFTER INSERT ON preferred_times
+WHEN EXISTS (SELECT 1 FROM habits WHERE id = NEW.habit_id) BEGIN
+    INSERT INTO change_log (table_name, row_key, origin, changed_at)
+    VALUES ('habits', (SELECT name FROM habits WHERE id = NEW.habit_id), {CHANGE_ORIGIN}, {CHANGED_AT});
+    INSERT OR REPLACE INTO habit_versions (name, changed_at, origin)
+    VALUES ((SELECT name FROM habits WHERE id = NEW.habit_id), {CHANGED_AT}, {CHANGE_ORIGIN});
+END;
+
+CREATE TRIGGER IF NOT EXISTS preferred_times_log_delete AFTER DELETE ON preferred_times
+WHEN EXISTS (SELECT 1 FROM habits WHERE id = OLD.habit_id) BEGIN
+    INSERT INTO change_log (table_name, row_key, origin, changed_at)
+    VALUES ('habits', (SELECT name FROM habits WHERE id = OLD.habit_id), {CHANGE_ORIGIN}, {CHANGED_AT});
+    INSERT OR REPLACE INTO habit_versions (name, changed_at, origin)
+    VALUES ((SELECT name FROM habits WHERE id = OLD.habit_id), {CHANGED_AT}, {CHANGE_ORIGIN});
+END;
+'''
+
+COMPLETIONS_SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    changed_at TIMESTAMP NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_habit_completions_sync_id ON habit_completions (sync_id);
+
+-- Locally recorded completions get a random sync ID, then are logged
+CREATE TRIGGER IF NOT EXISTS completions_log_insert_local AFTER INSERT ON habit_completions
+WHEN NEW.sync_id IS NULL BEGIN
+    UPDATE habit_completions SET sync_id = lower(hex(randomblob(16))) WHERE id = NEW.id;
+    INSERT INTO change_log (table_name, row_key, origin, changed_at)
+    VALUES ('habit_completions', (SELECT sync_id FROM habit_completions WHERE id = NEW.id),
+            {CHANGE_ORIGIN}, {CHANGED_AT});
+END;
+
+-- Completions received from a peer already carry their sync ID
+CREATE TRIGGER IF NOT EXISTS completions_log_insert_synced AFTER INSERT ON habit_completions
+WHEN NEW.sync_id IS NOT NULL BEGIN
+    INSERT INTO change_log (table_name, row_key, origin, changed_at)
+    VALUES ('habit_completions', NEW.sync_id, {CHANGE_ORIGIN}, {CHANGED_AT});
+END;
+
+CREATE TRIGGER IF NOT EXISTS completions_log_delete AFTER DELETE ON habit_completions BEGIN
+    INSERT INTO change_log (table_name, row_key, origin, changed_at)
+    VALUES ('habit_completions', OLD.sync_id, {CHANGE_ORIGIN}, {CHANGED_AT});
+END;
+'''
+
+
+class DeltaSyncEngine:
+    """Change tracking and delta exchange for one HabitTracker store."""
+
+    def __init__(self, habit_tracker):
+        self.habit_tracker = habit_tracker
+        self.device_id = self._install()
+
+    def _install(self):
+        """Create the change-log tables and triggers if needed and return this store's device ID."""
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        cursor = conn.cursor()
+        cursor.executescript(HABITS_SCHEMA)
+        _ensure_column(cursor, 'sync_peers', 'acked_habits_seq', 'INTEGER NOT NULL DEFAULT 0')
+        _ensure_column(cursor, 'sync_peers', 'acked_completions_seq', 'INTEGER NOT NULL DEFAULT 0')
+
+        cursor.execute("SELECT value FROM sync_state WHERE key = 'device_id'")
+        row = cursor.fetchone()
+        if row:
+            device_id = row[0]
+        else:
+            device_id = uuid.uuid4().hex
+            cursor.execute("INSERT INTO sync_state (key, value) VALUES ('device_id', ?)", (device_id,))
+            cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('origin', ?)", (device_id,))
+
+            # Log the rows that existed before change tracking was installed
+            now = datetime.utcnow().isoformat()
+            cursor.execute('''
+            INSERT INTO change_log (table_name, row_key, origin, changed_at)
+            SELECT 'habits', name, ?, ? FROM habits ORDER BY id
+            ''', (device_id, now))
+            cursor.execute('''
+            INSERT OR IGNORE INTO habit_versions (name, changed_at, origin)
+            SELECT name, ?, ? FROM habits
+            ''', (now, device_id))
+        conn.commit()
+        conn.close()
+
+        conn = storage.connect(self.habit_tracker.completions_db_file)
+        cursor = conn.cursor()
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(habit_completions)")]
+        if 'sync_id' not in columns:
+            cursor.execute("ALTER TABLE habit_completions ADD COLUMN sync_id TEXT")
+        cursor.executescript(COMPLETIONS_SCHEMA)
+
+        cursor.execute("SELECT value FROM sync_state WHERE key = 'origin'")
+        if not cursor.fetchone():
+            cursor.execute("INSERT INTO sync_state (key, value) VALUES ('origin', ?)", (device_id,))
+            cursor.execute(
+                "UPDATE habit_completions SET sync_id = lower(hex(randomblob(16))) WHERE sync_id IS NULL"
+            )
+            cursor.execute('''
+            INSERT INTO change_log (table_name, row_key, origin, changed_at)
+            SELECT 'habit_completions', sync_id, ?, ? FROM habit_completions ORDER BY id
+            ''', (device_id, datetime.utcnow().isoformat()))
+        conn.commit()
+        conn.close()
+
+        return device_id
+
+    # Cursors
+    def get_cursor(self):
+        """Return the latest sequence numbers of this store's change logs."""
+        return {
+            'habits': self._max_seq(self.habit_tracker.habits_db_file),
+            'completions': self._max_seq(self.habit_tracker.completions_db_file)
+        }
+
+    def _max_seq(self, db_file):
+        # The AUTOINCREMENT counter, which keeps its value when old entries are pruned
+        conn = storage.connect(db_file)
+        seq = conn.execute(
+            "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0)"
+        ).fetchone()[0]
+        conn.close()
+        return seq
+
+    def _pruned_seq(self, cursor):
+        cursor.execute("SELECT value FROM sync_state WHERE key = 'pruned_seq'")
+        row = cursor.fetchone()
+        return int(row[0]) if row else 0
+
+    def get_peer_cursor(self, peer_id):
+        """Return the sequence numbers this store has applied from a peer."""
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        row = conn.execute(
+            "SELECT habits_seq, completions_seq FROM sync_peers WHERE peer_id = ?", (peer_id,)
+        ).fetchone()
+        conn.close()
+        if not row:
+            return {'habits': 0, 'completions': 0}
+        return {'habits': row[0], 'completions': row[1]}
+
+    def get_clock(self):
+        """Return this store's vector clock: its own cursor plus everything applied from each peer."""
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        clock = {
+            peer_id: {'habits': habits_seq, 'completions': completions_seq}
+            for peer_id, habits_seq, completions_seq in conn.execute(
+                "SELECT peer_id, habits_seq, completions_seq FROM sync_peers"
+            )
+        }
+        conn.close()
+        clock[self.device_id] = self.get_cursor()
+        return clock
+
+    def _set_peer_cursor(self, peer_id, cursor):
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        conn.execute('''
+        INSERT INTO sync_peers (peer_id, habits_seq, completions_seq) VALUES (?, ?, ?)
+        ON CONFLICT (peer_id) DO UPDATE SET
+            habits_seq = MAX(habits_seq, excluded.habits_seq),
+            completions_seq = MAX(completions_seq, excluded.completions_seq)
+        ''', (peer_id, cursor['habits'], cursor['completions']))
+        conn.commit()
+        conn.close()
+
+    def _set_peer_acked(self, peer_id, acked):
+        """Remember how far a peer has applied this store's change logs."""
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        conn.execute('''
+        INSERT INTO sync_peers (peer_id, acked_habits_seq, acked_completions_seq) VALUES (?, ?, ?)
+        ON CONFLICT (peer_id) DO UPDATE SET
+            acked_habits_seq = MAX(acked_habits_seq, excluded.acked_habits_seq),
+            acked_completions_seq = MAX(acked_completions_seq, excluded.acked_completions_seq)
+        ''', (peer_id, acked['habits'], acked['completions']))
+        conn.commit()
+        conn.close()
+
+    def prune_change_log(self):
+        """
+        Delete the change-log entries every known peer has acknowledged, and the habit_versions
+        tombstones of deleted or renamed habits that no remaining entry refers to.
+
+        Without any known peer nothing is waiting for the entries, so all of them go.
+
+        Returns:
+            int: Number of entries deleted
+        """
+        cursor_position = self.get_cursor()
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        row = conn.execute("SELECT MIN(acked_habits_seq), MIN(acked_completions_seq) FROM sync_peers").fetchone()
+        conn.close()
+        watermarks = {
+            'habits': row[0] if row[0] is not None else cursor_position['habits'],
+            'completions': row[1] if row[1] is not None else cursor_position['completions']
+        }
+
+        deleted = 0
+        for key, db_file in (('habits', self.habit_tracker.habits_db_file),
+                             ('completions', self.habit_tracker.completions_db_file)):
+            conn = storage.connect(db_file)
+            cursor = conn.cursor()
+            try:
+                watermark = max(watermarks[key], self._pruned_seq(cursor))
+                cursor.execute("DELETE FROM change_log WHERE seq <= ?", (watermark,))
+                deleted += cursor.rowcount
+                if key == 'habits':
+                    # Tombstones of deleted and renamed habits go once every peer has seen them
+                    cursor.execute('''
+                    DELETE FROM habit_versions
+                    WHERE name NOT IN (SELECT name FROM habits)
+                      AND name NOT IN (SELECT row_key FROM change_log WHERE table_name = 'habits')
+                    ''')
+                cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('pruned_seq', ?)", (watermark,))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                conn.close()
+        return deleted
+
+    # Reading changes
+    def get_changes(self, since=None, exclude_origin=None):
+        """
+        Collect the current state of every row changed after the given cursor.
+
+        Several changes to the same row collapse into one entry. Rows whose latest change came
+        from exclude_origin are left out, since that peer already has them. When the cursor is
+        older than the pruned part of a log, every row of that table is returned instead.
+
+        Args:
+            since (dict, optional): {'habits': seq, 'completions': seq} already seen by the receiver
+            exclude_origin (str, optional): Device ID of the receiver
+
+        Returns:
+            dict: {'device_id', 'cursor', 'habits': [...], 'completions': [...]}
+        """
+        since = since or {'habits': 0, 'completions': 0}
+        cursor_position = self.get_cursor()
+
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        try:
+            self._check_habit_names(cursor)
+        except ValueError:
+            conn.close()
+            raise
+
+        if since['habits'] < self._pruned_seq(cursor):
+            # Snapshot: every habit, plus the tombstones of deleted and renamed ones
+            cursor.execute("SELECT name FROM habit_versions")
+            changed_names = [row['name'] for row in cursor.fetchall()]
+        else:
+            # SQLite returns the bare origin column from the row holding MAX(seq)
+            cursor.execute('''
+            SELECT row_key, origin, MAX(seq) FROM change_log
+            WHERE table_name = 'habits' AND seq > ? AND seq <= ?
+            GROUP BY row_key
+            ''', (since['habits'], cursor_position['habits']))
+            changed_names = [row['row_key'] for row in cursor.fetchall() if row['origin'] != exclude_origin]
+
+        habit_names = {row['id']: row['name'] for row in cursor.execute("SELECT id, name FROM habits")}
+        completion_counts = self._completion_counts()
+
+        habit_changes = []
+        for name in changed_names:
+            cursor.execute("SELECT changed_at, origin, renamed_to FROM habit_versions WHERE name = ?", (name,))
+            version = cursor.fetchone()
+            cursor.execute("SELECT * FROM habits WHERE name = ?", (name,))
+            habit_row = cursor.fetchone()
+
+            if not habit_row:
+                habit_changes.append({'name': name, 'deleted': True, 'renamed_to': version['renamed_to'],
+                                      'changed_at': version['changed_at'], 'origin': version['origin']})
+                continue
+
+            habit = dict(habit_row)
+            cursor.execute("SELECT time FROM preferred_times WHERE habit_id = ? ORDER BY time", (habit['id'],))
+            habit_changes.append({
+                'name': name,
+                'deleted': False,
+                'changed_at': version['changed_at'],
+                'origin': version['origin'],
+                'fields': {field: habit[field] for field in HABIT_FIELDS},
+                'preferred_times': [row['time'] for row in cursor.fetchall()],
+                'created_at': habit['created_at'],
+                'reward_balance': habit['reward_balance'],
+                'completion_count': completion_counts.get(habit['id'], 0)
+            })
+        conn.close()
+
+        conn = storage.connect(self.habit_tracker.completions_db_file)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        completion_changes = []
+        if since['completions'] < self._pruned_seq(cursor):
+            # Snapshot: every completion, archived ones included, so completion_count and
+            # reward_balance above add up on the receiving side
+            rows = [dict(row) for row in cursor.execute("SELECT * FROM habit_completions")]
+            rows += self._archived_completions({row['sync_id'] for row in rows})
+            completion_changes = [self._completion_change(row, habit_names) for row in rows
+                                  if row['habit_id'] in habit_names]
+        else:
+            cursor.execute('''
+            SELECT row_key, origin, MAX(seq) FROM change_log
+            WHERE table_name = 'habit_completions' AND seq > ? AND seq <= ?
+            GROUP BY row_key
+            ''', (since['completions'], cursor_position['completions']))
+            # Rows moved to the cold archive (origin 'archive') were not really deleted
+            changed_ids = [row['row_key'] for row in cursor.fetchall() if row['origin'] not in (exclude_origin, 'archive')]
+
+            for sync_id in changed_ids:
+                cursor.execute("SELECT * FROM habit_completions WHERE sync_id = ?", (sync_id,))
+                row = cursor.fetchone()
+                if not row:
+                    completion_changes.append({'sync_id': sync_id, 'deleted': True})
+                elif row['habit_id'] in habit_names:
+                    completion_changes.append(self._completion_change(row, habit_names))
+        conn.close()
+
+        return {
+            'device_id': self.device_id,
+            'cursor': cursor_position,
+            'habits': habit_changes,
+            'completions': completion_changes
+        }
+
+    def _completion_change(self, row, habit_names):
+        return {
+            'sync_id': row['sync_id'],
+            'deleted': False,
+            'habit_name': habit_names[row['habit_id']],
+            'completion_time': row['completion_time'],
+            'duration_seconds': row['duration_seconds'],
+            'notes': row['notes']
+        }
+
+    def _archived_completions(self, hot_sync_ids):
+        """
+        Archived completions not also in the hot table, each with a sync ID.
+
+        Blocks archived before change tracking was installed have no sync IDs; those rows get one
+        derived from this device and the row ID, which stays the same across snapshots.
+        """
+        rows = []
+        for row in self.habit_tracker.archive.read():
+            if row.get('sync_id') is None:
+                row['sync_id'] = f"{self.device_id}-{row['id']}"
+            if row['sync_id'] not in hot_sync_ids:
+                rows.append(row)
+        return rows
+
+    def _check_habit_names(self, cursor):
+        """Raise ValueError when two accounts share a habit name, which matching by name can't tell apart."""
+        cursor.execute("SELECT name FROM habits GROUP BY name HAVING COUNT(*) > 1 LIMIT 1")
+        row = cursor.fetchone()
+        if row:
+            raise ValueError(f"Habit name '{row[0]}' is used by more than one account; "
+                             "delta sync matches habits by name, so sync each account from its own data directory")
+
+    def _completion_counts(self):
+        # Archived completions count too, so reward balances stay comparable across devices
+        return {habit_id: count for habit_id, (count, duration) in self.habit_tracker.get_completion_totals().items()}
+
+    # Applying changes
+    def apply_changes(self, changes):
+        """
+        Merge a peer's changes into this store and remember its cursor.
+
+        Args:
+            changes (dict): Output of the peer's get_changes
+
+        Returns:
+            dict: Counts of applied habit and completion changes
+        """
+        peer_id = changes['device_id']
+        completion_counts = self._completion_counts()
+        touched = set()      # local habit IDs whose derived fields must be recomputed
+        remote_bonus = {}    # habit name -> peer's reward_balance beyond completion rewards
+        deleted_habit_ids = []
+        applied_habits = 0
+
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+
+        try:
+            self._check_habit_names(cursor)
+            account_id = self.habit_tracker._new_row_account_id()
+            local_bonus = {
+                row['id']: row['reward_balance'] - COMPLETION_REWARD * completion_counts.get(row['id'], 0)
+                for row in cursor.execute("SELECT id, reward_balance FROM habits")
+            }
+
+            # Renames arrive as a tombstone for the old name; handle them before the new name's upsert
+            habit_changes = sorted(changes['habits'], key=lambda change: not change.get('renamed_to'))
+
+            for change in habit_changes:
+                name = change['name']
+                cursor.execute("SELECT changed_at, origin FROM habit_versions WHERE name = ?", (name,))
+                local_version = cursor.fetchone()
+                remote_is_newer = (not local_version or
+                                   (change['changed_at'], change['origin']) >
+                                   (local_version['changed_at'], local_version['origin']))
+
+                cursor.execute("SELECT id FROM habits WHERE name = ?", (name,))
+                habit_row = cursor.fetchone()
+
+                if not change['deleted']:
+                    remote_bonus[name] = (change['reward_balance'] -
+                                          COMPLETION_REWARD * change['completion_count'])
+                    if habit_row:
+                        touched.add(habit_row['id'])
+
+                if not remote_is_newer:
+                    continue
+
+                # Record the change with the peer's version so it stays comparable everywhere
+                self._set_context(cursor, change['origin'], change['changed_at'])
+                applied_habits += 1
+
+                if change['deleted'] and change.get('renamed_to') and habit_row:
+                    cursor.execute("SELECT 1 FROM habits WHERE name = ?", (change['renamed_to'],))
+                    if not cursor.fetchone():
+                        # Keep the habit (and its completions), just under its new name
+                        cursor.execute("UPDATE habits SET name = ? WHERE id = ?", (change['renamed_to'], habit_row['id']))
+                        continue
+
+                if change['deleted']:
+                    if habit_row:
+                        cursor.execute("DELETE FROM preferred_times WHERE habit_id = ?", (habit_row['id'],))
+                        cursor.execute("DELETE FROM habits WHERE id = ?", (habit_row['id'],))
+                        deleted_habit_ids.append(habit_row['id'])
+                        touched.discard(habit_row['id'])
+                    else:
+                        cursor.execute(
+                            "INSERT OR REPLACE INTO habit_versions (name, changed_at, origin, renamed_to) VALUES (?, ?, ?, ?)",
+                            (name, change['changed_at'], change['origin'], change.get('renamed_to'))
+                        )
+                        # Logged like a local delete, so it is passed on and pruned with the log
+                        cursor.execute(
+                            "INSERT INTO change_log (table_name, row_key, origin, changed_at) VALUES ('habits', ?, ?, ?)",
+                            (name, change['origin'], change['changed_at'])
+                        )
+                    continue
+
+                fields = dict(change['fields'], duration_seconds=_whole_seconds(change['fields']['duration_seconds']))
+                if habit_row:
+                    habit_id = habit_row['id']
+                    cursor.execute(
+                        f"UPDATE habits SET {', '.join(f'{field} = ?' for field in HABIT_FIELDS)} WHERE id = ?",
+                        [fields[field] for field in HABIT_FIELDS] + [habit_id]
+                    )
+                    cursor.execute("DELETE FROM preferred_times WHERE habit_id = ?", (habit_id,))
+                else:
+                    cursor.execute(f'''
+                    INSERT INTO habits (name, {', '.join(HABIT_FIELDS)}, created_at, streak, reward_balance, account_id)
+                    VALUES (?, ?, ?, ?, ?, ?, 1, 0.0, ?)
+                    ''', [name] + [fields[field] for field in HABIT_FIELDS] + [to_epoch(change['created_at']), account_id])
+                    habit_id = cursor.lastrowid
+                    local_bonus[habit_id] = 0.0
+                    touched.add(habit_id)
+
+                cursor.executemany(
+                    "INSERT INTO preferred_times (habit_id, time) VALUES (?, ?)",
+                    [(habit_id, time_str) for time_str in change['preferred_times']]
+                )
+
+            self._reset_context(cursor)
+            conn.commit()
+
+            habit_ids = {row['name']: row['id'] for row in cursor.execute("SELECT id, name FROM habits")}
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+        applied_completions = self._apply_completion_changes(
+            changes['completions'], peer_id, habit_ids, deleted_habit_ids, touched
+        )
+        self._recompute_derived(touched, habit_ids, local_bonus, remote_bonus, peer_id)
+        self._set_peer_cursor(peer_id, changes['cursor'])
+        if applied_completions:
+            self.habit_tracker._assign_completion_accounts()
+        if applied_habits or applied_completions:
+            self.habit_tracker._notify_habit_changed(None)
+
+        return {'habits': applied_habits, 'completions': applied_completions}
+
+    def _apply_completion_changes(self, completion_changes, peer_id, habit_ids, deleted_habit_ids, touched):
+        conn = storage.connect(self.habit_tracker.completions_db_file)
+        cursor = conn.cursor()
+        applied = 0
+        # Sync IDs already moved to the archive, read on the first change old enough to be there
+        archived_until = self.habit_tracker.archive.archived_until()
+        archived_ids = None
+
+        try:
+            self._set_context(cursor, peer_id)
+
+            # Completions of habits deleted by the peer go with them
+            cursor.executemany("DELETE FROM habit_completions WHERE habit_id = ?",
+                               [(habit_id,) for habit_id in deleted_habit_ids])
+
+            for change in completion_changes:
+                cursor.execute("SELECT habit_id FROM habit_completions WHERE sync_id = ?", (change['sync_id'],))
+                existing = cursor.fetchone()
+
+                if change['deleted']:
+                    if existing:
+                        cursor.execute("DELETE FROM habit_completions WHERE sync_id = ?", (change['sync_id'],))
+                        touched.add(existing[0])
+                        applied += 1
+                    continue
+
+                habit_id = habit_ids.get(change['habit_name'])
+                completion_time = to_epoch(change['completion_time'])
+                if not existing and archived_until is not None and completion_time <= archived_until:
+                    if archived_ids is None:
+                        archived_ids = {row.get('sync_id') for row in self.habit_tracker.archive.read()}
+                    existing = change['sync_id'] in archived_ids
+                if existing or habit_id is None:
+                    # Already merged (possibly archived since), or the habit was deleted here
+                    continue
+
+                cursor.execute('''
+                INSERT INTO habit_completions (habit_id, completion_time, duration_seconds, notes, sync_id)
+                VALUES (?, ?, ?, ?, ?)
+                ''', (habit_id, completion_time, _whole_seconds(change['duration_seconds']),
+                      change['notes'], change['sync_id']))
+                touched.add(habit_id)
+                applied += 1
+
+            self._reset_context(cursor)
+            conn.commit()
+            return applied
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+    def _recompute_derived(self, touched, habit_ids, local_bonus, remote_bonus, peer_id):
+        """Recompute streak, last_completed and reward_balance of touched habits from merged completions."""
+        if not touched:
+            return
+
+        habit_names = {habit_id: name for name, habit_id in habit_ids.items()}
+        touched = [habit_id for habit_id in touched if habit_id in habit_names]
+
+        completion_times = self.habit_tracker._get_completion_times()
+
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+
+        try:
+            self._set_context(cursor, peer_id)
+            for habit_id in touched:
+                cursor.execute("SELECT * FROM habits WHERE id = ?", (habit_id,))
+                habit = cursor.fetchone()
+                times = completion_times.get(habit_id, [])
+
+                streak = self.habit_tracker._compute_streak(times, habit['frequency_type'], habit['streak_reset_at'])
+                last_completed = times[-1] if times else None
+                bonus = max(local_bonus.get(habit_id, 0.0),
+                            remote_bonus.get(habit_names[habit_id], float('-inf')))
+                reward_balance = round(COMPLETION_REWARD * len(times) + bonus, 2)
+
+                # Skip no-op writes so they don't add change-log entries
+                if (habit['streak'], habit['last_completed'], habit['reward_balance']) != \
+                        (streak, last_completed, reward_balance):
+                    cursor.execute(
+                        "UPDATE habits SET streak = ?, last_completed = ?, reward_balance = ? WHERE id = ?",
+                        (streak, last_completed, reward_balance, habit_id)
+                    )
+
+            self._reset_context(cursor)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+    def _set_context(self, cursor, origin, changed_at=None):
+        cursor.execute("UPDATE sync_state SET value = ? WHERE key = 'origin'", (origin,))
+        cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('changed_at', ?)", (changed_at,))
+
+    def _reset_context(self, cursor):
+        cursor.execute("UPDATE sync_state SET value = ? WHERE key = 'origin'", (self.device_id,))
+        cursor.execute("DELETE FROM sync_state WHERE key = 'changed_at'")
+
+    # Protocol
+    def handle_pull(self, request):
+        """Answer a peer's pull: our changes it hasn't seen, plus what we've applied from it."""
+        peer_id = request['device_id']
+        since = request['clock'].get(self.device_id)
+        response = self.get_changes(since, exclude_origin=peer_id)
+        response['acked'] = self.get_peer_cursor(peer_id)
+        if since:
+            self._set_peer_acked(peer_id, since)
+            self.prune_change_log()
+        return response
+
+    def handle_push(self, request):
+        """Apply changes pushed by a peer."""
+        return self.apply_changes(request)
+
+    def sync(self, transport):
+        """
+        Run one pull/push round with a peer.
+
+        Args:
+            transport: Object with pull(request) and push(request) methods reaching the peer
+
+        Returns:
+            dict: Counts of pulled and pushed changes
+        """
+        response = transport.pull({'device_id': self.device_id, 'clock': self.get_clock()})
+        pulled = self.apply_changes(response)
+
+        changes = self.get_changes(response['acked'], exclude_origin=response['device_id'])
+        pushed = transport.push(changes)
+
+        # The peer has now applied everything up to the cursor we pushed
+        self._set_peer_acked(response['device_id'], changes['cursor'])
+        self.prune_change_log()
+
+        return {'peer_id': response['device_id'], 'pulled': pulled, 'pushed': pushed}
+
+
+class InProcessTransport:
+    """Transport that calls another engine directly, round-tripping messages through JSON like a network would."""
+
+    def __init__(self, remote_engine):
+        self.remote_engine = remote_engine
+
+    def pull(self, request):
+        return self._round_trip(self.remote_engine.handle_pull, request)
+
+    def push(self, request):
+        return self._round_trip(self.remote_engine.handle_push, request)
+
+    def _round_trip(self, handler, request):
+        response = handler(json.loads(json.dumps(request)))
+        return json.loads(json.dumps(response))
@@ -6,6 +6,7 @@ os.chdir(application_path)
 ################################
 
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.uix.screenmanager import ScreenManager, Screen, SlideTransition
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
@@ -16,54 +17,29 @@ from kivy.core.window import Window
 from kivy.utils import get_color_from_hex
 from kivy.metrics import dp
 from kivy.uix.popup import Popup
-import json
 import webbrowser
 
 from main import HabitTracker
+from sync_queue import SyncWorker
+from maintenance import MaintenanceScheduler
+from rollover import RolloverScheduler
+from reminders import ReminderScheduler, KivyPopupNotifier, PlyerNotifier
+from settings import get_settings
+from theme import get_theme
 
-# Load settings from JSON file
-def load_settings():
-    try:
-        with open("settings.json", "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        # If settings.json doesn't exist, create it with default values
-        default_settings = {
-            "background_color": "white",
-            "button_color": "blue"
-        }
-        with open("settings.json", "w") as file:
-            json.dump(default_settings, file)
-        return default_settings
+# Settings are read once and shared by every screen (see settings.py)
+settings = get_settings()
 
-# Save settings to JSON file
-def save_settings(settings):
-    with open("settings.json", "w") as file:
-        json.dump(settings, file)
-
-# Load settings
-settings = load_settings()
-
-# Set window size and color based on settings
+# Set window size; the theme sets the window color from the settings and keeps it updated
 Window.size = (400, 600)
-Window.clearcolor = get_color_from_hex({
-    "white": "#FFFFFF",
-    "gray": "#CCCCCC",
-    "black": "#000000",
-    "dark gray": "#666666"
-}.get(settings["background_color"], "#FFFFFF"))
+theme = get_theme()
 
 # Material design button class
 class MDButton(Button):
     def __init__(self, **kwargs):
         super(MDButton, self).__init__(**kwargs)
         self.background_normal = ""
-        self.background_color = get_color_from_hex({
-            "blue": "#2196F3",
-            "green": "#088F8F",
-            "pink": "#E91E63",
-            
-        }.get(settings["button_color"], "#2196F3"))
+        theme.bind_color(self)
         self.color = get_color_from_hex("#FFFFFF")
         self.size_hint_y = None
         self.height = dp(50)
@@ -74,12 +50,7 @@ class MDCardButton(Button):
     def __init__(self, **kwargs):
         super(MDCardButton, self).__init__(**kwargs)
         self.background_normal = ""
-        self.background_color = get_color_from_hex({
-            "blue": "#2196F3",
-            "green": "#088F8F",
-            "pink": "#E91E63",
-            
-        }.get(settings["button_color"], "#2196F3"))
+        theme.bind_color(self)
         self.color = get_color_from_hex("#FFFFFF")
         self.font_size = dp(18)
         self.size_hint = (1, 1)
@@ -147,9 +118,13 @@ class LoginScreen(Screen):
             # Open the URL with the email as a query parameter
             webbrowser.open(f"https://radicool.club/habit-tracker-page?username={email}")
             
-            # Add the email to the SQLite database
+            # Add the email to the SQLite database, or sign back in to it
             tracker = HabitTracker()
-            tracker.add_account(email)
+            account = tracker.get_user_by_email(email)
+            if account:
+                tracker.switch_account(account['id'])
+            else:
+                tracker.add_account(email)
             
             # Set transition direction and switch screen
             self.manager.transition = SlideTransition(direction='left')
@@ -244,16 +219,6 @@ class MainMenuScreen(Screen):
         
         self.add_widget(self.layout)
     
-    def update_colors(self):
-        """Update button colors based on settings."""
-        settings = load_settings()
-        for button in [self.habits_button, self.add_habit_button, self.history_button, self.settings_button]:
-            button.background_color = get_color_from_hex({
-                "blue": "#2196F3",
-                "green": "#088F8F",
-                "pink": "#E91E63",
-            }.get(settings["button_color"], "#2196F3"))
-    
     def navigate_to(self, screen_name):
         # Set transition direction for navigating to section screens (left)
         self.manager.transition = SlideTransition(direction='left')
@@ -298,6 +263,46 @@ class HabitTrackerApp(App):
         sm.add_widget(AddHabitPage(name='add_habit'))
         
         return sm
+    
+    def on_start(self):
+        # Periodic database upkeep in small time-boxed steps
+        self.maintenance = MaintenanceScheduler(HabitTracker())
+        self.maintenance.start()
+        
+        # Remind the user at each habit's preferred times (native notifications when plyer is installed)
+        try:
+            notifier = PlyerNotifier()
+        except ImportError:
+            notifier = KivyPopupNotifier()
+        self.reminders = ReminderScheduler(HabitTracker(), notifier=notifier)
+        self.reminders.start()
+        
+        # Settle streaks at every day/week/month/year boundary, starting with any that passed while closed
+        self.rollover = RolloverScheduler(HabitTracker(), on_rollover=self.on_rollover)
+        self.rollover.start()
+        
+        # Report completions and redemptions in the background when a sync endpoint is configured
+        self.sync_worker = None
+        if settings.get("sync_endpoint"):
+            self.sync_worker = SyncWorker(HabitTracker(), settings["sync_endpoint"])
+            self.sync_worker.start()
+    
+    def on_stop(self):
+        settings.flush()
+        self.maintenance.stop()
+        self.reminders.stop()
+        self.rollover.stop()
+        if self.sync_worker:
+            self.sync_worker.stop()
+
+    def on_rollover(self, result):
+        # Called on the scheduler thread; the habits page is refreshed on the UI thread
+        Clock.schedule_once(lambda dt: self.refresh_habits_page())
+    
+    def refresh_habits_page(self):
+        habits_page = self.root.get_screen('habits')
+        habits_page.initialize_daily_habits_tracking()
+        habits_page.load_habits()
 
 if __name__ == '__main__':
     HabitTrackerApp().run()
\ No newline at end of file
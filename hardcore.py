@@ -0,0 +1,154 @@
+"""
+Hardcore mode: a habit must be completed frequency_count times in every period, or its streak
+resets to 1, the value of a broken streak everywhere else in the app.
+
+Habits opt in through habits.hardcore_since (set by add_habit(hardcore=True) or
+update_habit(hardcore=True)). Only periods that start at or after that moment are enforced, so
+turning hardcore mode on never punishes earlier, partial periods.
+
+Enforcement runs at period rollover over the periods that ended since the previous run. The
+completion counts of all hardcore habits in all of those periods come from one aggregate query
+(GROUP BY habit, period) with the completions database attached, and the failing habits are
+reset with one bulk UPDATE. The end of the evaluated range is stored in rollover_state, so
+running it again for the same moment does nothing and a run after a long gap catches up on
+every period it missed.
+
+A reset is stamped in habits.streak_reset_at with the end of the habit's last failed period, not
+the moment of the enforcement, so a rollover that runs late keeps the completions recorded since
+that period ended. Completions before the stamp never count towards the streak again:
+record_completion doesn't chain across it, and HabitTracker._compute_streak, which
+recompute_streaks and delta sync rebuild streaks with, only replays the completions after it. So
+neither can bring a penalized streak back.
+
+Completions that were already moved to the archive (older than a year) are not counted.
+"""
+import periods
+
+COMPLETIONS_ALIAS = "completions_db"
+
+
+def ensure_schema(cursor):
+    """Create the rollover state table (the hardcore_since column is part of the habits table)."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS rollover_state (
+        name TEXT PRIMARY KEY,
+        evaluated_until INTEGER NOT NULL
+    )
+    ''')
+
+
+def get_evaluated_until(cursor, name):
+    row = cursor.execute("SELECT evaluated_until FROM rollover_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def set_evaluated_until(cursor, name, until):
+    cursor.execute('''
+    INSERT INTO rollover_state (name, evaluated_until) VALUES (?, ?)
+    ON CONFLICT(name) DO UPDATE SET evaluated_until = MAX(evaluated_until, excluded.evaluated_until)
+    ''', (name, until))
+
+
+def find_failures(cursor, since, until):
+    """
+    Hardcore habits that fell short in a period that ended after `since` and by `until`.
+
+    The cursor's connection is the habits database with the completions database attached as
+    completions_db.
+
+    Returns:
+        dict: habit ID -> list of (period key, completions, required) for each failed period
+    """
+    cursor.execute('''
+    SELECT id, frequency_type, frequency_count, hardcore_since
+    FROM habits WHERE hardcore_since IS NOT NULL
+    ''')
+    habits = cursor.fetchall()
+    if not habits:
+        return {}
+
+    # The periods to check, shared by all habits of a frequency type
+    periods_by_type = {
+        frequency_type: periods.periods_ending_between(since, until, frequency_type)
+        for frequency_type in {habit[1] for habit in habits}
+    }
+    starts = [period_list[0][1] for period_list in periods_by_type.values() if period_list]
+    if not starts:
+        return {}
+
+    # One pass over the completions in the evaluated range, counted per habit and period
+    cursor.execute(f'''
+    SELECT c.habit_id, {periods.period_key_sql('c.completion_time', 'h.frequency_type')} AS period, COUNT(*)
+    FROM {COMPLETIONS_ALIAS}.habit_completions AS c
+    JOIN habits AS h ON h.id = c.habit_id
+    WHERE h.hardcore_since IS NOT NULL AND c.completion_time >= ? AND c.completion_time < ?
+    GROUP BY c.habit_id, period
+    ''', (min(starts), until))
+    counts = {(habit_id, period): count for habit_id, period, count in cursor.fetchall()}
+
+    failures = {}
+    for habit_id, frequency_type, frequency_count, hardcore_since in habits:
+        for key, start, end in periods_by_type[frequency_type]:
+            if start < hardcore_since:
+                continue
+            completed = counts.get((habit_id, key), 0)
+            if completed < frequency_count:
+                failures.setdefault(habit_id, []).append((key, completed, frequency_count))
+    return failures
+
+
+def failed_period_ends(cursor, failures):
+    """
+    Epoch seconds at which each habit's last failed period ended: the moment its reset takes effect.
+
+    Args:
+        failures (dict): habit ID -> failed periods, as returned by find_failures
+    """
+    frequency_types = dict(cursor.execute("SELECT id, frequency_type FROM habits WHERE hardcore_since IS NOT NULL"))
+    return {habit_id: periods.period_end(failed[-1][0], frequency_types[habit_id])
+            for habit_id, failed in failures.items()}
+
+
+def reset_streaks(cursor, reset_times):
+    """
+    Reset streaks to 1 in one statement.
+
+    Args:
+        reset_times (dict): habit ID -> epoch seconds the reset takes effect at (streak_reset_at)
+    """
+    if reset_times:
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS reset_times (id INTEGER PRIMARY KEY, reset_at INTEGER NOT NULL)")
+        cursor.execute("DELETE FROM reset_times")
+        cursor.executemany("INSERT OR REPLACE INTO reset_times (id, reset_at) VALUES (?, ?)", reset_times.items())
+        cursor.execute('''
+        UPDATE habits SET streak = 1, streak_reset_at = MAX(
+            COALESCE(streak_reset_at, 0), (SELECT reset_at FROM reset_times WHERE reset_times.id = habits.id))
+        WHERE id IN (SELECT id FROM reset_times)
+        ''')
+    return len(reset_times)
+
+
+def enforce(cursor, until):
+    """
+    Evaluate every hardcore period that ended since the last run and reset the failing streaks.
+
+    Runs inside the caller's transaction; the caller commits.
+
+    Returns:
+        dict: habit ID -> failed periods (see find_failures) for the habits that were reset
+    """
+    ensure_schema(cursor)
+    since = get_evaluated_until(cursor, 'hardcore')
+    if since is None:
+        # First run: nothing before the earliest opt-in can have failed
+        row = cursor.execute("SELECT MIN(hardcore_since) FROM habits").fetchone()
+        if row[0] is None:
+            return {}
+        since = row[0]
+    if until <= since:
+        return {}
+
+    failures = find_failures(cursor, since, until)
+    reset_streaks(cursor, failed_period_ends(cursor, failures))
+    set_evaluated_until(cursor, 'hardcore', until)
+    return failures
@@ -0,0 +1,232 @@
+"""
+Opt-in instrumentation for HabitTracker.
+
+    instrumentation = Instrumentation()
+    instrumentation.attach(tracker)
+    ...
+    instrumentation.export("metrics.prom")   # or "metrics.json"
+
+While attached, every public HabitTracker method is wrapped to record its call count and a
+latency histogram. Each connection the tracker opens (through HabitTracker._connect) counts the
+SQL statements it runs (sqlite3 trace callback) and the rows it returns (a wrapped row factory),
+through the listener hooks of InstrumentedConnection.
+Connections, statements and rows are attributed to every instrumented method on the call stack,
+so record_completion's count includes the connections opened by the get_habit calls it makes.
+
+Nothing is wrapped until attach() is called, so a tracker without instrumentation runs exactly
+as before. cli.py enables it with --metrics FILE.
+"""
+import functools
+import inspect
+import json
+import sqlite3
+import threading
+import time
+
+import storage
+
+# Upper bounds (seconds) of the latency histogram buckets, Prometheus style
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, float('inf'))
+
+
+class MethodStats:
+    """Counters for one method."""
+
+    __slots__ = ('calls', 'errors', 'total_seconds', 'buckets', 'connections', 'statements', 'rows')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.connections = 0
+        self.statements = 0
+        self.rows = 0
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_seconds': round(self.total_seconds, 6),
+            'latency_buckets': {
+                ('+Inf' if bound == float('inf') else str(bound)): count
+                for bound, count in zip(LATENCY_BUCKETS, self.buckets)
+            },
+            'connections': self.connections,
+            'sql_statements': self.statements,
+            'rows_returned': self.rows,
+        }
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection with listener hooks shared by Instrumentation and the SQL profiler.
+
+    trace_listeners are called with each executed statement (through the sqlite3 trace callback)
+    and row_listeners with each returned row (through whatever row factory the caller sets).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.trace_listeners = []
+        self.row_listeners = []
+        self._user_row_factory = None
+        self.set_trace_callback(self._dispatch_trace)
+        self.row_factory = None
+
+    def _dispatch_trace(self, statement):
+        for listener in self.trace_listeners:
+            listener(statement)
+
+    @property
+    def row_factory(self):
+        return self._user_row_factory
+
+    @row_factory.setter
+    def row_factory(self, factory):
+        self._user_row_factory = factory
+        listeners = self.row_listeners
+
+        def counting_factory(cursor, row):
+            for listener in listeners:
+                listener(cursor, row)
+            return factory(cursor, row) if factory is not None else row
+
+        sqlite3.Connection.row_factory.__set__(self, counting_factory)
+
+
+class Instrumentation:
+    """Collects per-method metrics for the HabitTracker instances it is attached to."""
+
+    def __init__(self):
+        self.methods = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._attached = []
+
+    def attach(self, habit_tracker):
+        """Start instrumenting a tracker's public methods and connections."""
+        for name, method in inspect.getmembers(habit_tracker, inspect.ismethod):
+            if name.startswith('_'):
+                continue
+            setattr(habit_tracker, name, self._wrap(name, method))
+        habit_tracker.instrumentation = self
+        self._attached.append(habit_tracker)
+        return self
+
+    def detach(self):
+        """Remove the wrappers again; collected metrics are kept."""
+        for habit_tracker in self._attached:
+            for name in list(vars(habit_tracker)):
+                if getattr(getattr(habit_tracker, name), '_instrumented', False):
+                    delattr(habit_tracker, name)
+            habit_tracker.instrumentation = None
+        self._attached = []
+
+    def connect(self, db_file):
+        """Open a connection that reports its statements and rows (used by HabitTracker._connect)."""
+        return self.watch(storage.connect(db_file, factory=InstrumentedConnection))
+
+    def watch(self, conn):
+        """Start counting an InstrumentedConnection's statements and rows."""
+        conn.trace_listeners.append(lambda statement: self._record('statements', 1))
+        conn.row_listeners.append(lambda cursor, row: self._record('rows', 1))
+        self._record('connections', 1)
+        return conn
+
+    def _wrap(self, name, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            stack = self._stack()
+            stack.append(name)
+            start = time.perf_counter()
+            failed = False
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+                self._record_call(name, elapsed, failed)
+
+        wrapper._instrumented = True
+        return wrapper
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _stats(self, name):
+        stats = self.methods.get(name)
+        if stats is None:
+            stats = self.methods[name] = MethodStats()
+        return stats
+
+    def _record_call(self, name, elapsed, failed):
+        with self._lock:
+            stats = self._stats(name)
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_seconds += elapsed
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    stats.buckets[i] += 1
+                    break
+
+    def _record(self, counter, amount):
+        # Attribute to every distinct method on this thread's call stack
+        names = set(self._stack()) or {'(outside methods)'}
+        with self._lock:
+            for name in names:
+                stats = self._stats(name)
+                setattr(stats, counter, getattr(stats, counter) + amount)
+
+    # Export
+    def snapshot(self):
+        """All metrics as a JSON-serializable dict keyed by method name."""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in sorted(self.methods.items())}
+
+    def to_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+
+        def counter(metric, help_text, key):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, stats in snapshot.items():
+                lines.append(f'{metric}{{method="{name}"}} {stats[key]}')
+
+        counter("habit_tracker_calls_total", "Calls per HabitTracker method.", 'calls')
+        counter("habit_tracker_errors_total", "Calls that raised an exception.", 'errors')
+        counter("habit_tracker_connections_total", "SQLite connections opened.", 'connections')
+        counter("habit_tracker_sql_statements_total", "SQL statements executed.", 'sql_statements')
+        counter("habit_tracker_rows_returned_total", "Rows returned by queries.", 'rows_returned')
+
+        metric = "habit_tracker_call_duration_seconds"
+        lines.append(f"# HELP {metric} Latency of HabitTracker methods.")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, stats in snapshot.items():
+            if not stats['calls']:
+                continue
+            cumulative = 0
+            for bound, count in stats['latency_buckets'].items():
+                cumulative += count
+                lines.append(f'{metric}_bucket{{method="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{method="{name}"}} {stats["total_seconds"]}')
+            lines.append(f'{metric}_count{{method="{name}"}} {stats["calls"]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Write the metrics to path: Prometheus text for .prom/.txt files, JSON otherwise."""
+        if path.endswith((".prom", ".txt")):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+        with open(path, "w") as file:
+            file.write(content)
@@ -0,0 +1,366 @@
+"""
+Leaderboards over habit streaks and reward balances.
+
+Ranking habits straight from SQL means sorting (or counting through an index) for every "top 10"
+page and every "what's my rank" question. Instead, each habits database gets one Leaderboards
+object per account (plus one over every account, for trackers not bound to an account), shared by
+every HabitTracker using that file and account, holding one Leaderboard per metric:
+
+    * RankedList     a sorted list of (-value, habit ID) keys kept in buckets of about LOAD keys,
+                     with a Fenwick tree over the bucket sizes. Rank and positional lookups are
+                     O(log n); an insert or removal touches one bucket plus O(log n) tree nodes.
+    * Leaderboard    the current value of each habit plus its RankedList. Ranks are competition
+                     ranks: habits with equal values share a rank, ordered by habit ID on a page.
+
+The boards are loaded lazily on the first query, each with one ordered scan of its index
+(idx_habits_streak, idx_habits_reward_balance), so no sorting happens in Python. After that they
+are updated incrementally: record_completion, record_completions, use_bonus_code and
+update_reward_balance pass the new values in with habit_scored(), and on_habit_changed (a
+HabitTracker habit listener) refreshes single habits after add/update/delete and drops the boards
+after bulk changes (imports, sync, rollover) so the next query reloads them.
+
+Other processes (a second server, the CLI, a rollover job) write to the same file too. Triggers on
+the habits table append the ID of every habit whose streak or balance changes to
+leaderboard_changes, and each query first reads PRAGMA data_version on a dedicated connection, the
+way HabitAPIServer.get_habits_response does. When another connection has committed since the last
+check, only the logged habits are read back and re-ranked; a full reload happens only when the log
+was trimmed (it keeps the last CHANGES_KEPT entries) past what this process has applied.
+"""
+import threading
+from bisect import bisect_left, insort
+
+import storage
+from raffle import FenwickTree
+
+METRICS = ('streak', 'reward_balance')
+
+# Keys per bucket; buckets are split when they reach twice this size
+LOAD = 512
+
+# leaderboard_changes entries kept for processes that haven't caught up yet
+CHANGES_KEPT = 10_000
+
+_boards = {}
+_boards_lock = threading.Lock()
+
+
+def ensure_schema(cursor):
+    """Create the change log other processes' boards catch up from, and the triggers filling it."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS leaderboard_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        habit_id INTEGER NOT NULL
+    )
+    ''')
+    logged = "INSERT INTO leaderboard_changes (habit_id) VALUES ({}.id);"
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS leaderboard_habit_insert AFTER INSERT ON habits
+    BEGIN {logged.format("NEW")} END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS leaderboard_habit_update AFTER UPDATE OF streak, reward_balance ON habits
+    WHEN OLD.streak IS NOT NEW.streak OR OLD.reward_balance IS NOT NEW.reward_balance
+    BEGIN {logged.format("NEW")} END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS leaderboard_habit_delete AFTER DELETE ON habits
+    BEGIN {logged.format("OLD")} END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS leaderboard_changes_trim AFTER INSERT ON leaderboard_changes
+    BEGIN DELETE FROM leaderboard_changes WHERE seq <= NEW.seq - {CHANGES_KEPT}; END
+    ''')
+
+
+class RankedList:
+    """
+    Sorted list of unique keys with O(log n) rank (bisect_left) and positional (getitem) lookups.
+
+    Args:
+        keys (iterable, optional): Initial keys, already sorted
+    """
+
+    def __init__(self, keys=()):
+        keys = list(keys)
+        self._buckets = [keys[i:i + LOAD] for i in range(0, len(keys), LOAD)]
+        self._length = len(keys)
+        self._reindex()
+
+    def _reindex(self):
+        """Rebuild the bucket maxima and size tree after buckets were split or dropped."""
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._sizes = FenwickTree([len(bucket) for bucket in self._buckets])
+
+    def __len__(self):
+        return self._length
+
+    def add(self, key):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._length = 1
+            self._reindex()
+            return
+        index = min(bisect_left(self._maxes, key), len(self._buckets) - 1)
+        bucket = self._buckets[index]
+        insort(bucket, key)
+        self._length += 1
+        self._maxes[index] = bucket[-1]
+        if len(bucket) >= 2 * LOAD:
+            self._buckets[index:index + 1] = [bucket[:LOAD], bucket[LOAD:]]
+            self._reindex()
+        else:
+            self._sizes.update(index, len(bucket))
+
+    def remove(self, key):
+        """Remove key; raises ValueError when it isn't there."""
+        index = bisect_left(self._maxes, key)
+        bucket = self._buckets[index] if index < len(self._buckets) else []
+        position = bisect_left(bucket, key)
+        if position == len(bucket) or bucket[position] != key:
+            raise ValueError(f"{key!r} is not in the list")
+        del bucket[position]
+        self._length -= 1
+        if not bucket:
+            del self._buckets[index]
+            self._reindex()
+        else:
+            self._maxes[index] = bucket[-1]
+            self._sizes.update(index, len(bucket))
+
+    def bisect_left(self, key):
+        """Number of keys less than key."""
+        index = bisect_left(self._maxes, key)
+        if index == len(self._buckets):
+            return self._length
+        return self._sizes.prefix_sum(index) + bisect_left(self._buckets[index], key)
+
+    def __getitem__(self, position):
+        if not 0 <= position < self._length:
+            raise IndexError("RankedList index out of range")
+        index = self._sizes.find(position)
+        return self._buckets[index][position - self._sizes.prefix_sum(index)]
+
+    def slice(self, start, stop):
+        """Keys at positions start to stop (exclusive), walking the buckets from start."""
+        start, stop = max(start, 0), min(stop, self._length)
+        if start >= stop:
+            return []
+        index = self._sizes.find(start)
+        offset = start - self._sizes.prefix_sum(index)
+        keys = []
+        while len(keys) < stop - start:
+            keys.extend(self._buckets[index][offset:offset + stop - start - len(keys)])
+            index, offset = index + 1, 0
+        return keys
+
+
+class Leaderboard:
+    """
+    Habits ranked by one metric, highest first.
+
+    Args:
+        metric (str): 'streak' or 'reward_balance'
+        rows (iterable, optional): (habit ID, value) pairs ordered by value descending, then ID
+    """
+
+    def __init__(self, metric, rows=()):
+        self.metric = metric
+        rows = list(rows)
+        self._values = dict(rows)
+        self._keys = RankedList((-value, habit_id) for habit_id, value in rows)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def set(self, habit_id, value):
+        """Set a habit's value, adding it when it's new."""
+        old = self._values.get(habit_id)
+        if old == value and habit_id in self._values:
+            return
+        if habit_id in self._values:
+            self._keys.remove((-old, habit_id))
+        self._values[habit_id] = value
+        self._keys.add((-value, habit_id))
+
+    def remove(self, habit_id):
+        if habit_id in self._values:
+            self._keys.remove((-self._values.pop(habit_id), habit_id))
+
+    def value(self, habit_id):
+        return self._values.get(habit_id)
+
+    def rank_of_value(self, value):
+        """Competition rank of a value: 1 + the number of habits with a higher value."""
+        # (-value,) sorts before every (-value, habit_id) key
+        return self._keys.bisect_left((-value,)) + 1
+
+    def rank(self, habit_id):
+        """A habit's competition rank, or None if it isn't on the board."""
+        if habit_id not in self._values:
+            return None
+        return self.rank_of_value(self._values[habit_id])
+
+    def top(self, limit=10, offset=0):
+        """One page of the board as (rank, habit ID, value) tuples."""
+        page = []
+        for negated, habit_id in self._keys.slice(offset, offset + limit):
+            value = -negated
+            # Ties share a rank; only look it up again when the value changes
+            if not page or page[-1][2] != value:
+                rank = self.rank_of_value(value)
+            page.append((rank, habit_id, value))
+        return page
+
+
+class Leaderboards:
+    """
+    The leaderboards of one habits database, loaded on first use.
+
+    Args:
+        habits_db_file (str): Path to the habits database
+        account_id (int, optional): Only rank this account's habits (every habit when None)
+    """
+
+    def __init__(self, habits_db_file, account_id=None):
+        self.habits_db_file = habits_db_file
+        self.account_id = account_id
+        self.lock = threading.RLock()
+        self.boards = None
+        self.seq = 0  # Last leaderboard_changes entry reflected in the boards
+        self.data_version = None
+        self._version_conn = None
+
+    @property
+    def loaded(self):
+        return self.boards is not None
+
+    def ensure_current(self, connect):
+        """
+        Load the boards, or catch up with what other connections committed since the last call.
+
+        Args:
+            connect (callable): Opens a connection to the habits database (HabitTracker._connect)
+        """
+        with self.lock:
+            if self._version_conn is None:
+                self._version_conn = storage.connect(self.habits_db_file, check_same_thread=False)
+            # Read before the data so a commit landing in between is caught by the next call
+            data_version = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+            if self.loaded and data_version == self.data_version:
+                return
+            conn = connect(self.habits_db_file)
+            try:
+                if not (self.loaded and self.catch_up(conn.cursor())):
+                    self.load(conn.cursor())
+            finally:
+                conn.close()
+            self.data_version = data_version
+
+    def load(self, cursor):
+        """Build every board from one ordered index scan per metric, in one read transaction."""
+        boards = {}
+        cursor.execute("BEGIN")
+        try:
+            seq = cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM leaderboard_changes").fetchone()[0]
+            account_filter, params = ("", ()) if self.account_id is None else ("WHERE account_id = ?", (self.account_id,))
+            for metric in METRICS:
+                cursor.execute(f"SELECT id, {metric} FROM habits {account_filter} ORDER BY {metric} DESC, id", params)
+                boards[metric] = Leaderboard(metric, cursor.fetchall())
+        finally:
+            cursor.connection.rollback()
+        with self.lock:
+            self.boards = boards
+            self.seq = seq
+
+    def catch_up(self, cursor):
+        """
+        Re-rank the habits logged in leaderboard_changes since the boards were last brought up to date.
+
+        Returns:
+            bool: False when entries this process never applied were already trimmed, so load instead
+        """
+        cursor.execute("BEGIN")
+        try:
+            changes = cursor.execute("SELECT seq, habit_id FROM leaderboard_changes WHERE seq > ? ORDER BY seq",
+                                     (self.seq,)).fetchall()
+            if not changes:
+                return True
+            if changes[0][0] != self.seq + 1:
+                return False
+            habit_ids = list({habit_id for _, habit_id in changes})
+            placeholders = ", ".join("?" for _ in habit_ids)
+            cursor.execute(f"SELECT id, streak, reward_balance, account_id FROM habits WHERE id IN ({placeholders})",
+                           habit_ids)
+            habits = {row[0]: {'id': row[0], 'streak': row[1], 'reward_balance': row[2], 'account_id': row[3]}
+                      for row in cursor.fetchall()}
+        finally:
+            cursor.connection.rollback()
+        with self.lock:
+            for habit_id in habit_ids:
+                if habit_id in habits and self.ranks(habits[habit_id]):
+                    self.update(habits[habit_id])
+                else:
+                    self.remove(habit_id)
+            self.seq = changes[-1][0]
+        return True
+
+    def ranks(self, habit):
+        """Whether a habit (a dict with account_id) belongs on these boards."""
+        return self.account_id is None or habit.get('account_id') == self.account_id
+
+    def invalidate(self):
+        with self.lock:
+            self.boards = None
+
+    def update(self, habit):
+        """Apply a habit's current values (a dict with id, streak and reward_balance)."""
+        with self.lock:
+            if self.boards is None:
+                return
+            for metric in METRICS:
+                self.boards[metric].set(habit['id'], habit[metric])
+
+    def remove(self, habit_id):
+        with self.lock:
+            if self.boards is None:
+                return
+            for board in self.boards.values():
+                board.remove(habit_id)
+
+
+def get_leaderboards(habits_db_file, account_id=None):
+    """The shared Leaderboards for a habits database file and account (None for every account)."""
+    with _boards_lock:
+        boards = _boards.get((habits_db_file, account_id))
+        if boards is None:
+            boards = _boards[(habits_db_file, account_id)] = Leaderboards(habits_db_file, account_id)
+        return boards
+
+
+def _loaded_boards(habits_db_file):
+    """Every loaded Leaderboards of a habits database, whatever its account."""
+    with _boards_lock:
+        return [boards for (db_file, _), boards in _boards.items() if db_file == habits_db_file and boards.loaded]
+
+
+def habit_scored(habits_db_file, habit):
+    """Record a habit's new streak and balance (a dict with id, account_id, streak and reward_balance) on loaded boards."""
+    for boards in _loaded_boards(habits_db_file):
+        if boards.ranks(habit):
+            boards.update(habit)
+
+
+def on_habit_changed(habit_tracker, habit_id):
+    """HabitTracker habit listener keeping loaded boards in step with added, edited and deleted habits."""
+    all_boards = _loaded_boards(habit_tracker.habits_db_file)
+    if not all_boards:
+        return
+    # The tracker making the change can see the habit, so None means it was deleted
+    habit = habit_tracker.get_habit(habit_id) if habit_id is not None else None
+    for boards in all_boards:
+        if habit_id is None:
+            boards.invalidate()
+        elif habit is not None and boards.ranks(habit):
+            boards.update(habit)
+        else:
+            boards.remove(habit_id)
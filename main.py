@@ -1,43 +1,187 @@
 import os
+import json
+import secrets
 import sqlite3
 from datetime import datetime, time, timedelta
 import pathlib
 
+from archive import CompletionArchive
+from completion_store import CompletionColumns
+import hardcore
+import leaderboard
+import raffle
+import rollover
+import storage
+import timestamps
+from timestamps import to_epoch
+
+# Timestamp columns converted from ISO strings to epoch seconds by schema version 1
+HABITS_TIMESTAMP_COLUMNS = {
+    'habits': ['created_at', 'last_completed'],
+    'bonus_codes': ['created_at', 'expiry_date', 'used_at'],
+    'bonus_codes_archive': ['created_at', 'expiry_date', 'used_at', 'archived_at'],
+    'outbox': ['created_at'],
+}
+COMPLETIONS_TIMESTAMP_COLUMNS = {
+    'habit_completions': ['completion_time'],
+}
+SCHEMA_VERSION = 1
+
+
+def default_data_dir():
+    """Directory holding the database files: HABIT_TRACKER_DATA_DIR, else the script directory."""
+    return os.environ.get("HABIT_TRACKER_DATA_DIR", pathlib.Path(__file__).parent.absolute())
+
+
+def _ensure_column(cursor, table, column, declaration):
+    """Add a column that arrived after the first release to an existing table."""
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+def _whole_seconds(duration):
+    """Durations are stored as whole seconds (CompletionColumns keeps them in integer arrays)."""
+    return None if duration is None else int(duration)
+
+
+def _scope_habit_names(cursor):
+    """
+    Make habit names unique per account instead of across the whole database.
+
+    SQLite can't drop a column constraint, so older habits tables are rebuilt: a copy without
+    the name's UNIQUE and with UNIQUE (account_id, name) replaces the original, keeping its rows,
+    IDs, indexes and triggers (other modules' triggers included).
+    """
+    sql = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'habits'").fetchone()[0]
+    if "name TEXT NOT NULL UNIQUE" not in sql:
+        return
+    dependents = [row[0] for row in cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'habits' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+    )]
+    columns = ", ".join(row[1] for row in cursor.execute("PRAGMA table_info(habits)"))
+    rebuilt = sql.replace("name TEXT NOT NULL UNIQUE", "name TEXT NOT NULL").rstrip()
+    rebuilt = rebuilt[:rebuilt.rindex(")")] + ",\n    UNIQUE (account_id, name)\n)"
+    rebuilt = rebuilt.replace("CREATE TABLE habits", "CREATE TABLE habits_rebuilt", 1)
+
+    cursor.execute(rebuilt)
+    cursor.execute(f"INSERT INTO habits_rebuilt ({columns}) SELECT {columns} FROM habits")
+    cursor.execute("DROP TABLE habits")
+    # Keep triggers on other tables that mention habits from being checked while it's missing
+    cursor.execute("PRAGMA legacy_alter_table = ON")
+    cursor.execute("ALTER TABLE habits_rebuilt RENAME TO habits")
+    cursor.execute("PRAGMA legacy_alter_table = OFF")
+    for statement in dependents:
+        cursor.execute(statement)
+
+
 class HabitTracker:
-    def __init__(self):
-        """Initialize the habit tracker with SQLite databases in the script directory."""
+    # Callables listener(habit_tracker, habit_id) run after a habit is added, updated or deleted.
+    # habit_id is None when many habits may have changed at once (e.g. an import).
+    habit_listeners = []
+
+    # Set by Instrumentation.attach (see instrumentation.py); None means no overhead at all
+    instrumentation = None
+    # Set by SQLProfiler.attach (see sql_profiler.py); None means no overhead at all
+    sql_profiler = None
+
+    # The current account of each habits database, looked up once (see get_current_account)
+    _current_accounts = {}
+
+    def __init__(self, data_dir=None, account_id=None):
+        """
+        Initialize the habit tracker with SQLite databases.
+
+        Args:
+            data_dir (str, optional): Directory holding the database files. Defaults to the
+                                      HABIT_TRACKER_DATA_DIR environment variable, then the script directory.
+            account_id (int, optional): Limit the tracker to this account: listings, statistics,
+                                        leaderboards and raffles only include its habits, and
+                                        habits of other accounts are treated as not found.
+                                        By default every account's data is used.
+        """
         # Get the directory of the current script
         self.script_dir = pathlib.Path(__file__).parent.absolute()
-        
-        # Define database file paths relative to script directory
-        self.habits_db_file = os.path.join(self.script_dir, "habits_data.db")
-        self.completions_db_file = os.path.join(self.script_dir, "habit_completions.db")  # Initialize completions_db_file
+
+        # Databases live in the script directory unless told otherwise
+        if data_dir is None:
+            data_dir = default_data_dir()
+        self.data_dir = data_dir
+
+        # Encrypted data directories (see storage.py) unlock once per session
+        storage.unlock(data_dir, prompt=None)
+        self.account_id = account_id
+
+        # Define database file paths relative to the data directory
+        self.habits_db_file = os.path.join(self.data_dir, "habits_data.db")
+        self.completions_db_file = os.path.join(self.data_dir, "habit_completions.db")  # Initialize completions_db_file
+        # Old completions are moved here by archive_completions (see archive.py)
+        self.archive = CompletionArchive(os.path.join(self.data_dir, "habit_completions_archive.db"))
         
         # Initialize databases
         self._init_habits_database()
         self._init_completions_database()  
+        self._assign_completion_accounts()
+
+    def _connect(self, db_file):
+        """Open a database connection, instrumented and/or profiled when those are attached."""
+        if self.sql_profiler is not None:
+            conn = self.sql_profiler.connect(db_file)
+        elif self.instrumentation is not None:
+            return self.instrumentation.connect(db_file)
+        else:
+            return storage.connect(db_file)
+        if self.instrumentation is not None:
+            self.instrumentation.watch(conn)
+        return conn
 
     def _init_habits_database(self):
         """Initialize SQLite database for storing habits, bonus codes, and accounts."""
-        conn = sqlite3.connect(self.habits_db_file)
+        conn = self._connect(self.habits_db_file)
         cursor = conn.cursor()
         
+        # Let free pages be reclaimed a little at a time (only takes effect on a new file or after VACUUM)
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        
         # Create habits table if it doesn't exist
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS habits (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
             description TEXT,
             frequency_type TEXT NOT NULL,
             frequency_count INTEGER NOT NULL,
             duration_seconds INTEGER,
             streak INTEGER DEFAULT 1,
             reward_balance REAL DEFAULT 0.0,
-            created_at TIMESTAMP NOT NULL,
-            last_completed TIMESTAMP
+            created_at INTEGER NOT NULL,
+            last_completed INTEGER,
+            hardcore_since INTEGER,
+            streak_reset_at INTEGER,
+            account_id INTEGER REFERENCES accounts(id),
+            UNIQUE (account_id, name)
         )
         ''')
         
+        # Hardcore mode (see hardcore.py) and accounts arrived after the first release
+        _ensure_column(cursor, 'habits', 'hardcore_since', 'INTEGER')
+        _ensure_column(cursor, 'habits', 'streak_reset_at', 'INTEGER')
+        # Earlier resets wrote streak 0 without a stamp; keep the penalty from now on
+        cursor.execute(
+            "UPDATE habits SET streak = 1, streak_reset_at = COALESCE(streak_reset_at, ?) WHERE streak = 0",
+            (timestamps.now(),)
+        )
+        _ensure_column(cursor, 'habits', 'account_id', 'INTEGER REFERENCES accounts(id)')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_habits_account ON habits (account_id, id)")
+        
+        # Names are unique per account; habits not yet tied to an account share one namespace
+        _scope_habit_names(cursor)
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_habits_name_no_account ON habits (name) WHERE account_id IS NULL")
+        
+        # Leaderboards load with one ordered scan per metric (see leaderboard.py)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_habits_streak ON habits (streak DESC, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_habits_reward_balance ON habits (reward_balance DESC, id)")
+        
         # Create preferred times table with foreign key relationship
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS preferred_times (
@@ -54,10 +198,31 @@ class HabitTracker:
             code TEXT PRIMARY KEY,
             value REAL NOT NULL,
             description TEXT,
-            created_at TIMESTAMP NOT NULL,
-            expiry_date TIMESTAMP,
+            created_at INTEGER NOT NULL,
+            expiry_date INTEGER,
+            used BOOLEAN DEFAULT 0,
+            used_at INTEGER
+        )
+        ''')
+        
+        # Partial index so picking an unused code never scans redeemed ones
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_bonus_codes_unused ON bonus_codes (code) WHERE used = 0")
+        
+        # Lets the maintenance sweeper find expired codes without a full scan
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_bonus_codes_expiry_date ON bonus_codes (expiry_date)")
+        
+        # Expired and long-redeemed codes are moved here by the maintenance scheduler (see maintenance.py)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bonus_codes_archive (
+            code TEXT PRIMARY KEY,
+            value REAL NOT NULL,
+            description TEXT,
+            created_at INTEGER NOT NULL,
+            expiry_date INTEGER,
             used BOOLEAN DEFAULT 0,
-            used_at TIMESTAMP
+            used_at INTEGER,
+            archived_at INTEGER NOT NULL,
+            reason TEXT NOT NULL
         )
         ''')
         
@@ -65,35 +230,83 @@ class HabitTracker:
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS accounts (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT NOT NULL UNIQUE
+            email TEXT NOT NULL UNIQUE,
+            created_at INTEGER,
+            last_used_at INTEGER
+        )
+        ''')
+        _ensure_column(cursor, 'accounts', 'created_at', 'INTEGER')
+        _ensure_column(cursor, 'accounts', 'last_used_at', 'INTEGER')
+        
+        # Habits created before accounts were tied to habits belong to the first account
+        cursor.execute('''
+        UPDATE OR IGNORE habits SET account_id = (SELECT MIN(id) FROM accounts)
+        WHERE account_id IS NULL AND EXISTS (SELECT 1 FROM accounts)
+        ''')
+        
+        # Create outbox table for events waiting to be reported to the server (see sync_queue.py)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            attempts INTEGER DEFAULT 0
         )
         ''')
+        # Set when the server kept rejecting an event; such events are no longer sent
+        _ensure_column(cursor, 'outbox', 'dead_at', 'INTEGER')
+        
+        # When each habit's hardcore periods were last evaluated
+        hardcore.ensure_schema(cursor)
+        
+        # Habits whose streak or balance changed, for other processes' leaderboards
+        leaderboard.ensure_schema(cursor)
         
         # Enable foreign key support
         cursor.execute("PRAGMA foreign_keys = ON")
         
+        # Convert ISO string timestamps written by older versions to epoch seconds
+        timestamps.migrate_columns(conn, HABITS_TIMESTAMP_COLUMNS, SCHEMA_VERSION)
+        
         conn.commit()
         conn.close()
     
     def add_account(self, email):
-        """Add a new account to the database."""
-        conn = sqlite3.connect(self.habits_db_file)
+        """
+        Add a new account and make it the current one.
+
+        Habits and completions recorded before any account existed are assigned to it.
+
+        Returns:
+            dict: The new account
+        """
+        now = timestamps.now()
+        conn = self._connect(self.habits_db_file)
         cursor = conn.cursor()
         
         try:
             cursor.execute('''
-            INSERT INTO accounts (email) VALUES (?)
-            ''', (email,))
+            INSERT INTO accounts (email, created_at, last_used_at) VALUES (?, ?, ?)
+            ''', (email, now, now))
+            account_id = cursor.lastrowid
+            cursor.execute("UPDATE OR IGNORE habits SET account_id = ? WHERE account_id IS NULL", (account_id,))
+            adopted = cursor.rowcount
             conn.commit()
         except sqlite3.IntegrityError:
             conn.rollback()
             raise ValueError(f"Account with email '{email}' already exists.")
         finally:
             conn.close()
+        
+        self._current_accounts.pop(self.habits_db_file, None)
+        if adopted:
+            self._assign_completion_accounts()
+        return self.get_account(account_id)
     
     def check_account_exists(self):
         """Check if any accounts exist in the database."""
-        conn = sqlite3.connect(self.habits_db_file)
+        conn = self._connect(self.habits_db_file)
         cursor = conn.cursor()
         
         cursor.execute("SELECT COUNT(*) FROM accounts")
@@ -101,25 +314,120 @@ class HabitTracker:
         
         conn.close()
         return count > 0
+    
+    def get_account(self, account_id):
+        """Get an account by ID, or None if it doesn't exist."""
+        conn = self._connect(self.habits_db_file)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM accounts WHERE id = ?", (account_id,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+    
+    def get_accounts(self):
+        """Get every account, oldest first."""
+        conn = self._connect(self.habits_db_file)
+        conn.row_factory = sqlite3.Row
+        accounts = [dict(row) for row in conn.execute("SELECT * FROM accounts ORDER BY id")]
+        conn.close()
+        return accounts
+    
+    def switch_account(self, account_id):
+        """
+        Make an account the current one.
+
+        Returns:
+            dict: The account
+        """
+        conn = self._connect(self.habits_db_file)
+        try:
+            cursor = conn.execute("UPDATE accounts SET last_used_at = ? WHERE id = ?", (timestamps.now(), account_id))
+            if cursor.rowcount == 0:
+                raise ValueError(f"Account with ID {account_id} not found.")
+            conn.commit()
+        finally:
+            conn.close()
+        
+        self._current_accounts.pop(self.habits_db_file, None)
+        return self.get_account(account_id)
+    
+    def get_current_account(self):
+        """
+        The account the app is used with: the most recently added or switched to.
 
+        Looked up once per database and cached until the accounts change, so building a URL or a
+        sync batch doesn't query the database.
 
+        Returns:
+            dict: The account, or None when no account exists
+        """
+        if self.habits_db_file not in self._current_accounts:
+            conn = self._connect(self.habits_db_file)
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(
+                "SELECT * FROM accounts ORDER BY last_used_at IS NULL, last_used_at DESC, id LIMIT 1"
+            ).fetchone()
+            conn.close()
+            self._current_accounts[self.habits_db_file] = dict(row) if row else None
+        return self._current_accounts[self.habits_db_file]
+    
+    def _account_filter(self):
+        """SQL condition (and its parameters) limiting a habits query to this tracker's account."""
+        if self.account_id is None:
+            return "", ()
+        return " AND account_id = ?", (self.account_id,)
+    
+    def _new_row_account_id(self):
+        """Account new habits belong to: this tracker's account, else the current one."""
+        if self.account_id is not None:
+            return self.account_id
+        account = self.get_current_account()
+        return account['id'] if account else None
+    
+    def _assign_completion_accounts(self):
+        """Give completions without an account (older, imported or synced ones) their habit's account."""
+        conn = self._connect(self.completions_db_file)
+        try:
+            conn.execute("ATTACH DATABASE ? AS habits_db", (self.habits_db_file,))
+            conn.execute('''
+            UPDATE habit_completions
+            SET account_id = (SELECT account_id FROM habits_db.habits WHERE habits_db.habits.id = habit_completions.habit_id)
+            WHERE account_id IS NULL
+              AND habit_id IN (SELECT id FROM habits_db.habits WHERE account_id IS NOT NULL)
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
 
     def _init_completions_database(self):
         """Initialize SQLite database for tracking habit completions."""
-        conn = sqlite3.connect(self.completions_db_file)
+        conn = self._connect(self.completions_db_file)
         cursor = conn.cursor()
         
+        # Let free pages be reclaimed a little at a time (only takes effect on a new file or after VACUUM)
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        
         # Create completions table if it doesn't exist
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS habit_completions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             habit_id INTEGER NOT NULL,
-            completion_time TIMESTAMP NOT NULL,
+            completion_time INTEGER NOT NULL,
             duration_seconds INTEGER,
-            notes TEXT
+            notes TEXT,
+            account_id INTEGER
         )
         ''')
         
+        # Completions are partitioned by account (see _assign_completion_accounts)
+        _ensure_column(cursor, 'habit_completions', 'account_id', 'INTEGER')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_habit_completions_account_time
+        ON habit_completions (account_id, completion_time)
+        ''')
+        
+        # Convert ISO string timestamps written by older versions to epoch seconds
+        timestamps.migrate_columns(conn, COMPLETIONS_TIMESTAMP_COLUMNS, SCHEMA_VERSION)
+        
         conn.commit()
         conn.close()
     
@@ -133,26 +441,11 @@ class HabitTracker:
         Returns:
             dict: The newly created user account or None if the email already exists
         """
-        conn = sqlite3.connect(self.habits_db_file)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
         try:
-            now = datetime.now().isoformat()
-            cursor.execute(
-                "INSERT INTO user_accounts (email, created_at) VALUES (?, ?)",
-                (email, now)
-            )
-            conn.commit()
-            
-            cursor.execute("SELECT * FROM user_accounts WHERE email = ?", (email,))
-            user = dict(cursor.fetchone())
-            return user
-        except sqlite3.IntegrityError:
+            return self.add_account(email)
+        except ValueError:
             # Email already exists
             return None
-        finally:
-            conn.close()
     
     def get_user_by_email(self, email):
         """
@@ -164,11 +457,11 @@ class HabitTracker:
         Returns:
             dict: The user account or None if not found
         """
-        conn = sqlite3.connect(self.habits_db_file)
+        conn = self._connect(self.habits_db_file)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM user_accounts WHERE email = ?", (email,))
+        cursor.execute("SELECT * FROM accounts WHERE email = ?", (email,))
         user_row = cursor.fetchone()
         
         conn.close()
@@ -191,7 +484,7 @@ class HabitTracker:
         return user is not None
     
     def add_habit(self, name, frequency_type, frequency_count, duration_seconds=0, 
-                  preferred_times=None, description=""):
+                  preferred_times=None, description="", hardcore=False):
         """
         Add a new habit to track.
         
@@ -202,6 +495,8 @@ class HabitTracker:
             duration_seconds (int, optional): How long the habit takes in seconds
             preferred_times (list, optional): List of preferred times of day in 'HH:MM' format
             description (str, optional): Optional description of the habit
+            hardcore (bool, optional): Reset the streak whenever a period ends with fewer than
+                                       frequency_count completions (see hardcore.py)
         
         Returns:
             dict: The newly created habit
@@ -222,17 +517,19 @@ class HabitTracker:
                 except ValueError:
                     raise ValueError(f"Time '{time_str}' is not in valid 'HH:MM' format")
         
-        conn = sqlite3.connect(self.habits_db_file)
+        conn = self._connect(self.habits_db_file)
         cursor = conn.cursor()
         
         try:
             # Insert the habit
-            now = datetime.now().isoformat()
+            now = timestamps.now()
             cursor.execute('''
             INSERT INTO habits 
-            (name, description, frequency_type, frequency_count, duration_seconds, created_at, streak)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (name, description, frequency_type, frequency_count, duration_seconds, now, 1))
+            (name, description, frequency_type, frequency_count, duration_seconds, created_at, streak, hardcore_since,
+             account_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (name, description, frequency_type, frequency_count, _whole_seconds(duration_seconds), now, 1,
+                  now if hardcore else None, self._new_row_account_id()))
             
             # Get the inserted habit's ID
             habit_id = cursor.lastrowid
@@ -245,6 +542,7 @@ class HabitTracker:
                 ''', (habit_id, time_str))
             
             conn.commit()
+            self._notify_habit_changed(habit_id)
             
             # Return the newly created habit
             return self.get_habit(habit_id)
@@ -257,12 +555,15 @@ class HabitTracker:
     
     def get_habits(self):
         """Get all habits with their preferred times."""
-        conn = sqlite3.connect(self.habits_db_file)
+        conn = self._connect(self.habits_db_file)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        # Get all habits
-        cursor.execute("SELECT * FROM habits ORDER BY id")
+        # Get all habits (of this tracker's account when it has one)
+        if self.account_id is None:
+            cursor.execute("SELECT * FROM habits ORDER BY id")
+        else:
+            cursor.execute("SELECT * FROM habits WHERE account_id = ? ORDER BY id", (self.account_id,))
         habits_rows = cursor.fetchall()
         
         habits = []
@@ -281,12 +582,13 @@ class HabitTracker:
     
     def get_habit(self, habit_id):
         """Get a specific habit by ID with its preferred times."""
-        conn = sqlite3.connect(self.habits_db_file)
+        conn = self._connect(self.habits_db_file)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        # Get the habit
-        cursor.execute("SELECT * FROM habits WHERE id = ?", (habit_id,))
+        # Get the habit (only this tracker's account's when it has one)
+        account_filter, params = self._account_filter()
+        cursor.execute("SELECT * FROM habits WHERE id = ?" + account_filter, (habit_id,) + params)
         habit_row = cursor.fetchone()
         
         if not habit_row:
@@ -309,7 +611,12 @@ class HabitTracker:
         if not habit:
             raise ValueError(f"Habit with ID {habit_id} not found.")
         
-        conn = sqlite3.connect(self.habits_db_file)
+        # Validate frequency type
+        valid_frequency_types = ['daily', 'weekly', 'monthly', 'yearly']
+        if 'frequency_type' in kwargs and kwargs['frequency_type'] not in valid_frequency_types:
+            raise ValueError(f"Frequency type must be one of {valid_frequency_types}")
+        
+        conn = self._connect(self.habits_db_file)
         cursor = conn.cursor()
         
         try:
@@ -335,9 +642,19 @@ class HabitTracker:
                 
                 del kwargs['preferred_times']
             
+            if kwargs.get('duration_seconds') is not None:
+                kwargs['duration_seconds'] = _whole_seconds(kwargs['duration_seconds'])
+            
+            # Hardcore mode is enforced from the moment it is turned on
+            if 'hardcore' in kwargs:
+                if not kwargs.pop('hardcore'):
+                    kwargs['hardcore_since'] = None
+                elif habit['hardcore_since'] is None:
+                    kwargs['hardcore_since'] = timestamps.now()
+            
             # Update other allowed fields in the habits table
             allowed_fields = ['name', 'frequency_type', 'frequency_count', 
-                             'description', 'duration_seconds']
+                             'description', 'duration_seconds', 'hardcore_since']
             
             if any(key in allowed_fields for key in kwargs):
                 update_parts = []
@@ -349,11 +666,13 @@ class HabitTracker:
                         update_values.append(value)
                 
                 if update_parts:
-                    query = f"UPDATE habits SET {', '.join(update_parts)} WHERE id = ?"
+                    account_filter, params = self._account_filter()
+                    query = f"UPDATE habits SET {', '.join(update_parts)} WHERE id = ?" + account_filter
                     update_values.append(habit_id)
-                    cursor.execute(query, update_values)
+                    cursor.execute(query, update_values + list(params))
             
             conn.commit()
+            self._notify_habit_changed(habit_id)
             
             # Return the updated habit
             return self.get_habit(habit_id)
@@ -371,12 +690,13 @@ class HabitTracker:
             raise ValueError(f"Habit with ID {habit_id} not found.")
         
         # Delete from habits database
-        conn_habits = sqlite3.connect(self.habits_db_file)
+        conn_habits = self._connect(self.habits_db_file)
         cursor_habits = conn_habits.cursor()
         
         try:
             # Foreign key constraints will cascade delete preferred times
-            cursor_habits.execute("DELETE FROM habits WHERE id = ?", (habit_id,))
+            account_filter, params = self._account_filter()
+            cursor_habits.execute("DELETE FROM habits WHERE id = ?" + account_filter, (habit_id,) + params)
             conn_habits.commit()
         except Exception as e:
             conn_habits.rollback()
@@ -385,18 +705,29 @@ class HabitTracker:
             conn_habits.close()
         
         # Delete associated completions from completions database
-        conn_completions = sqlite3.connect(self.completions_db_file)
+        conn_completions = self._connect(self.completions_db_file)
         cursor_completions = conn_completions.cursor()
         
         try:
             cursor_completions.execute("DELETE FROM habit_completions WHERE habit_id = ?", (habit_id,))
             conn_completions.commit()
-            return True
         except Exception as e:
             conn_completions.rollback()
             raise e
         finally:
             conn_completions.close()
+
+        self.archive.delete_habit(habit_id)
+        self._notify_habit_changed(habit_id)
+        return True
+
+    def _notify_habit_changed(self, habit_id):
+        """Tell habit listeners (e.g. the reminder scheduler) that a habit changed."""
+        for listener in list(self.habit_listeners):
+            try:
+                listener(self, habit_id)
+            except Exception as e:
+                print(f"Habit listener failed: {e}")
     
     def record_completion(self, habit_id, duration_seconds=None, notes=""):
         """
@@ -418,19 +749,20 @@ class HabitTracker:
         # Use default duration if not provided
         if duration_seconds is None:
             duration_seconds = habit['duration_seconds']
+        duration_seconds = _whole_seconds(duration_seconds)
         
         # Get current time
-        now = datetime.now()
-        completion_time = now.isoformat()
+        completion_time = timestamps.now()
         
         # Record the completion in the completions database
-        conn_completions = sqlite3.connect(self.completions_db_file)
+        conn_completions = self._connect(self.completions_db_file)
         cursor_completions = conn_completions.cursor()
         
         try:
             cursor_completions.execute(
-                "INSERT INTO habit_completions (habit_id, completion_time, duration_seconds, notes) VALUES (?, ?, ?, ?)",
-                (habit_id, completion_time, duration_seconds, notes)
+                "INSERT INTO habit_completions (habit_id, completion_time, duration_seconds, notes, account_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (habit_id, completion_time, duration_seconds, notes, habit['account_id'])
             )
             conn_completions.commit()
         except Exception as e:
@@ -440,58 +772,181 @@ class HabitTracker:
             conn_completions.close()
         
         # Update the habit in the habits database
-        conn_habits = sqlite3.connect(self.habits_db_file)
+        conn_habits = self._connect(self.habits_db_file)
         cursor_habits = conn_habits.cursor()
         
         try:
             # Check if completed two days in a row. If yes: increases streak value. Otherwise, new_streak will be 1 (ie, reset)
             new_streak = 1
-            if habit['last_completed']:
-                last_time = datetime.fromisoformat(habit['last_completed'])
-                
-                if self._is_consecutive(last_time, now, habit['frequency_type']):
-                    new_streak = habit['streak'] + 1
+            if self._continues_streak(habit, completion_time):
+                new_streak = habit['streak'] + 1
 
             # Update the habit's streak, last_completed, and reward_balance
+            account_filter, params = self._account_filter()
             cursor_habits.execute(
-                "UPDATE habits SET streak = ?, last_completed = ?, reward_balance = reward_balance + 0.25 WHERE id = ?",
-                (new_streak, completion_time, habit_id)
+                "UPDATE habits SET streak = ?, last_completed = ?, reward_balance = reward_balance + 0.25 WHERE id = ?"
+                + account_filter,
+                (new_streak, completion_time, habit_id) + params
             )
             
+            # Queue the completion for reporting to the server in the same transaction
+            self._enqueue_outbox(cursor_habits, 'completion', {
+                'habit_id': habit_id,
+                'habit_name': habit['name'],
+                'completion_time': completion_time,
+                'duration_seconds': duration_seconds,
+                'streak': new_streak,
+                'reward': 0.25
+            })
+            
             conn_habits.commit()
             
             # Return the updated habit
-            return self.get_habit(habit_id)
+            habit = self.get_habit(habit_id)
+            leaderboard.habit_scored(self.habits_db_file, habit)
+            return habit
             
         except Exception as e:
             conn_habits.rollback()
             raise e
         finally:
             conn_habits.close()
-    
+
+    def record_completions(self, completions):
+        """
+        Record many completions at once, applying the same streak and reward rules as record_completion.
+
+        All completions are written in one transaction per database instead of one per completion.
+
+        Args:
+            completions (list): Dicts with 'habit_id' and optional 'duration_seconds' and 'notes'
+
+        Returns:
+            list: The updated habits, one per distinct habit ID, in first-seen order
+        """
+        habit_ids = list(dict.fromkeys(completion['habit_id'] for completion in completions))
+
+        conn_habits = self._connect(self.habits_db_file)
+        conn_habits.row_factory = sqlite3.Row
+        cursor_habits = conn_habits.cursor()
+        placeholders = ", ".join("?" for _ in habit_ids)
+        account_filter, params = self._account_filter()
+        cursor_habits.execute(f"SELECT * FROM habits WHERE id IN ({placeholders})" + account_filter,
+                              habit_ids + list(params))
+        habits = {row['id']: dict(row) for row in cursor_habits.fetchall()}
+
+        for habit_id in habit_ids:
+            if habit_id not in habits:
+                conn_habits.close()
+                raise ValueError(f"Habit with ID {habit_id} not found.")
+
+        # Replay the completions in memory so each habit gets a single update
+        completion_rows = []
+        outbox_events = []
+        for completion in completions:
+            habit = habits[completion['habit_id']]
+            duration_seconds = completion.get('duration_seconds')
+            if duration_seconds is None:
+                duration_seconds = habit['duration_seconds']
+            duration_seconds = _whole_seconds(duration_seconds)
+
+            completion_time = timestamps.now()
+            completion_rows.append((habit['id'], completion_time, duration_seconds, completion.get('notes', ""),
+                                    habit['account_id']))
+
+            new_streak = 1
+            if self._continues_streak(habit, completion_time):
+                new_streak = habit['streak'] + 1
+            habit['streak'] = new_streak
+            habit['last_completed'] = completion_time
+            outbox_events.append({
+                'habit_id': habit['id'],
+                'habit_name': habit['name'],
+                'completion_time': completion_time,
+                'duration_seconds': duration_seconds,
+                'streak': new_streak,
+                'reward': 0.25
+            })
+            habit['credit'] = habit.get('credit', 0.0) + 0.25
+
+        conn_completions = self._connect(self.completions_db_file)
+
+        try:
+            conn_completions.executemany(
+                "INSERT INTO habit_completions (habit_id, completion_time, duration_seconds, notes, account_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                completion_rows
+            )
+            conn_completions.commit()
+        except Exception as e:
+            conn_completions.rollback()
+            conn_habits.close()
+            raise e
+        finally:
+            conn_completions.close()
+
+        try:
+            cursor_habits.executemany(
+                "UPDATE habits SET streak = ?, last_completed = ?, reward_balance = reward_balance + ? WHERE id = ?",
+                [(habits[habit_id]['streak'], habits[habit_id]['last_completed'],
+                  habits[habit_id]['credit'], habit_id) for habit_id in habit_ids]
+            )
+            for event in outbox_events:
+                self._enqueue_outbox(cursor_habits, 'completion', event)
+            conn_habits.commit()
+        except Exception as e:
+            conn_habits.rollback()
+            raise e
+        finally:
+            conn_habits.close()
+
+        updated = [self.get_habit(habit_id) for habit_id in habit_ids]
+        for habit in updated:
+            leaderboard.habit_scored(self.habits_db_file, habit)
+        return updated
+
+    def _continues_streak(self, habit, completion_time):
+        """Whether a completion extends the habit's streak: consecutive, with no reset since the last one."""
+        if not habit['last_completed']:
+            return False
+        reset_at = habit.get('streak_reset_at')
+        if reset_at is not None and habit['last_completed'] < reset_at:
+            return False
+        return self._is_consecutive(habit['last_completed'], completion_time, habit['frequency_type'])
+
     def _is_consecutive(self, last_time, current_time, frequency_type):
         """
         Determine if a completion is consecutive based on frequency type.
         This is a simplified version - you'll need to enhance this based on
         your specific streak calculation requirements.
+
+        Times are epoch seconds (anything to_epoch accepts also works).
         """
-        delta = current_time - last_time
+        # Whole days between the two completions, rounded down like timedelta.days
+        days = (to_epoch(current_time) - to_epoch(last_time)) // 86400
         
         if frequency_type == 'daily':
             # Within 24-48 hours for daily habits
-            return delta.days <= 1
+            return days <= 1
         elif frequency_type == 'weekly':
             # Within 5-9 days for weekly habits
-            return 5 <= delta.days <= 9
+            return 5 <= days <= 9
         elif frequency_type == 'monthly':
             # Within 25-35 days for monthly habits
-            return 25 <= delta.days <= 35
+            return 25 <= days <= 35
         elif frequency_type == 'yearly':
             # Within 350-380 days for yearly habits
-            return 350 <= delta.days <= 380
+            return 350 <= days <= 380
         
         return False
     
+    def _enqueue_outbox(self, cursor, event_type, payload):
+        """Add an event to the outbox using the caller's cursor so it commits with the change it describes."""
+        cursor.execute(
+            "INSERT INTO outbox (event_type, payload, created_at) VALUES (?, ?, ?)",
+            (event_type, json.dumps(payload), timestamps.now())
+        )
+    
     def update_reward_balance(self, habit_id, amount):
         """
         Update the reward balance for a habit.
@@ -501,73 +956,268 @@ class HabitTracker:
         if not habit:
             raise ValueError(f"Habit with ID {habit_id} not found.")
         
-        conn = sqlite3.connect(self.habits_db_file)
+        conn = self._connect(self.habits_db_file)
         cursor = conn.cursor()
         
         try:
+            account_filter, params = self._account_filter()
             cursor.execute(
-                "UPDATE habits SET reward_balance = reward_balance + ? WHERE id = ?",
-                (amount, habit_id)
+                "UPDATE habits SET reward_balance = reward_balance + ? WHERE id = ?" + account_filter,
+                (amount, habit_id) + params
             )
+            self._enqueue_outbox(cursor, 'credit', {'habit_id': habit_id, 'habit_name': habit['name'], 'amount': amount})
             conn.commit()
             
-            return self.get_habit(habit_id)
+            habit = self.get_habit(habit_id)
+            leaderboard.habit_scored(self.habits_db_file, habit)
+            return habit
         finally:
             conn.close()
     
     def get_completions(self, habit_id, start_date=None, end_date=None):
         """
         Get all completions for a specific habit with optional date filtering.
+
+        Ranges reaching back past the archive horizon also read archived completions.
         
         Args:
             habit_id (int): The ID of the habit
-            start_date (str, optional): ISO format date string for filtering (inclusive)
-            end_date (str, optional): ISO format date string for filtering (inclusive)
+            start_date (str/int/datetime, optional): ISO date string (local time) or epoch seconds (inclusive)
+            end_date (str/int/datetime, optional): ISO date string (local time) or epoch seconds (inclusive)
         
         Returns:
-            list: List of completion records
+            list: List of completion records, with completion_time in epoch seconds
         """
-        conn = sqlite3.connect(self.completions_db_file)
+        start_date, end_date = to_epoch(start_date), to_epoch(end_date)
+        if self.account_id is not None and self.get_habit(habit_id) is None:
+            # Another account's habit
+            return []
+        conn = self._connect(self.completions_db_file)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
         query = "SELECT * FROM habit_completions WHERE habit_id = ?"
         params = [habit_id]
         
-        if start_date:
+        if start_date is not None:
             query += " AND completion_time >= ?"
             params.append(start_date)
         
-        if end_date:
+        if end_date is not None:
             query += " AND completion_time <= ?"
             params.append(end_date)
         
-        query += " ORDER BY completion_time DESC"
+        query += " ORDER BY completion_time DESC, id DESC"
         
         cursor.execute(query, params)
         results = [dict(row) for row in cursor.fetchall()]
         
         conn.close()
+
+        archived_until = self.archive.archived_until()
+        if archived_until is not None and (start_date is None or start_date <= archived_until):
+            results = self._merge_archived(results, self.archive.read(habit_id, start_date, end_date))
         return results
     
-    def get_all_completions(self):
+    def get_all_completions(self, include_archived=False):
         """
         Get all habit completions from the database.
+
+        Args:
+            include_archived (bool): Also return completions moved to the archive
         
         Returns:
             list: List of completion records for all habits
         """
-        conn = sqlite3.connect(self.completions_db_file)
+        conn = self._connect(self.completions_db_file)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        # Fetch all completions
-        cursor.execute("SELECT * FROM habit_completions ORDER BY completion_time DESC")
+        # Fetch all completions (of this tracker's account when it has one)
+        if self.account_id is None:
+            cursor.execute("SELECT * FROM habit_completions ORDER BY completion_time DESC, id DESC")
+        else:
+            cursor.execute(
+                "SELECT * FROM habit_completions WHERE account_id = ? ORDER BY completion_time DESC, id DESC",
+                (self.account_id,)
+            )
         completions = [dict(row) for row in cursor.fetchall()]
         
         conn.close()
+
+        if include_archived:
+            archived = self.archive.read()
+            if self.account_id is not None:
+                # Blocks archived before accounts existed have no account_id; go by habit
+                habit_ids = self._account_habit_ids()
+                archived = [row for row in archived if row['habit_id'] in habit_ids]
+            completions = self._merge_archived(completions, archived)
+        return completions
+
+    def _account_habit_ids(self):
+        """IDs of the habits of this tracker's account."""
+        conn = self._connect(self.habits_db_file)
+        habit_ids = {row[0] for row in conn.execute("SELECT id FROM habits WHERE account_id = ?", (self.account_id,))}
+        conn.close()
+        return habit_ids
+
+    def _merge_archived(self, completions, archived):
+        """Combine hot and archived completions, newest first."""
+        if not archived:
+            return completions
+        # A row is only in both if an archive run was interrupted between commit and cleanup
+        hot_ids = {completion['id'] for completion in completions}
+        completions = completions + [row for row in archived if row['id'] not in hot_ids]
+        completions.sort(key=lambda completion: (completion['completion_time'], completion['id']), reverse=True)
         return completions
 
+    def archive_completions(self, older_than_days=365, limit=None, connect=None):
+        """
+        Move completions older than older_than_days into the compressed archive.
+
+        The rows are written to the archive and deleted from habit_completions in one transaction,
+        with the archive database attached to the completions connection. Streaks, reward balances
+        and the archive's daily rollups are unaffected.
+
+        Args:
+            older_than_days (int): Archive completions older than this many days
+            limit (int, optional): Archive at most this many (oldest first) completions
+            connect (callable, optional): Opens the completions connection instead of _connect
+                                          (maintenance.py passes one bound to its time budget)
+
+        Returns:
+            int: Number of completions archived
+        """
+        cutoff = timestamps.now() - older_than_days * 86400
+        self.archive.ensure_schema()
+
+        conn = (connect or self._connect)(self.completions_db_file)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("ATTACH DATABASE ? AS archive", (self.archive.db_file,))
+            query = "SELECT * FROM habit_completions WHERE completion_time < ? ORDER BY completion_time"
+            params = [cutoff]
+            if limit is not None:
+                query += " LIMIT ?"
+                params.append(limit)
+            cursor.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            habit_index, time_index = columns.index('habit_id'), columns.index('completion_time')
+            rows = sorted(cursor.fetchall(), key=lambda row: (row[habit_index], row[time_index]))
+            if not rows:
+                conn.rollback()
+                return 0
+
+            self.archive.write_rows(cursor, columns, rows)
+
+            # Archiving is local housekeeping: tag the deletes so delta sync doesn't replicate them
+            sync_enabled = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sync_state'"
+            ).fetchone()
+            if sync_enabled:
+                cursor.execute("SELECT value FROM sync_state WHERE key = 'origin'")
+                origin = cursor.fetchone()
+                cursor.execute("UPDATE sync_state SET value = 'archive' WHERE key = 'origin'")
+
+            id_index = columns.index('id')
+            cursor.executemany("DELETE FROM habit_completions WHERE id = ?", [(row[id_index],) for row in rows])
+
+            if sync_enabled and origin:
+                cursor.execute("UPDATE sync_state SET value = ? WHERE key = 'origin'", origin)
+
+            conn.commit()
+            return len(rows)
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+    def get_completion_columns(self, habit_id=None, start_date=None, end_date=None, include_archived=True):
+        """
+        Bulk version of get_completions returning a compact CompletionColumns.
+
+        Meant for analytics and long histories: rows are streamed straight into array columns
+        instead of becoming dicts, and notes are only loaded when accessed.
+
+        Args:
+            habit_id (int, optional): Only this habit's completions (all habits if omitted)
+            start_date (str/int/datetime, optional): ISO date string (local time) or epoch seconds (inclusive)
+            end_date (str/int/datetime, optional): ISO date string (local time) or epoch seconds (inclusive)
+            include_archived (bool): Also read archived completions the range reaches into
+
+        Returns:
+            CompletionColumns: The completions, newest first
+        """
+        start_date, end_date = to_epoch(start_date), to_epoch(end_date)
+        columns = CompletionColumns(self.completions_db_file)
+
+        # Habits of this tracker's account; None when it isn't bound to one
+        account_habit_ids = self._account_habit_ids() if self.account_id is not None else None
+        if account_habit_ids is not None and habit_id is not None and habit_id not in account_habit_ids:
+            return columns
+
+        query = "SELECT id, habit_id, completion_time, duration_seconds FROM habit_completions WHERE 1 = 1"
+        params = []
+        if habit_id is not None:
+            query += " AND habit_id = ?"
+            params.append(habit_id)
+        elif account_habit_ids is not None:
+            query += " AND account_id = ?"
+            params.append(self.account_id)
+        if start_date is not None:
+            query += " AND completion_time >= ?"
+            params.append(start_date)
+        if end_date is not None:
+            query += " AND completion_time <= ?"
+            params.append(end_date)
+        query += " ORDER BY completion_time DESC, id DESC"
+
+        conn = self._connect(self.completions_db_file)
+        hot_ids = set()
+        for completion_id, row_habit_id, completion_time, duration_seconds in conn.execute(query, params):
+            columns.append(completion_id, row_habit_id, completion_time, duration_seconds)
+            hot_ids.add(completion_id)
+        conn.close()
+
+        archived_until = self.archive.archived_until() if include_archived else None
+        if archived_until is not None and (start_date is None or start_date <= archived_until):
+            for row in self.archive.read(habit_id, start_date, end_date):
+                if account_habit_ids is not None and row['habit_id'] not in account_habit_ids:
+                    continue
+                if row['id'] not in hot_ids:
+                    columns.append(row['id'], row['habit_id'], row['completion_time'],
+                                   row['duration_seconds'], row['notes'] or "")
+            columns.sort_by_time()
+        return columns
+
+    def _get_completion_times(self):
+        """Get every habit's completion times (epoch seconds), archived ones included, oldest first."""
+        completion_times = self.get_completion_columns().times_by_habit()
+        # Columns are newest first; streaks are replayed oldest first
+        for times in completion_times.values():
+            times.reverse()
+        return completion_times
+
+    def get_completion_totals(self):
+        """
+        Get completion count and total duration per habit, archived completions included.
+
+        Archived totals come from the archive's rollups, so nothing is decompressed.
+
+        Returns:
+            dict: habit_id -> (completion count, total duration in seconds)
+        """
+        totals = self.archive.get_rollup_totals()
+        conn = self._connect(self.completions_db_file)
+        for habit_id, count, duration in conn.execute(
+                "SELECT habit_id, COUNT(*), COALESCE(SUM(duration_seconds), 0) FROM habit_completions GROUP BY habit_id"):
+            archived_count, archived_duration = totals.get(habit_id, (0, 0))
+            totals[habit_id] = (count + archived_count, duration + archived_duration)
+        conn.close()
+        return totals
+
 
 
     # Bonus Codes Management
@@ -579,21 +1229,21 @@ class HabitTracker:
             code (str): The unique bonus code
             value (float): The reward value of the bonus code
             description (str, optional): Description of the bonus code
-            expiry_date (str, optional): ISO format date string for expiry
+            expiry_date (str/int/datetime, optional): Expiry as an ISO date string (local time) or epoch seconds
         
         Returns:
             dict: The newly created bonus code
         """
-        conn = sqlite3.connect(self.habits_db_file)
+        conn = self._connect(self.habits_db_file)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        created_at = datetime.now().isoformat()
+        created_at = timestamps.now()
         
         try:
             cursor.execute(
                 "INSERT INTO bonus_codes (code, value, description, created_at, expiry_date, used) VALUES (?, ?, ?, ?, ?, ?)",
-                (code, value, description, created_at, expiry_date, False)
+                (code, value, description, created_at, to_epoch(expiry_date), False)
             )
             conn.commit()
             
@@ -611,6 +1261,12 @@ class HabitTracker:
         """
         Use a bonus code and apply its value.
         
+        The code is claimed with a single conditional UPDATE, so two concurrent redemptions of
+        the same code can never both succeed.
+        
+        Codes are one pool for the whole store (they are handed out, not owned), so any account
+        can redeem one; only a habit of this tracker's account can receive the credit.
+        
         Args:
             code (str): The bonus code to use
             habit_id (int, optional): The habit to apply the reward to.
@@ -619,72 +1275,73 @@ class HabitTracker:
         Returns:
             dict: Result with success status and details
         """
-        conn = sqlite3.connect(self.habits_db_file)
+        conn = self._connect(self.habits_db_file)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        # Check if the bonus code exists
-        cursor.execute("SELECT * FROM bonus_codes WHERE code = ?", (code,))
-        bonus_row = cursor.fetchone()
-        
-        if not bonus_row:
-            conn.close()
-            return {'success': False, 'message': f"Bonus code '{code}' doesn't exist."}
-        
-        bonus_code = dict(bonus_row)
-        
-        if bonus_code['used']:
-            conn.close()
-            return {'success': False, 'message': f"Bonus code '{code}' has already been used."}
-        
-        if bonus_code['expiry_date']:
-            expiry = datetime.fromisoformat(bonus_code['expiry_date'])
-            if datetime.now() > expiry:
-                conn.close()
-                return {'success': False, 'message': f"Bonus code '{code}' has expired."}
-        
         try:
-            # Mark as used
-            used_at = datetime.now().isoformat()
-            cursor.execute(
-                "UPDATE bonus_codes SET used = ?, used_at = ? WHERE code = ?",
-                (True, used_at, code)
-            )
-            
-            # Apply to specific habit if requested
+            # Check the habit first so a missing habit never burns the code
+            habit_name = None
+            account_filter, params = self._account_filter()
             if habit_id is not None:
-                # Check if the habit exists
-                cursor.execute("SELECT name FROM habits WHERE id = ?", (habit_id,))
+                cursor.execute("SELECT name FROM habits WHERE id = ?" + account_filter, (habit_id,) + params)
                 habit_row = cursor.fetchone()
                 
                 if not habit_row:
-                    conn.rollback()
-                    conn.close()
                     return {'success': False, 'message': f"Habit with ID {habit_id} not found."}
                 
                 habit_name = habit_row['name']
-                
+            
+            # Claim the code only if it is still unused and unexpired
+            now = timestamps.now()
+            used_at = now
+            cursor.execute(
+                "UPDATE bonus_codes SET used = 1, used_at = ? "
+                "WHERE code = ? AND used = 0 AND (expiry_date IS NULL OR expiry_date > ?)",
+                (used_at, code, now)
+            )
+            
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return self._bonus_code_failure(cursor, code)
+            
+            cursor.execute("SELECT value FROM bonus_codes WHERE code = ?", (code,))
+            value = cursor.fetchone()['value']
+            
+            # Apply to specific habit if requested
+            if habit_id is not None:
                 # Apply bonus to habit
                 cursor.execute(
-                    "UPDATE habits SET reward_balance = reward_balance + ? WHERE id = ?",
-                    (bonus_code['value'], habit_id)
+                    "UPDATE habits SET reward_balance = reward_balance + ? WHERE id = ?" + account_filter,
+                    (value, habit_id) + params
                 )
+                cursor.execute("SELECT id, streak, reward_balance, account_id FROM habits WHERE id = ?", (habit_id,))
+                scored = dict(cursor.fetchone())
                 
                 result = {
                     'success': True, 
-                    'message': f"Applied bonus code '{code}' worth ${bonus_code['value']} to habit '{habit_name}'.",
+                    'message': f"Applied bonus code '{code}' worth ${value} to habit '{habit_name}'.",
                     'habit': habit_name,
-                    'value': bonus_code['value']
+                    'value': value
                 }
             else:
                 # Could implement a general credit system here
                 result = {
                     'success': True, 
-                    'message': f"Redeemed bonus code '{code}' worth ${bonus_code['value']}.",
-                    'value': bonus_code['value']
+                    'message': f"Redeemed bonus code '{code}' worth ${value}.",
+                    'value': value
                 }
             
+            self._enqueue_outbox(cursor, 'redemption', {
+                'code': code,
+                'habit_id': habit_id,
+                'value': value,
+                'used_at': used_at
+            })
+            
             conn.commit()
+            if habit_id is not None:
+                leaderboard.habit_scored(self.habits_db_file, scored)
             return result
             
         except Exception as e:
@@ -693,6 +1350,17 @@ class HabitTracker:
         finally:
             conn.close()
     
+    def _bonus_code_failure(self, cursor, code):
+        """Explain why a bonus code could not be claimed."""
+        cursor.execute("SELECT used FROM bonus_codes WHERE code = ?", (code,))
+        bonus_row = cursor.fetchone()
+        
+        if not bonus_row:
+            return {'success': False, 'message': f"Bonus code '{code}' doesn't exist."}
+        if bonus_row['used']:
+            return {'success': False, 'message': f"Bonus code '{code}' has already been used."}
+        return {'success': False, 'message': f"Bonus code '{code}' has expired."}
+    
     def get_bonus_codes(self, include_used=False):
         """
         Get all bonus codes, optionally including used ones.
@@ -703,7 +1371,7 @@ class HabitTracker:
         Returns:
             list: List of bonus code dictionaries
         """
-        conn = sqlite3.connect(self.habits_db_file)
+        conn = self._connect(self.habits_db_file)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -714,27 +1382,517 @@ class HabitTracker:
             
         bonus_codes = [dict(row) for row in cursor.fetchall()]
         conn.close()
-        
+
         return bonus_codes
-    
-    def minutes_to_seconds(self, minutes):
-        """Utility method to convert minutes to seconds."""
-        return int(minutes * 60)
-    
-    def get_current_user(self):
-        """Get the current user's email"""
-               
-        # Example implementation that gets the first account from the database
-        conn = sqlite3.connect(self.habit_tracker.habits_db_file)
+
+    def get_next_bonus_code(self):
+        """
+        Get one unused, unexpired bonus code without loading the whole list.
+        
+        Returns:
+            dict: A bonus code, or None if there are none left
+        """
+        conn = self._connect(self.habits_db_file)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute("SELECT email FROM accounts LIMIT 1")
+        cursor.execute(
+            "SELECT * FROM bonus_codes WHERE used = 0 AND (expiry_date IS NULL OR expiry_date > ?) LIMIT 1",
+            (timestamps.now(),)
+        )
         row = cursor.fetchone()
+        conn.close()
         
+        return dict(row) if row else None
+    
+    def generate_bonus_codes(self, count, value, description="", expiry_date=None, length=10):
+        """
+        Generate and store many unique random bonus codes.
+        
+        Args:
+            count (int): Number of codes to create
+            value (float): The reward value of each code
+            description (str, optional): Description stored with every code
+            expiry_date (str/int/datetime, optional): Expiry as an ISO date string (local time) or epoch seconds
+            length (int, optional): Number of characters per code
+        
+        Returns:
+            list: The generated code strings
+        """
+        # No 0/O or 1/I so codes can be typed in by hand
+        alphabet = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+        created_at = timestamps.now()
+        expiry_date = to_epoch(expiry_date)
+        
+        conn = self._connect(self.habits_db_file)
+        cursor = conn.cursor()
+        generated = []
+        generated_set = set()
+        
+        try:
+            while len(generated) < count:
+                batch = {
+                    "".join(secrets.choice(alphabet) for _ in range(length))
+                    for _ in range(count - len(generated))
+                } - generated_set
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO bonus_codes (code, value, description, created_at, expiry_date, used) "
+                    "VALUES (?, ?, ?, ?, ?, 0)",
+                    [(code, value, description, created_at, expiry_date) for code in batch]
+                )
+                
+                # Collisions with existing codes are ignored above; keep only the ones that were inserted
+                if cursor.rowcount == len(batch):
+                    inserted = batch
+                else:
+                    batch = list(batch)
+                    inserted = set()
+                    for i in range(0, len(batch), 500):
+                        chunk = batch[i:i + 500]
+                        placeholders = ", ".join("?" for _ in chunk)
+                        cursor.execute(
+                            f"SELECT code FROM bonus_codes WHERE created_at = ? AND code IN ({placeholders})",
+                            [created_at] + chunk
+                        )
+                        inserted.update(row[0] for row in cursor.fetchall())
+                generated.extend(inserted)
+                generated_set.update(inserted)
+            
+            conn.commit()
+            return generated
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+    
+    # Raffles
+    def run_raffle(self, winners=1, weight_by='streak', seed=None, unique=True):
+        """
+        Draw raffle winners among all habits (of this tracker's account when it has one), weighted
+        by streak or reward balance (see raffle.py).
+
+        Args:
+            winners (int): Number of prizes
+            weight_by (str): 'streak' or 'reward_balance'
+            seed (int, optional): Seed to reproduce an earlier draw (a random one is used otherwise)
+            unique (bool): Whether a habit can win at most one prize
+
+        Returns:
+            dict: 'winners' (habit IDs in draw order), 'seed', 'weight_by', 'entrants' and 'total_weight'
+        """
+        conn = self._connect(self.habits_db_file)
+        try:
+            habit_ids, weights = raffle.load_entrants(conn.cursor(), weight_by, self.account_id)
+        finally:
+            conn.close()
+
+        if not habit_ids:
+            raise ValueError("No habits can enter the raffle yet.")
+        winning, seed = raffle.draw(weights, winners, seed=seed, unique=unique)
+        return {
+            'winners': [habit_ids[index] for index in winning],
+            'seed': seed,
+            'weight_by': weight_by,
+            'entrants': len(habit_ids),
+            'total_weight': sum(weights)
+        }
+
+    # Leaderboards
+    def _leaderboards(self):
+        """
+        The shared leaderboards for this database (and account, when the tracker has one), loaded
+        on first use and kept current (see leaderboard.py).
+        """
+        if leaderboard.on_habit_changed not in self.habit_listeners:
+            self.habit_listeners.append(leaderboard.on_habit_changed)
+        boards = leaderboard.get_leaderboards(self.habits_db_file, self.account_id)
+        boards.ensure_current(self._connect)
+        return boards
+
+    def get_leaderboard(self, metric='streak', limit=10, offset=0):
+        """
+        One page of habits ranked by streak or reward balance, highest first.
+
+        Args:
+            metric (str): 'streak' or 'reward_balance'
+            limit (int): Page size
+            offset (int): Number of entries to skip
+
+        Returns:
+            list: Dicts with rank, habit_id, name and value; habits with equal values share a rank
+        """
+        if metric not in leaderboard.METRICS:
+            raise ValueError(f"Leaderboard metric must be one of {list(leaderboard.METRICS)}")
+        boards = self._leaderboards()
+        with boards.lock:
+            page = boards.boards[metric].top(limit, offset)
+        if not page:
+            return []
+
+        conn = self._connect(self.habits_db_file)
+        try:
+            placeholders = ", ".join("?" for _ in page)
+            names = dict(conn.execute(f"SELECT id, name FROM habits WHERE id IN ({placeholders})",
+                                      [habit_id for _, habit_id, _ in page]).fetchall())
+        finally:
+            conn.close()
+        return [{'rank': rank, 'habit_id': habit_id, 'name': names.get(habit_id), 'value': value}
+                for rank, habit_id, value in page]
+
+    def get_rank(self, habit_id, metric='streak'):
+        """
+        A habit's place on a leaderboard.
+
+        Returns:
+            dict: rank, value and the number of entrants, or None if the habit doesn't exist
+        """
+        if metric not in leaderboard.METRICS:
+            raise ValueError(f"Leaderboard metric must be one of {list(leaderboard.METRICS)}")
+        boards = self._leaderboards()
+        with boards.lock:
+            board = boards.boards[metric]
+            rank = board.rank(habit_id)
+            if rank is None:
+                return None
+            return {'habit_id': habit_id, 'rank': rank, 'value': board.value(habit_id), 'entrants': len(board)}
+
+    # Data Management
+    def recompute_streaks(self):
+        """
+        Rebuild every habit's streak and last_completed value from its completion history.
+
+        Completions are replayed in order using the same rules as record_completion, starting
+        after the habit's last hardcore or lapse reset (streak_reset_at).
+
+        Returns:
+            dict: Mapping of habit ID to the recomputed streak
+        """
+        completion_times = self._get_completion_times()
+
+        conn = self._connect(self.habits_db_file)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("SELECT id, frequency_type, streak_reset_at FROM habits")
+            updates = []
+            streaks = {}
+            for habit_id, frequency_type, reset_at in cursor.fetchall():
+                times = completion_times.get(habit_id, [])
+                streak = self._compute_streak(times, frequency_type, reset_at)
+                last_completed = times[-1] if times else None
+                updates.append((streak, last_completed, habit_id))
+                streaks[habit_id] = streak
+
+            cursor.executemany("UPDATE habits SET streak = ?, last_completed = ? WHERE id = ?", updates)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+        self._notify_habit_changed(None)
+        return streaks
+
+    def enforce_hardcore(self, until=None):
+        """
+        Reset the streak of every hardcore habit that missed its completion count in a period
+        that ended since the last evaluation (see hardcore.py).
+
+        Args:
+            until (int, optional): Evaluate periods ending up to this epoch second (defaults to now)
+
+        Returns:
+            dict: habit ID -> list of (period key, completions, required) for the habits reset
+        """
+        until = timestamps.now() if until is None else to_epoch(until)
+        conn = self._connect(self.habits_db_file)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(f"ATTACH DATABASE ? AS {hardcore.COMPLETIONS_ALIAS}", (self.completions_db_file,))
+            failures = hardcore.enforce(cursor, until)
+            self._replay_streaks_since_reset(cursor, failures)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+        if failures:
+            self._notify_habit_changed(None)
+        return failures
+
+    def rollover(self, now=None):
+        """
+        Settle every habit's streak at a period boundary: reset lapsed streaks and enforce
+        hardcore mode, in one transaction (see rollover.py). Safe to run any number of times.
+
+        Args:
+            now (int, optional): Epoch seconds to roll over to (defaults to now)
+
+        Returns:
+            dict: 'lapsed' (habit IDs) and 'hardcore' (habit ID -> failed periods)
+        """
+        now = timestamps.now() if now is None else to_epoch(now)
+        conn = self._connect(self.habits_db_file)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(f"ATTACH DATABASE ? AS {hardcore.COMPLETIONS_ALIAS}", (self.completions_db_file,))
+            result = rollover.run(cursor, now)
+            self._replay_streaks_since_reset(cursor, result['hardcore'])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+        if result['lapsed'] or result['hardcore']:
+            self._notify_habit_changed(None)
+        return result
+
+    def _replay_streaks_since_reset(self, cursor, habit_ids):
+        """
+        Rebuild the streaks of freshly reset habits from the completions recorded since their reset.
+
+        A hardcore reset takes effect at the end of the failed period, so when the rollover runs
+        late the completions made in the meantime still count. The cursor's connection has the
+        completions database attached as hardcore.COMPLETIONS_ALIAS.
+        """
+        habit_ids = list(habit_ids)
+        if not habit_ids:
+            return
+        placeholders = ", ".join("?" * len(habit_ids))
+        cursor.execute(f'''
+        SELECT h.id, h.frequency_type, h.streak_reset_at, c.completion_time
+        FROM habits AS h
+        JOIN {hardcore.COMPLETIONS_ALIAS}.habit_completions AS c ON c.habit_id = h.id
+        WHERE h.id IN ({placeholders}) AND c.completion_time >= h.streak_reset_at
+        ORDER BY h.id, c.completion_time
+        ''', habit_ids)
+        replays = {}
+        for habit_id, frequency_type, reset_at, completion_time in cursor.fetchall():
+            replays.setdefault(habit_id, (frequency_type, reset_at, []))[2].append(completion_time)
+        cursor.executemany("UPDATE habits SET streak = ? WHERE id = ?", [
+            (self._compute_streak(times, frequency_type, reset_at), habit_id)
+            for habit_id, (frequency_type, reset_at, times) in replays.items()
+        ])
+
+    def _compute_streak(self, completion_times, frequency_type, reset_at=None):
+        """
+        Replay sorted completion times (epoch seconds) and return the resulting streak (1 when there are none).
+
+        Completions before reset_at (the habit's streak_reset_at) are left out, so a reset stays in place.
+        """
+        if reset_at is not None:
+            completion_times = [completed for completed in completion_times if completed >= reset_at]
+        streak = 1
+        for previous, current in zip(completion_times, completion_times[1:]):
+            if self._is_consecutive(previous, current, frequency_type):
+                streak += 1
+            else:
+                streak = 1
+        return streak
+
+    def export_data(self):
+        """
+        Export all habits, completions, and bonus codes.
+
+        Returns:
+            dict: JSON-serializable snapshot with 'habits', 'completions', and 'bonus_codes' lists
+        """
+        conn = self._connect(self.habits_db_file)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM bonus_codes ORDER BY created_at")
+        bonus_codes = [dict(row) for row in cursor.fetchall()]
         conn.close()
+
+        return {
+            'exported_at': timestamps.now(),
+            'habits': self.get_habits(),
+            'completions': self.get_all_completions(include_archived=True),
+            'bonus_codes': bonus_codes
+        }
+
+    def import_data(self, data):
+        """
+        Import a snapshot produced by export_data.
+
+        Habits are matched by name, so importing into a store that already has a habit merges
+        the completions into it. Completions already present (same habit and time) and bonus
+        codes that already exist are skipped.
+
+        Args:
+            data (dict): Snapshot with 'habits', 'completions', and 'bonus_codes' lists
+
+        Returns:
+            dict: Counts of imported habits, completions, and bonus codes
+        """
+        conn = self._connect(self.habits_db_file)
+        cursor = conn.cursor()
+        habit_id_map = {}
+        imported_habits = 0
+        imported_codes = 0
+
+        # Imported habits join this tracker's account (or the current one)
+        account_id = self._new_row_account_id()
+
+        try:
+            for habit in data.get('habits', []):
+                cursor.execute("SELECT id FROM habits WHERE name = ? AND account_id IS ?", (habit['name'], account_id))
+                existing = cursor.fetchone()
+                if existing:
+                    habit_id_map[habit['id']] = existing[0]
+                    continue
+
+                cursor.execute('''
+                INSERT INTO habits
+                (name, description, frequency_type, frequency_count, duration_seconds,
+                 streak, reward_balance, created_at, last_completed, account_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (habit['name'], habit.get('description', ""), habit['frequency_type'],
+                      habit['frequency_count'], _whole_seconds(habit.get('duration_seconds', 0)), habit.get('streak', 1),
+                      habit.get('reward_balance', 0.0), to_epoch(habit['created_at']),
+                      to_epoch(habit.get('last_completed')), account_id))
+                new_id = cursor.lastrowid
+                habit_id_map[habit['id']] = new_id
+                cursor.executemany(
+                    "INSERT INTO preferred_times (habit_id, time) VALUES (?, ?)",
+                    [(new_id, time_str) for time_str in habit.get('preferred_times', [])]
+                )
+                imported_habits += 1
+
+            for bonus_code in data.get('bonus_codes', []):
+                cursor.execute('''
+                INSERT OR IGNORE INTO bonus_codes
+                (code, value, description, created_at, expiry_date, used, used_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (bonus_code['code'], bonus_code['value'], bonus_code.get('description', ""),
+                      to_epoch(bonus_code['created_at']), to_epoch(bonus_code.get('expiry_date')),
+                      bonus_code.get('used', 0), to_epoch(bonus_code.get('used_at'))))
+                imported_codes += cursor.rowcount
+
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+        conn_completions = self._connect(self.completions_db_file)
+        cursor_completions = conn_completions.cursor()
+
+        try:
+            # Skip completions that are already recorded for the mapped habit
+            existing_keys = set(cursor_completions.execute(
+                "SELECT habit_id, completion_time FROM habit_completions"
+            ).fetchall())
+            existing_keys.update((row['habit_id'], row['completion_time']) for row in self.archive.read())
+            rows = []
+            for completion in data.get('completions', []):
+                habit_id = habit_id_map.get(completion['habit_id'])
+                if habit_id is None:
+                    continue
+                # Exports from older versions carry ISO strings
+                completion_time = to_epoch(completion['completion_time'])
+                key = (habit_id, completion_time)
+                if key in existing_keys:
+                    continue
+                existing_keys.add(key)
+                rows.append((habit_id, completion_time,
+                             _whole_seconds(completion.get('duration_seconds')), completion.get('notes', "")))
+
+            cursor_completions.executemany(
+                "INSERT INTO habit_completions (habit_id, completion_time, duration_seconds, notes) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn_completions.commit()
+        except Exception as e:
+            conn_completions.rollback()
+            raise e
+        finally:
+            conn_completions.close()
+
+        self._assign_completion_accounts()
+        if imported_habits:
+            self._notify_habit_changed(None)
+        return {'habits': imported_habits, 'completions': len(rows), 'bonus_codes': imported_codes}
+
+    def vacuum(self):
+        """
+        Rebuild both database files to reclaim free pages.
         
-        if row:
-            return row['email']
-        return 1  # Default fallback ID
-    
\ No newline at end of file
+        This also switches older database files to incremental auto-vacuum, which lets the
+        maintenance scheduler reclaim space in small steps afterwards.
+        """
+        for db_file in (self.habits_db_file, self.completions_db_file):
+            conn = self._connect(db_file)
+            try:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+            finally:
+                conn.close()
+
+    def enable_wal(self):
+        """
+        Switch both databases to write-ahead logging.
+
+        WAL lets readers keep going while another connection writes, which matters when several
+        clients share one store (e.g. through server.py). The setting is stored in the database files.
+        """
+        for db_file in (self.habits_db_file, self.completions_db_file):
+            conn = self._connect(db_file)
+            try:
+                conn.execute("PRAGMA journal_mode = WAL")
+            finally:
+                conn.close()
+
+    def get_stats(self):
+        """
+        Get summary statistics across all habits.
+
+        Returns:
+            dict: Habit, completion, and bonus code totals plus the best current streak
+        """
+        conn = self._connect(self.habits_db_file)
+        cursor = conn.cursor()
+        account_filter, params = ("", ()) if self.account_id is None else (" WHERE account_id = ?", (self.account_id,))
+        cursor.execute("SELECT COUNT(*), COALESCE(MAX(streak), 0), COALESCE(SUM(reward_balance), 0) FROM habits"
+                       + account_filter, params)
+        habit_count, best_streak, total_reward = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(used), 0) FROM bonus_codes")
+        bonus_code_count, used_bonus_codes = cursor.fetchone()
+        conn.close()
+
+        # Includes archived completions through the archive's rollups
+        totals = self.get_completion_totals()
+        if self.account_id is not None:
+            habit_ids = self._account_habit_ids()
+            totals = {habit_id: total for habit_id, total in totals.items() if habit_id in habit_ids}
+        totals = totals.values()
+        completion_count = sum(count for count, duration in totals)
+        total_duration = sum(duration for count, duration in totals)
+
+        return {
+            'habits': habit_count,
+            'completions': completion_count,
+            'total_duration_seconds': total_duration,
+            'total_reward_balance': total_reward,
+            'best_streak': best_streak,
+            'bonus_codes': bonus_code_count,
+            'used_bonus_codes': used_bonus_codes
+        }
+
+    def minutes_to_seconds(self, minutes):
+        """Utility method to convert minutes to seconds."""
+        return int(minutes * 60)
+    
+    def get_current_user(self):
+        """Get the current account's email (cached, see get_current_account), or None without an account."""
+        account = self.get_current_account()
+        return account['email'] if account else None
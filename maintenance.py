@@ -0,0 +1,307 @@
+"""
+Background maintenance for the habit tracker databases.
+
+MaintenanceScheduler runs a set of periodic jobs on a background thread:
+
+    * sweep_expired_bonus_codes   move expired, unused bonus codes to bonus_codes_archive
+    * archive_used_bonus_codes    move codes redeemed more than a month ago to bonus_codes_archive
+    * archive_completions         move completions older than a year to the compressed archive (archive.py)
+    * prune_outbox                keep the sync outbox bounded when nothing drains it (sync_queue.py)
+    * incremental_vacuum          hand a limited number of free pages back to the file system
+    * analyze                     refresh query planner statistics (PRAGMA optimize)
+    * wal_checkpoint              copy the write-ahead log back into the database without blocking
+
+Every job gets a time budget. Jobs work in small chunks and stop when the budget is used up, and a
+SQLite progress handler interrupts any single statement that runs past it, so maintenance never
+holds a lock long enough to stall the UI or the API server. Unfinished work is picked up next run.
+"""
+import heapq
+import sqlite3
+import threading
+import time
+
+import storage
+import timestamps
+
+# Rows moved per transaction when archiving bonus codes and completions
+CHUNK_SIZE = 500
+
+
+class BudgetExceeded(Exception):
+    """Raised inside a job when its time budget has run out."""
+
+
+class MaintenanceJob:
+    """
+    A periodic maintenance task.
+
+    Args:
+        name (str): Job name used in logs and results
+        func (callable): func(habit_tracker, budget) returning a summary dict
+        interval (float): Seconds between runs
+        budget (float): Seconds the job may run for each time
+    """
+
+    def __init__(self, name, func, interval, budget=0.05):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.budget = budget
+
+
+class Budget:
+    """Deadline shared by the chunks of one job run."""
+
+    def __init__(self, seconds):
+        self.deadline = time.monotonic() + seconds
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def connect(self, db_file):
+        """Open a connection whose statements are interrupted once the deadline passes."""
+        conn = storage.connect(db_file)
+        # Called every 1000 SQLite VM steps; a non-zero return aborts the running statement
+        conn.set_progress_handler(lambda: 1 if self.expired() else 0, 1000)
+        return conn
+
+
+def _archive_bonus_codes(habit_tracker, budget, condition, params, reason):
+    """Move bonus codes matching condition to the archive table, one chunk per transaction."""
+    archived = 0
+    conn = budget.connect(habit_tracker.habits_db_file)
+    try:
+        while not budget.expired():
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT code FROM bonus_codes WHERE {condition} LIMIT ?", params + (CHUNK_SIZE,))
+            codes = [(row[0],) for row in cursor.fetchall()]
+            if not codes:
+                break
+
+            archived_at = timestamps.now()
+            cursor.executemany('''
+            INSERT OR REPLACE INTO bonus_codes_archive
+            (code, value, description, created_at, expiry_date, used, used_at, archived_at, reason)
+            SELECT code, value, description, created_at, expiry_date, used, used_at, ?, ?
+            FROM bonus_codes WHERE code = ?
+            ''', [(archived_at, reason, code) for (code,) in codes])
+            cursor.executemany("DELETE FROM bonus_codes WHERE code = ?", codes)
+            conn.commit()
+            archived += len(codes)
+    except sqlite3.OperationalError as e:
+        # Interrupted by the progress handler; the open chunk is rolled back
+        conn.rollback()
+        if "interrupted" not in str(e):
+            raise
+    finally:
+        conn.close()
+    return {'archived': archived}
+
+
+def sweep_expired_bonus_codes(habit_tracker, budget):
+    """Archive bonus codes that expired without being used."""
+    now = timestamps.now()
+    return _archive_bonus_codes(habit_tracker, budget, "expiry_date <= ? AND used = 0", (now,), 'expired')
+
+
+def archive_used_bonus_codes(habit_tracker, budget, older_than_days=30):
+    """Archive bonus codes that were redeemed more than older_than_days ago."""
+    cutoff = timestamps.now() - older_than_days * 86400
+    return _archive_bonus_codes(habit_tracker, budget, "used = 1 AND used_at <= ?", (cutoff,), 'used')
+
+
+def archive_completions(habit_tracker, budget, older_than_days=365):
+    """Move old completions to the cold archive, one chunk per transaction."""
+    archived = 0
+    try:
+        while not budget.expired():
+            count = habit_tracker.archive_completions(older_than_days=older_than_days, limit=CHUNK_SIZE,
+                                                      connect=budget.connect)
+            archived += count
+            if count < CHUNK_SIZE:
+                break
+    except sqlite3.OperationalError as e:
+        # Interrupted by the progress handler; archive_completions rolled the open chunk back
+        if "interrupted" not in str(e):
+            raise
+    return {'archived': archived}
+
+
+def prune_outbox(habit_tracker, budget, max_events=10_000, dead_after_days=30):
+    """
+    Bound the outbox: delete events dead-lettered more than dead_after_days ago, then the oldest
+    queued events beyond max_events.
+
+    Every completion, credit and redemption is queued, but only a configured SyncWorker sends
+    (and so deletes) them; without one the outbox would otherwise grow forever.
+    """
+    cutoff = timestamps.now() - dead_after_days * 86400
+    conditions = [
+        ("dead_at IS NOT NULL AND dead_at <= ?", (cutoff,)),
+        # Everything older than the newest max_events queued events
+        ("dead_at IS NULL AND id <= (SELECT id FROM outbox WHERE dead_at IS NULL ORDER BY id DESC LIMIT 1 OFFSET ?)",
+         (max_events,)),
+    ]
+    pruned = 0
+    conn = budget.connect(habit_tracker.habits_db_file)
+    try:
+        for condition, params in conditions:
+            while not budget.expired():
+                cursor = conn.execute(
+                    f"DELETE FROM outbox WHERE id IN (SELECT id FROM outbox WHERE {condition} ORDER BY id LIMIT ?)",
+                    params + (CHUNK_SIZE,)
+                )
+                conn.commit()
+                pruned += cursor.rowcount
+                if cursor.rowcount < CHUNK_SIZE:
+                    break
+    except sqlite3.OperationalError as e:
+        # Interrupted by the progress handler; the open chunk is rolled back
+        conn.rollback()
+        if "interrupted" not in str(e):
+            raise
+    finally:
+        conn.close()
+    return {'pruned': pruned}
+
+
+def incremental_vacuum(habit_tracker, budget, pages=200):
+    """Release up to `pages` free pages per database (needs auto_vacuum = INCREMENTAL)."""
+    freed = {}
+    for db_file in (habit_tracker.habits_db_file, habit_tracker.completions_db_file):
+        if budget.expired():
+            break
+        conn = budget.connect(db_file)
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # Older files need one full VACUUM (cli.py vacuum) to switch modes
+                continue
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            freed[db_file] = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                raise
+        finally:
+            conn.close()
+    return {'freed_pages': sum(freed.values())}
+
+
+def analyze(habit_tracker, budget):
+    """Refresh planner statistics, sampling a limited number of rows per index."""
+    for db_file in (habit_tracker.habits_db_file, habit_tracker.completions_db_file):
+        if budget.expired():
+            break
+        conn = budget.connect(db_file)
+        try:
+            conn.execute("PRAGMA analysis_limit = 400")
+            conn.execute("PRAGMA optimize")
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                raise
+        finally:
+            conn.close()
+    return {}
+
+
+def wal_checkpoint(habit_tracker, budget):
+    """Checkpoint write-ahead logs without waiting on readers or writers."""
+    checkpointed = 0
+    for db_file in (habit_tracker.habits_db_file, habit_tracker.completions_db_file):
+        if budget.expired():
+            break
+        conn = budget.connect(db_file)
+        try:
+            if conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+                busy, log_frames, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+                checkpointed += max(done, 0)
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                raise
+        finally:
+            conn.close()
+    return {'checkpointed_frames': checkpointed}
+
+
+def default_jobs():
+    """The standard set of maintenance jobs."""
+    return [
+        MaintenanceJob("sweep_expired_bonus_codes", sweep_expired_bonus_codes, interval=3600),
+        MaintenanceJob("archive_used_bonus_codes", archive_used_bonus_codes, interval=6 * 3600),
+        MaintenanceJob("archive_completions", archive_completions, interval=24 * 3600, budget=0.2),
+        MaintenanceJob("prune_outbox", prune_outbox, interval=6 * 3600),
+        MaintenanceJob("incremental_vacuum", incremental_vacuum, interval=3600),
+        MaintenanceJob("analyze", analyze, interval=24 * 3600, budget=0.2),
+        MaintenanceJob("wal_checkpoint", wal_checkpoint, interval=300),
+    ]
+
+
+class MaintenanceScheduler:
+    """
+    Runs maintenance jobs on a background thread, each at its own interval.
+
+    Jobs are kept in a min-heap ordered by next run time and the thread sleeps until the
+    earliest one is due.
+
+    Args:
+        habit_tracker (HabitTracker): Tracker whose databases are maintained
+        jobs (list, optional): MaintenanceJob instances (defaults to default_jobs())
+        initial_delay (float): Seconds to wait after start before the first jobs run
+    """
+
+    def __init__(self, habit_tracker, jobs=None, initial_delay=30):
+        self.habit_tracker = habit_tracker
+        self.jobs = jobs if jobs is not None else default_jobs()
+        self.initial_delay = initial_delay
+        self.last_results = {}
+
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="MaintenanceScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the background thread; a running job finishes its current chunk first."""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_all(self):
+        """Run every job once right away (used by cli.py). Returns {job name: result}."""
+        return {job.name: self.run_job(job) for job in self.jobs}
+
+    def run_job(self, job):
+        """Run one job within its budget and return its result."""
+        start = time.monotonic()
+        try:
+            result = job.func(self.habit_tracker, Budget(job.budget))
+        except Exception as e:
+            print(f"Maintenance job {job.name} failed: {e}")
+            result = {'error': str(e)}
+        result['seconds'] = round(time.monotonic() - start, 4)
+        self.last_results[job.name] = result
+        return result
+
+    def _run(self):
+        first_run = time.monotonic() + self.initial_delay
+        # (next run time, position, job); the position keeps ordering stable for equal times
+        queue = [(first_run, i, job) for i, job in enumerate(self.jobs)]
+        heapq.heapify(queue)
+
+        while queue and not self._stopping.is_set():
+            due, position, job = queue[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                self._stopping.wait(delay)
+                continue
+
+            heapq.heappop(queue)
+            self.run_job(job)
+            heapq.heappush(queue, (time.monotonic() + job.interval, position, job))
@@ -16,24 +16,11 @@ from kivy.uix.behaviors import ToggleButtonBehavior
 from datetime import datetime
 import os
 import sys
-import json
 
 # Add the parent directory to the Python path to import main.py
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from main import HabitTracker
-
-# Load settings function baked into the file
-def load_settings():
-    """
-    Load settings from the settings.json file.
-    If the file doesn't exist, return default settings.
-    """
-    try:
-        with open("settings.json", "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        # Default settings if the file doesn't exist
-        return {"background_color": "white", "button_color": "blue"}
+from theme import get_theme
 
 class AddHabitPage(Screen):
     def __init__(self, **kwargs):
@@ -104,7 +91,6 @@ class AddHabitPage(Screen):
             text="Save Habit",
             size_hint_y=None,
             height=dp(50),
-            background_color=get_color_from_hex("#2196F3"),
             color=get_color_from_hex("#FFFFFF"),
             on_press=self.save_habit
         )
@@ -131,6 +117,10 @@ class AddHabitPage(Screen):
         
         # Add layout to screen
         self.add_widget(self.layout)
+        
+        # Button colors follow the theme
+        theme = get_theme()
+        theme.bind_color(self.save_button)
     
     def save_habit(self, instance):
         """Save the habit to the database."""
@@ -181,16 +171,6 @@ class AddHabitPage(Screen):
         except ValueError as e:
             self.show_error(str(e))
     
-    def update_colors(self):
-        """Update button colors based on settings."""
-        settings = load_settings()
-        self.save_button.background_color = get_color_from_hex({
-            "blue": "#2196F3",
-            "green": "#088F8F",
-            "pink": "#E91E63",
-        }.get(settings["button_color"], "#2196F3"))
-        self.back_button.background_color = get_color_from_hex("#757575")  # Keep back button color consistent
-    
     def go_back(self, instance):
         """Return to the main menu."""
         self.manager.transition.direction = 'right'
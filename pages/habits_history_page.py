@@ -7,27 +7,14 @@ from kivy.uix.gridlayout import GridLayout
 from kivy.metrics import dp
 from kivy.utils import get_color_from_hex
 from kivy.core.window import Window  
-from datetime import datetime
 import os
 import sys
-import json
 
 # Add the parent directory to the Python path to import main.py
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from main import HabitTracker
-
-# Load settings function baked into the file
-def load_settings():
-    """
-    Load settings from the settings.json file.
-    If the file doesn't exist, return default settings.
-    """
-    try:
-        with open("settings.json", "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        # Default settings if the file doesn't exist
-        return {"background_color": "white", "button_color": "blue"}
+from theme import get_theme
+from timestamps import format_local
 
 class HabitsHistoryPage(Screen):
     def __init__(self, **kwargs):
@@ -64,7 +51,6 @@ class HabitsHistoryPage(Screen):
             text="Back to Main Menu",
             size_hint_y=None,
             height=dp(50),
-            background_color=get_color_from_hex("#2196F3"),
             color=get_color_from_hex("#FFFFFF"),
             on_press=self.go_back
         )
@@ -77,18 +63,22 @@ class HabitsHistoryPage(Screen):
         # Add layout to screen
         self.add_widget(self.layout)
         
-        # Update colors based on settings
-        self.update_colors()  # Add this line
+        # Button colors follow the theme
+        theme = get_theme()
+        theme.bind_color(self.back_button)
     
     def load_habit_history(self):
         """Load habit completion history from the database and display it."""
-        # Fetch all habit completions
-        completions = self.habit_tracker.get_all_completions()
+        # Fetch all habit completions (compact columns rather than one dict per row)
+        completions = self.habit_tracker.get_completion_columns()
+
+        # Look up every habit name once instead of once per completion
+        habit_names = {habit['id']: habit['name'] for habit in self.habit_tracker.get_habits()}
         
         # Clear existing history
         self.history_grid.clear_widgets()
         
-        if not completions:
+        if not len(completions):
             # Show a message if no habit history is found
             no_history_label = Label(
                 text="No habit history found.",
@@ -104,8 +94,7 @@ class HabitsHistoryPage(Screen):
                 completion_layout = BoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None, height=dp(100))
                 
                 # Habit name
-                habit = self.habit_tracker.get_habit(completion['habit_id'])
-                habit_name = habit['name'] if habit else "Unknown Habit"
+                habit_name = habit_names.get(completion.habit_id, "Unknown Habit")
                 
                 name_label = Label(
                     text=f"Habit: {habit_name}",
@@ -116,7 +105,7 @@ class HabitsHistoryPage(Screen):
                 )
                 
                 # Completion time
-                completion_time = datetime.fromisoformat(completion['completion_time']).strftime("%Y-%m-%d %H:%M:%S")
+                completion_time = format_local(completion.completion_time)
                 time_label = Label(
                     text=f"Completed at: {completion_time}",
                     font_size=dp(14),
@@ -127,7 +116,7 @@ class HabitsHistoryPage(Screen):
                 
                 # Duration (if available)
                 duration_label = Label(
-                    text=f"Duration: {completion['duration_seconds']} seconds" if completion['duration_seconds'] else "Duration: N/A",
+                    text=f"Duration: {completion.duration_seconds} seconds" if completion.duration_seconds else "Duration: N/A",
                     font_size=dp(14),
                     color=get_color_from_hex("#757575"),
                     size_hint_y=None,
@@ -142,15 +131,6 @@ class HabitsHistoryPage(Screen):
                 # Add completion layout to grid
                 self.history_grid.add_widget(completion_layout)
     
-    def update_colors(self):
-        """Update button colors based on settings."""
-        settings = load_settings()
-        self.back_button.background_color = get_color_from_hex({
-            "blue": "#2196F3",
-            "green": "#088F8F",
-            "pink": "#E91E63",
-        }.get(settings["button_color"], "#2196F3"))
-    
     def go_back(self, instance):
         """Return to the main menu."""
         self.manager.transition.direction = 'right'
@@ -21,14 +21,10 @@ from datetime import datetime
 # Add the parent directory to the Python path to import main.py
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from main import HabitTracker
-
-# Load settings function baked into the file
-def load_settings():
-    try:
-        with open("settings.json", "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return {"background_color": "white", "button_color": "blue"}
+from theme import get_theme
+from streak_icons import milestone_reached, streak_texture
+from particle_system import ParticleSystem
+from verification import CompletionVerifier, ReplayStore, credit_verified_completion, load_secret
 
 class MyHabitsPage(Screen):
     def __init__(self, **kwargs):
@@ -37,6 +33,11 @@ class MyHabitsPage(Screen):
         # Initialize HabitTracker
         self.habit_tracker = HabitTracker()
         
+        # Verifier for the signed completion tokens handed back by the ad page; without a
+        # provisioned secret (see verification.py) ad completions can't be credited
+        secret = load_secret(self.habit_tracker.data_dir)
+        self.verifier = CompletionVerifier(secret, ReplayStore(self.habit_tracker.habits_db_file)) if secret else None
+        
         # Path for the daily habits completion JSON file
         self.daily_habits_file = "daily_habits_completion.json"
         
@@ -71,7 +72,6 @@ class MyHabitsPage(Screen):
             text="Back to Main Menu",
             size_hint_y=None,
             height=dp(50),
-            background_color=get_color_from_hex("#2196F3"),
             color=get_color_from_hex("#FFFFFF"),
             on_press=self.go_back
         )
@@ -84,8 +84,13 @@ class MyHabitsPage(Screen):
         # Add layout to screen
         self.add_widget(self.layout)
         
-        # Update colors based on settings
-        self.update_colors()
+        # Overlay for streak milestone celebrations (idle until a burst)
+        self.particles = ParticleSystem()
+        self.add_widget(self.particles)
+        
+        # Button colors follow the theme
+        theme = get_theme()
+        theme.bind_color(self.back_button)
     
     def initialize_daily_habits_tracking(self):
         """Initialize or load the daily habits completion tracking system."""
@@ -124,19 +129,6 @@ class MyHabitsPage(Screen):
         except Exception as e:
             print(f"Error saving daily habits file: {e}")
     
-    def get_streak_icon_path(self, streak):
-        """Return the appropriate icon path based on streak milestone."""
-        icons_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'icons')
-        
-        if streak >= 21:
-            return os.path.join(icons_dir, 'streak_21.png')
-        elif streak >= 15:
-            return os.path.join(icons_dir, 'streak_15.png')
-        elif streak >= 7:
-            return os.path.join(icons_dir, 'streak_7.png')
-        else:
-            return os.path.join(icons_dir, 'streak_1.png')
-    
     def format_frequency(self, frequency_type, frequency_count):
         """Format frequency in a more readable way (e.g., '3x daily' instead of 'daily (3 times)')."""
         if frequency_count == 1:
@@ -198,11 +190,11 @@ class MyHabitsPage(Screen):
                     spacing=dp(10)  # Add spacing between icon and name
                 )
                 
-                # Add streak icon based on milestone
-                streak_icon_path = self.get_streak_icon_path(habit['streak'])
-                if os.path.exists(streak_icon_path):
+                # Add streak icon based on milestone (a shared, preloaded texture)
+                streak_icon_texture = streak_texture(habit['streak'])
+                if streak_icon_texture is not None:
                     streak_icon = Image(
-                        source=streak_icon_path,
+                        texture=streak_icon_texture,
                         size_hint_x=None,
                         width=dp(24),
                         pos_hint={'center_y': 0.5}  # Center vertically
@@ -771,33 +763,32 @@ class MyHabitsPage(Screen):
             self.show_error_popup(f"Could not find habit with ID: {habit_id}")
             return
         
-        # Get user email
-        username = HabitTracker.get_current_user(self)  
+        # Get user email (cached after the first lookup)
+        username = self.habit_tracker.get_current_user() or ""
         
         # Extract relevant information
         duration_seconds = habit.get('duration_seconds', 0)
         streak = habit.get('streak', 0)
         
-        # Build URL with query parameters
-        url = f"https://radicool.club/habit-tracker-page?username={username}&duration_seconds={duration_seconds}&streak={streak}"
+        # Build URL with query parameters; the ad page signs its completion token for this habit_id
+        url = (f"https://radicool.club/habit-tracker-page?username={username}&habit_id={habit_id}"
+               f"&duration_seconds={duration_seconds}&streak={streak}")
         
         # Add bonus codes if available
-        bonus_codes = self.habit_tracker.get_bonus_codes(include_used=False)
-        if bonus_codes:
-            # Take the first unused bonus code as an example
+        bonus_code = self.habit_tracker.get_next_bonus_code()
+        if bonus_code:
+            # Take the next unused bonus code
             # You might want to implement a selection mechanism
-            bonus_code = bonus_codes[0]['code']
-            url += f"&bonus_code={bonus_code}"
+            url += f"&bonus_code={bonus_code['code']}"
         
         print(f"Opening URL for ads: {url}")
         
         webbrowser.open(url)
         
-        
-        # For demo purposes, immediately simulate a verification response
-        self.simulate_verification_response(habit_id, None) 
+        # Nothing is credited yet: the ad page's callback hands its signed token to handle_verification_response
 
-    def simulate_verification_response(self, habit_id, hash_code=None):
+    def handle_verification_response(self, habit_id, token=None):
+        """Credit a completion reported by the ad page, only if its token verifies (see verification.py)."""
         print(f"Habit ID: {habit_id}")
 
         habit_id_str = str(habit_id)
@@ -814,8 +805,12 @@ class MyHabitsPage(Screen):
         # Check if the habit can still be completed
         if current_completions < max_completions:
             try:
-                # Record the completion in the database
-                updated_habit = self.habit_tracker.record_completion(habit_id)
+                # Record the completion in the database, if the ad page's token checks out
+                try:
+                    updated_habit = credit_verified_completion(self.habit_tracker, self.verifier, habit_id, token)
+                except ValueError as e:
+                    self.show_error_popup(f"Could not verify habit completion: {e}")
+                    return
                 
                 # Update the local completion count
                 self.completed_habits[habit_id_str] = current_completions + 1
@@ -824,6 +819,11 @@ class MyHabitsPage(Screen):
                 # Refresh the UI to reflect changes
                 self.load_habits()
                 
+                # Celebrate reaching a new streak icon
+                milestone = milestone_reached(habit['streak'], updated_habit['streak'])
+                if milestone:
+                    self.particles.burst(texture=streak_texture(milestone))
+                
                 print(f"Habit {habit_id} marked as completed ({self.completed_habits[habit_id_str]}/{max_completions} times today).")
                 print(f"Updated habit: {updated_habit}")
             except Exception as e:
@@ -851,15 +851,9 @@ class MyHabitsPage(Screen):
         else:
             print(f"Habit {habit_id} has already been completed today.")
 
-    def update_colors(self):
-        """Update button colors based on settings."""
-        settings = load_settings()
-        self.back_button.background_color = get_color_from_hex({
-            "blue": "#2196F3",
-            "green": "#088F8F",
-            "pink": "#E91E63",
-        }.get(settings["button_color"], "#2196F3"))
-
+    def on_leave(self, *args):
+        self.particles.stop()
+    
     def go_back(self, instance):
         """Return to the main menu."""
         self.manager.transition.direction = 'right'
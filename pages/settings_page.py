@@ -8,14 +8,30 @@ from kivy.uix.scrollview import ScrollView
 from kivy.metrics import dp
 from kivy.utils import get_color_from_hex
 from kivy.core.window import Window
-import json
+import os
+import sys
+
+# Add the parent directory to the Python path to import settings.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from settings import get_settings
+from theme import get_theme
+
+
+def spinner_text(spinner, name):
+    """The spinner value for a stored color name ("dark gray" -> "Dark Gray")."""
+    for value in spinner.values:
+        if value.lower() == name:
+            return value
+    return spinner.values[0]
+
 
 class SettingsPage(Screen):
     def __init__(self, **kwargs):
         super(SettingsPage, self).__init__(**kwargs)
         
-        # Load settings
-        self.settings = self.load_settings()
+        # Shared settings (see settings.py) and the theme that follows them (see theme.py)
+        self.settings = get_settings()
+        self.theme = get_theme()
         
         # Main layout wrapped in a ScrollView
         self.scroll_view = ScrollView(
@@ -62,10 +78,10 @@ class SettingsPage(Screen):
         self.layout.add_widget(background_color_label)
         
         self.background_color_spinner = Spinner(
-            text=self.settings["background_color"].capitalize(),
             values=("White", "Gray", "Black", "Dark Gray"),
             size_hint_y=None,
             height=dp(50))
+        self.background_color_spinner.text = spinner_text(self.background_color_spinner, self.settings["background_color"])
         self.background_color_spinner.bind(text=self.change_background_color)
         self.layout.add_widget(self.background_color_spinner)
         
@@ -80,10 +96,10 @@ class SettingsPage(Screen):
         self.layout.add_widget(button_color_label)
         
         self.button_color_spinner = Spinner(
-            text=self.settings["button_color"].capitalize(),
             values=("Blue", "Green", "Pink"),
             size_hint_y=None,
             height=dp(50))
+        self.button_color_spinner.text = spinner_text(self.button_color_spinner, self.settings["button_color"])
         self.button_color_spinner.bind(text=self.change_button_color)
         self.layout.add_widget(self.button_color_spinner)
         
@@ -92,14 +108,10 @@ class SettingsPage(Screen):
             text="Save Settings",
             size_hint_y=None,
             height=dp(50),
-            background_color=get_color_from_hex({
-                "blue": "#2196F3",
-                "green": "#088F8F",
-                "pink": "#E91E63",
-            }.get(self.settings["button_color"], "#2196F3")),
             color=get_color_from_hex("#FFFFFF"),
             on_press=self.save_settings
         )
+        self.theme.bind_color(save_button)
         self.layout.add_widget(save_button)
         
         # Back button
@@ -107,14 +119,10 @@ class SettingsPage(Screen):
             text="Back to Main Menu",
             size_hint_y=None,
             height=dp(50),
-            background_color=get_color_from_hex({
-                "blue": "#2196F3",
-                "green": "#088F8F",
-                "pink": "#E91E63",
-            }.get(self.settings["button_color"], "#2196F3")),
             color=get_color_from_hex("#FFFFFF"),
             on_press=self.go_back
         )
+        self.theme.bind_color(back_button)
         self.layout.add_widget(back_button)
         
         # Add the layout to the ScrollView
@@ -169,48 +177,25 @@ class SettingsPage(Screen):
         )
         self.layout.add_widget(enable_login_button)
     
-    def load_settings(self):
-        try:
-            with open("settings.json", "r") as file:
-                return json.load(file)
-        except FileNotFoundError:
-            return {"background_color": "white", "button_color": "blue"}
-    
     def save_settings(self, instance):
-        self.settings["background_color"] = self.background_color_spinner.text.lower()
-        self.settings["button_color"] = self.button_color_spinner.text.lower()
-        with open("settings.json", "w") as file:
-            json.dump(self.settings, file)
+        # Screens listening for changes update their colors immediately; the file is written shortly after
+        self.settings.update(
+            background_color=self.background_color_spinner.text.lower(),
+            button_color=self.button_color_spinner.text.lower())
         self.show_popup("Success", "Settings saved successfully!")
-        
-        # Update the app's colors immediately
-        self.update_app_colors()
     
     def change_background_color(self, instance, value):
-        color_map = {
-            "White": "#FFFFFF",
-            "Gray": "#CCCCCC",
-            "Black": "#000000",
-            "Dark Gray": "#666666"
-        }
-        Window.clearcolor = get_color_from_hex(color_map.get(value, "#FFFFFF"))
+        # Preview through the theme; the setting changes when saved
+        self.theme.set_background_color(value.lower())
     
     def change_button_color(self, instance, value):
-        color_map = {
-            "Blue": "#2196F3",
-            "Green": "#088F8F",
-            "Pink": "#E91E63",
-        }
-        self.settings["button_color"] = value.lower()
-        for child in self.layout.children:
-            if isinstance(child, Button):
-                child.background_color = get_color_from_hex(color_map.get(value, "#2196F3"))
+        self.theme.set_button_color(value.lower())
     
-    def update_app_colors(self):
-        """Update colors across all screens."""
-        for screen in self.manager.screens:
-            if hasattr(screen, 'update_colors'):
-                screen.update_colors()
+    def on_pre_leave(self, *args):
+        # Drop an unsaved preview
+        self.background_color_spinner.text = spinner_text(self.background_color_spinner, self.settings["background_color"])
+        self.button_color_spinner.text = spinner_text(self.button_color_spinner, self.settings["button_color"])
+        self.theme.apply_settings(self.settings)
     
     def go_back(self, instance):
         self.manager.transition.direction = 'right'
@@ -0,0 +1,67 @@
+"""
+Particle burst overlay for streak milestone celebrations.
+
+ParticleSystem is one widget that draws every particle of a ParticleField (see particles.py)
+with a single Mesh instruction; there is no widget per particle. It runs on a per-frame Clock
+event that burst() schedules and that is cancelled as soon as the last particle has died, so an
+idle system costs nothing.
+
+    particles = ParticleSystem()
+    screen.add_widget(particles)
+    particles.burst(texture=streak_texture(21))
+"""
+from kivy.clock import Clock
+from kivy.graphics import Color, Mesh
+from kivy.uix.widget import Widget
+
+from particles import FULL_TEXTURE, MAX_PARTICLES, ParticleField
+
+
+class ParticleSystem(Widget):
+    """
+    Overlay widget that draws a ParticleField with a single Mesh.
+
+    Add it on top of a screen; it doesn't handle touches, so the widgets below keep working.
+    """
+
+    def __init__(self, capacity=MAX_PARTICLES, **kwargs):
+        super(ParticleSystem, self).__init__(**kwargs)
+        self.field = ParticleField(capacity)
+        self._event = None
+        with self.canvas:
+            self._color = Color(1, 1, 1, 1)
+            self._mesh = Mesh(mode='triangles')
+
+    @property
+    def running(self):
+        return self._event is not None
+
+    def burst(self, x=None, y=None, count=1500, texture=None, color=(1, 1, 1, 1)):
+        """Emit count particles from (x, y), the widget's center by default, and start animating."""
+        if x is None or y is None:
+            x, y = self.center
+        # One texture for the whole mesh: a new burst takes over the texture of any running one
+        self._mesh.texture = texture
+        self.field.tex_coords = tuple(texture.tex_coords) if texture is not None else FULL_TEXTURE
+        self._color.rgba = color
+        self.field.emit(x, y, count)
+        self._mesh.indices = self.field.indices()
+        if self._event is None:
+            # Every frame until the last particle dies
+            self._event = Clock.schedule_interval(self._update, 0)
+
+    def stop(self):
+        """Stop animating and drop all particles."""
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+        self.field.clear()
+        self._mesh.vertices = []
+        self._mesh.indices = []
+
+    def _update(self, dt):
+        # Cap the step so a stalled frame doesn't fling particles off screen
+        if not self.field.step(min(dt, 1 / 20)):
+            self.stop()
+            return False
+        self._mesh.vertices = self.field.vertices()
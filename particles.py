@@ -0,0 +1,159 @@
+"""
+Particle simulation for streak milestone celebrations.
+
+ParticleField moves the particles and builds the vertex array of a single Kivy Mesh: each
+particle is a textured quad (x, y, u, v per vertex), and the whole array is rebuilt in one pass
+per frame. It uses NumPy when it is installed (one vectorized step per frame) and per-column
+Python lists processed with comprehensions otherwise (roughly 5x slower, still well within a
+60 fps frame for a few thousand particles).
+
+It doesn't need Kivy. particle_system.py draws it on screen, and benchmarks/bench_particles.py
+times it headless.
+"""
+import math
+import random
+from array import array
+from itertools import chain
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Mesh indices are unsigned shorts: 4 vertices per particle keeps us under 65536 vertices
+MAX_PARTICLES = 16000
+# Quad corners (bottom-left, bottom-right, top-right, top-left), the order of Texture.tex_coords
+CORNERS = ((-1.0, -1.0), (1.0, -1.0), (1.0, 1.0), (-1.0, 1.0))
+FULL_TEXTURE = (0.0, 0.0, 1.0, 0.0, 1.0, 1.0, 0.0, 1.0)
+
+# Columns of the particle state: position, velocity, remaining life, total life, size
+X, Y, VX, VY, LIFE, TTL, SIZE = range(7)
+COLUMNS = 7
+
+if numpy is not None:
+    CORNERS_X = numpy.array([corner[0] for corner in CORNERS], dtype=numpy.float32)
+    CORNERS_Y = numpy.array([corner[1] for corner in CORNERS], dtype=numpy.float32)
+
+
+class ParticleField:
+    """
+    Particle simulation producing Mesh vertices (x, y, u, v per vertex, 4 vertices per particle).
+
+    Particles keep their slot until the whole field is cleared; dead particles collapse to a
+    zero-size quad, so the index array only changes when particles are emitted.
+
+    Args:
+        capacity (int): Most particles alive at once
+        gravity (float): Vertical acceleration in pixels per second squared
+        seed (int, optional): Random seed, for reproducible benchmarks
+        use_numpy (bool, optional): Force the NumPy (True) or plain-Python (False) implementation
+    """
+
+    def __init__(self, capacity=MAX_PARTICLES, gravity=-900.0, seed=None, use_numpy=None):
+        if use_numpy and numpy is None:
+            raise ImportError("NumPy is not installed")
+        self.capacity = min(capacity, MAX_PARTICLES)
+        self.gravity = gravity
+        self.random = random.Random(seed)
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+        self.tex_coords = FULL_TEXTURE
+        self.alive = 0
+        self.clear()
+
+    def __len__(self):
+        """Number of particle slots in use (alive or not yet cleared)."""
+        return self._count
+
+    def clear(self):
+        """Drop every particle."""
+        self._count = 0
+        self.alive = 0
+        if self.use_numpy:
+            # One row per particle
+            self._state = numpy.zeros((0, COLUMNS), dtype=numpy.float32)
+        else:
+            # One list per column
+            self._state = [[] for _ in range(COLUMNS)]
+
+    def emit(self, x, y, count, speed=(200.0, 700.0), life=(0.8, 1.8), size=(6.0, 18.0)):
+        """
+        Emit up to count particles from (x, y) in random directions.
+
+        Returns:
+            int: Number of particles actually emitted (limited by the capacity)
+        """
+        count = max(0, min(count, self.capacity - self._count))
+        rng = self.random
+        rows = []
+        for _ in range(count):
+            angle = rng.uniform(0, 2 * math.pi)
+            velocity = rng.uniform(*speed)
+            ttl = rng.uniform(*life)
+            rows.append((x, y, velocity * math.cos(angle), velocity * math.sin(angle),
+                         ttl, ttl, rng.uniform(*size)))
+
+        if self.use_numpy:
+            self._state = numpy.concatenate([self._state, numpy.array(rows, dtype=numpy.float32).reshape(-1, COLUMNS)])
+        else:
+            for column, values in zip(self._state, zip(*rows)):
+                column.extend(values)
+        self._count += count
+        self.alive += count
+        return count
+
+    def step(self, dt):
+        """
+        Advance the simulation by dt seconds.
+
+        Returns:
+            int: Number of particles still alive
+        """
+        if not self._count:
+            return 0
+        if self.use_numpy:
+            state = self._state
+            state[:, VY] += self.gravity * dt
+            state[:, X] += state[:, VX] * dt
+            state[:, Y] += state[:, VY] * dt
+            state[:, LIFE] -= dt
+            self.alive = int(numpy.count_nonzero(state[:, LIFE] > 0))
+        else:
+            xs, ys, vxs, vys, lives, ttls, sizes = self._state
+            gravity_dt = self.gravity * dt
+            vys[:] = [vy + gravity_dt for vy in vys]
+            xs[:] = [x + vx * dt for x, vx in zip(xs, vxs)]
+            ys[:] = [y + vy * dt for y, vy in zip(ys, vys)]
+            lives[:] = [life - dt for life in lives]
+            self.alive = sum(1 for life in lives if life > 0)
+        return self.alive
+
+    def vertices(self):
+        """The Mesh vertex array for the current state (a flat float32 buffer)."""
+        u0, v0, u1, v1, u2, v2, u3, v3 = self.tex_coords
+        if self.use_numpy:
+            state = self._state
+            # Particles shrink to nothing as they age; dead ones become zero-size quads
+            half = numpy.clip(state[:, SIZE] * (state[:, LIFE] / state[:, TTL]), 0, None)
+            vertices = numpy.empty((self._count, 4, 4), dtype=numpy.float32)
+            vertices[:, :, 0] = state[:, X, None] + CORNERS_X * half[:, None]
+            vertices[:, :, 1] = state[:, Y, None] + CORNERS_Y * half[:, None]
+            vertices[:, :, 2] = (u0, u1, u2, u3)
+            vertices[:, :, 3] = (v0, v1, v2, v3)
+            return vertices.ravel()
+
+        xs, ys, vxs, vys, lives, ttls, sizes = self._state
+        halves = [size * life / ttl if life > 0 else 0.0 for size, life, ttl in zip(sizes, lives, ttls)]
+        return array('f', chain.from_iterable(
+            (x - half, y - half, u0, v0,
+             x + half, y - half, u1, v1,
+             x + half, y + half, u2, v2,
+             x - half, y + half, u3, v3)
+            for x, y, half in zip(xs, ys, halves)
+        ))
+
+    def indices(self):
+        """The Mesh index array (two triangles per particle)."""
+        indices = array('H')
+        for base in range(0, self._count * 4, 4):
+            indices.extend((base, base + 1, base + 2, base + 2, base + 3, base))
+        return indices
@@ -0,0 +1,96 @@
+"""
+Habit frequency periods in local time.
+
+A daily habit's period is a local calendar day, a weekly one a Monday-to-Sunday week, a monthly
+one a calendar month and a yearly one a calendar year. Boundaries are computed on local calendar
+dates, so a day is 23 or 25 hours long across DST changes.
+
+Each period is identified by the local date it starts on ('YYYY-MM-DD'). PERIOD_KEY_SQL computes
+the same key in SQLite from an epoch column, so completions can be grouped by period in SQL and
+matched against the periods enumerated here.
+"""
+from datetime import date, datetime, timedelta
+
+FREQUENCY_TYPES = ('daily', 'weekly', 'monthly', 'yearly')
+
+# SQL expression for the key of the period an epoch column falls in, by frequency type.
+# 'localtime' uses the same time zone as datetime.fromtimestamp.
+_PERIOD_KEY_SQL = {
+    'daily': "date({column}, 'unixepoch', 'localtime')",
+    'weekly': "date({column}, 'unixepoch', 'localtime', '-6 days', 'weekday 1')",
+    'monthly': "strftime('%Y-%m-01', {column}, 'unixepoch', 'localtime')",
+    'yearly': "strftime('%Y-01-01', {column}, 'unixepoch', 'localtime')",
+}
+
+
+def period_key_sql(column, frequency_type_column):
+    """SQL CASE expression giving the period key of `column` for each row's frequency type."""
+    cases = " ".join(f"WHEN '{frequency_type}' THEN {expression.format(column=column)}"
+                     for frequency_type, expression in _PERIOD_KEY_SQL.items())
+    return f"CASE {frequency_type_column} {cases} END"
+
+
+def period_start_date(day, frequency_type):
+    """The local date the period containing `day` (a date) starts on."""
+    if frequency_type == 'daily':
+        return day
+    if frequency_type == 'weekly':
+        return day - timedelta(days=day.weekday())
+    if frequency_type == 'monthly':
+        return day.replace(day=1)
+    if frequency_type == 'yearly':
+        return day.replace(month=1, day=1)
+    raise ValueError(f"Frequency type must be one of {list(FREQUENCY_TYPES)}")
+
+
+def next_period_start_date(start, frequency_type):
+    """The local date the period after the one starting on `start` starts on."""
+    if frequency_type == 'daily':
+        return start + timedelta(days=1)
+    if frequency_type == 'weekly':
+        return start + timedelta(days=7)
+    if frequency_type == 'monthly':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    if frequency_type == 'yearly':
+        return date(start.year + 1, 1, 1)
+    raise ValueError(f"Frequency type must be one of {list(FREQUENCY_TYPES)}")
+
+
+def local_midnight(day):
+    """Epoch seconds of local midnight at the start of `day`."""
+    return int(datetime.combine(day, datetime.min.time()).timestamp())
+
+
+def period_start(epoch, frequency_type):
+    """Epoch seconds at which the period containing `epoch` started."""
+    return local_midnight(period_start_date(datetime.fromtimestamp(epoch).date(), frequency_type))
+
+
+def next_boundary(epoch, frequency_type):
+    """Epoch seconds of the first period boundary after `epoch`."""
+    start = period_start_date(datetime.fromtimestamp(epoch).date(), frequency_type)
+    return local_midnight(next_period_start_date(start, frequency_type))
+
+
+def period_end(key, frequency_type):
+    """Epoch seconds at which the period identified by `key` ('YYYY-MM-DD' start date) ends."""
+    return local_midnight(next_period_start_date(date.fromisoformat(key), frequency_type))
+
+
+def periods_ending_between(since, until, frequency_type):
+    """
+    The periods that ended after `since` and at or before `until` (epoch seconds).
+
+    Returns:
+        list: (key, start, end) tuples, oldest first; start and end are epoch seconds
+    """
+    periods = []
+    start = period_start_date(datetime.fromtimestamp(since).date(), frequency_type)
+    while True:
+        end = next_period_start_date(start, frequency_type)
+        end_epoch = local_midnight(end)
+        if end_epoch > until:
+            return periods
+        if end_epoch > since:
+            periods.append((start.isoformat(), local_midnight(start), end_epoch))
+        start = end
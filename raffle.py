@@ -0,0 +1,187 @@
+"""
+Raffles: draw winning habits with chances weighted by streak or reward balance.
+
+Every habit with a positive weight is an entrant. Weights are integers (the streak, or the reward
+balance in cents), so the samplers below do exact integer arithmetic and a draw is fully
+determined by the entrant list and the seed:
+
+    * AliasTable     Vose's alias method: O(n) to build, O(1) per draw. Used for draws with
+                     replacement (one entrant can win several prizes).
+    * FenwickTree    a binary indexed tree over the weights: O(n) to build, O(log n) per draw and
+                     per weight change. Used for draws without replacement, where each winner's
+                     weight is set to 0 before the next draw.
+
+Entrants are loaded in one query ordered by habit ID, and the random stream is random.Random(seed),
+so the same seed over the same data always yields the same winners. When no seed is given a random
+one is chosen and returned with the result, so any draw can be replayed and audited.
+
+benchmarks/bench_raffle.py times loading and drawing from a million entrants.
+"""
+import random
+import secrets
+
+# How each weighting turns a habit row into an integer weight
+WEIGHT_SQL = {
+    'streak': "streak",
+    'reward_balance': "CAST(ROUND(reward_balance * 100) AS INTEGER)",
+}
+
+
+class AliasTable:
+    """
+    Vose's alias method over integer weights.
+
+    Each of the n columns holds total/n units of probability, split between the column's own
+    entrant (threshold[i] units) and one alias. A draw picks a column and compares one more random
+    number with its threshold.
+
+    Args:
+        weights (list): Non-negative integer weights with a positive sum
+    """
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        if not n or total <= 0:
+            raise ValueError("A raffle needs at least one entrant with a positive weight")
+        self.total = total
+        self.threshold = [0] * n
+        self.alias = list(range(n))
+
+        # Scaled by n, a column's share is exactly total units
+        scaled = [weight * n for weight in weights]
+        small = [i for i, weight in enumerate(scaled) if weight < total]
+        large = [i for i, weight in enumerate(scaled) if weight >= total]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.threshold[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= total - scaled[less]
+            (small if scaled[more] < total else large).append(more)
+        # Whatever is left fills its column on its own
+        for i in small + large:
+            self.threshold[i] = total
+
+    def __len__(self):
+        return len(self.threshold)
+
+    def sample(self, rng):
+        """Index of a random entrant, drawn with probability weight / total."""
+        column = rng.randrange(len(self.threshold))
+        return column if rng.randrange(self.total) < self.threshold[column] else self.alias[column]
+
+
+class FenwickTree:
+    """
+    Binary indexed tree of integer weights supporting weighted draws and weight changes.
+
+    Args:
+        weights (list): Non-negative integer weights
+    """
+
+    def __init__(self, weights):
+        n = len(weights)
+        self.weights = list(weights)
+        # 1-based partial sums, built in O(n) by pushing each node into its parent
+        tree = [0] + self.weights
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._top = 1 << n.bit_length() if n else 0
+
+    def __len__(self):
+        return len(self.weights)
+
+    @property
+    def total(self):
+        """Sum of all weights."""
+        return self.prefix_sum(len(self.weights))
+
+    def prefix_sum(self, count):
+        """Sum of the first `count` weights."""
+        result = 0
+        while count > 0:
+            result += self._tree[count]
+            count -= count & -count
+        return result
+
+    def update(self, index, weight):
+        """Set the weight of entrant `index`."""
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def find(self, target):
+        """Index of the entrant whose cumulative weight range contains target (0 <= target < total)."""
+        position = 0
+        step = self._top
+        while step:
+            following = position + step
+            if following < len(self._tree) and self._tree[following] <= target:
+                position = following
+                target -= self._tree[following]
+            step >>= 1
+        return position
+
+    def sample(self, rng):
+        """Index of a random entrant, drawn with probability weight / total."""
+        total = self.total
+        if total <= 0:
+            raise ValueError("No entrants with a positive weight are left")
+        return self.find(rng.randrange(total))
+
+
+def load_entrants(cursor, weight_by='streak', account_id=None):
+    """
+    Every habit with a positive weight, in habit ID order.
+
+    Args:
+        account_id (int, optional): Only this account's habits (every account's when None)
+
+    Returns:
+        tuple: (habit IDs, weights) as parallel lists
+    """
+    if weight_by not in WEIGHT_SQL:
+        raise ValueError(f"weight_by must be one of {list(WEIGHT_SQL)}")
+    account_filter, params = ("", ()) if account_id is None else ("AND account_id = ?", (account_id,))
+    cursor.execute(f'''
+    SELECT id, {WEIGHT_SQL[weight_by]} AS weight FROM habits
+    WHERE {WEIGHT_SQL[weight_by]} > 0 {account_filter}
+    ORDER BY id
+    ''', params)
+    rows = cursor.fetchall()
+    return [row[0] for row in rows], [row[1] for row in rows]
+
+
+def draw(weights, winners=1, seed=None, unique=True):
+    """
+    Draw winner indices from integer weights.
+
+    Args:
+        weights (list): Entrant weights
+        winners (int): Number of draws
+        seed (int, optional): Random seed (a random one is chosen when omitted)
+        unique (bool): Whether an entrant can win at most once
+
+    Returns:
+        tuple: (list of winning indices in draw order, seed used)
+    """
+    if seed is None:
+        seed = secrets.randbits(64)
+    rng = random.Random(seed)
+    if unique:
+        tree = FenwickTree(weights)
+        winning = []
+        for _ in range(min(winners, sum(1 for weight in weights if weight > 0))):
+            index = tree.sample(rng)
+            tree.update(index, 0)
+            winning.append(index)
+    else:
+        table = AliasTable(weights)
+        winning = [table.sample(rng) for _ in range(winners)]
+    return winning, seed
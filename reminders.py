@@ -0,0 +1,260 @@
+"""
+Reminders at each habit's preferred times.
+
+ReminderScheduler keeps one min-heap entry per (habit, preferred time) holding the next time that
+reminder is due, and a background thread sleeps until the earliest entry instead of polling. When
+it fires, the entry is pushed back for the following day, so each reminder costs O(log n).
+
+The scheduler registers itself as a HabitTracker habit listener. When a habit is added, updated
+or deleted, only that habit's entries are replaced: its old entries are invalidated through a
+per-habit version number and dropped lazily when they reach the top of the heap.
+
+Notifications go through a notifier, any callable taking (title, message):
+
+    * ConsoleNotifier      prints to stdout (used by cli.py and when nothing else is available)
+    * PlyerNotifier        native desktop/mobile notifications through plyer
+    * KivyPopupNotifier    a popup inside the running Kivy app
+
+default_notifier() picks plyer when it is installed and falls back to the console.
+"""
+import heapq
+import threading
+import time as time_module
+from datetime import datetime, timedelta
+
+import storage
+from main import HabitTracker
+
+
+class ConsoleNotifier:
+    """Print reminders to stdout."""
+
+    def __call__(self, title, message):
+        print(f"[{datetime.now().strftime('%H:%M')}] {title}: {message}")
+
+
+class PlyerNotifier:
+    """
+    Show reminders as native notifications through plyer.
+
+    Raises:
+        ImportError: If plyer isn't installed
+    """
+
+    def __init__(self, app_name="Habit Tracker", timeout=10):
+        from plyer import notification
+        self.notification = notification
+        self.app_name = app_name
+        self.timeout = timeout
+
+    def __call__(self, title, message):
+        self.notification.notify(title=title, message=message, app_name=self.app_name, timeout=self.timeout)
+
+
+class KivyPopupNotifier:
+    """Show reminders as a popup in the running Kivy app (scheduled onto the UI thread)."""
+
+    def __call__(self, title, message):
+        from kivy.clock import Clock
+        Clock.schedule_once(lambda dt: self._show(title, message))
+
+    def _show(self, title, message):
+        from kivy.uix.label import Label
+        from kivy.uix.popup import Popup
+        popup = Popup(title=title, content=Label(text=message), size_hint=(0.8, 0.3))
+        popup.open()
+
+
+def default_notifier():
+    """Native notifications when plyer is available, otherwise the console."""
+    try:
+        return PlyerNotifier()
+    except ImportError:
+        return ConsoleNotifier()
+
+
+def next_fire_time(time_str, after):
+    """
+    Next epoch second at which the local time of day time_str ('HH:MM') occurs after `after`.
+
+    Args:
+        time_str (str): Time of day in 'HH:MM' format
+        after (int): Epoch seconds
+
+    Returns:
+        int: Epoch seconds
+    """
+    time_of_day = datetime.strptime(time_str, "%H:%M").time()
+    day = datetime.fromtimestamp(after).date()
+    # Going through local calendar dates keeps reminders at the same wall-clock time across DST changes
+    while True:
+        fire_at = int(datetime.combine(day, time_of_day).timestamp())
+        if fire_at > after:
+            return fire_at
+        day += timedelta(days=1)
+
+
+class ReminderScheduler:
+    """
+    Fires reminders at every habit's preferred times.
+
+    Args:
+        habit_tracker (HabitTracker): Tracker whose habits are watched
+        notifier (callable, optional): notifier(title, message); defaults to default_notifier()
+        clock (callable, optional): Returns the current epoch seconds (for tests and benchmarks)
+    """
+
+    def __init__(self, habit_tracker, notifier=None, clock=None):
+        self.habit_tracker = habit_tracker
+        self.notifier = notifier if notifier is not None else default_notifier()
+        self.clock = clock if clock is not None else (lambda: int(time_module.time()))
+
+        # (fire_at, sequence, habit_id, version, time_str); sequence breaks ties between equal times
+        self._heap = []
+        self._sequence = 0
+        # Current version and name of each scheduled habit; heap entries with an older version are stale
+        self._versions = {}
+        self._names = {}
+
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def __len__(self):
+        """Number of live reminder entries."""
+        with self._condition:
+            return sum(1 for entry in self._heap if self._versions.get(entry[2]) == entry[3])
+
+    def start(self):
+        """Load all habits and start the background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self.reload()
+        HabitTracker.habit_listeners.append(self._on_habit_changed)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="ReminderScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the background thread and stop listening for habit changes."""
+        if self._on_habit_changed in HabitTracker.habit_listeners:
+            HabitTracker.habit_listeners.remove(self._on_habit_changed)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def reload(self):
+        """Rebuild the heap from every habit's preferred times (one query)."""
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        rows = conn.execute('''
+        SELECT habits.id, habits.name, preferred_times.time
+        FROM habits JOIN preferred_times ON preferred_times.habit_id = habits.id
+        ''').fetchall()
+        conn.close()
+
+        times = {}
+        for habit_id, name, time_str in rows:
+            times.setdefault(habit_id, (name, []))[1].append(time_str)
+
+        now = self.clock()
+        with self._condition:
+            self._heap = []
+            self._versions = {}
+            self._names = {}
+            for habit_id, (name, time_strs) in times.items():
+                self._heap.extend(self._schedule_locked(habit_id, name, time_strs, now))
+            heapq.heapify(self._heap)
+            self._condition.notify()
+
+    def update_habit(self, habit_id):
+        """Replace one habit's reminders after it changed (or drop them if it was deleted)."""
+        habit = self.habit_tracker.get_habit(habit_id)
+        now = self.clock()
+        with self._condition:
+            if habit is None:
+                # Bumping the version without adding entries invalidates the old ones
+                self._versions[habit_id] = self._versions.get(habit_id, 0) + 1
+            else:
+                for entry in self._schedule_locked(habit_id, habit['name'], habit['preferred_times'], now):
+                    heapq.heappush(self._heap, entry)
+            # The new entries may be due before whatever the thread is waiting for
+            self._condition.notify()
+
+    def next_due(self):
+        """Epoch seconds of the next live reminder, or None if there are none."""
+        with self._condition:
+            self._drop_stale_locked()
+            return self._heap[0][0] if self._heap else None
+
+    def fire_due(self, now=None):
+        """
+        Fire every reminder that is due and reschedule it for the next day.
+
+        Returns:
+            int: Number of reminders fired
+        """
+        if now is None:
+            now = self.clock()
+        due = []
+        with self._condition:
+            self._drop_stale_locked()
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, sequence, habit_id, version, time_str = self._heap[0]
+                heapq.heapreplace(self._heap, self._entry(next_fire_time(time_str, now), habit_id, version, time_str))
+                due.append((self._names[habit_id], time_str))
+                self._drop_stale_locked()
+
+        # Notify outside the lock so a slow notifier can't block habit updates
+        for name, time_str in due:
+            try:
+                self.notifier("Habit reminder", f"Time for '{name}' ({time_str})")
+            except Exception as e:
+                print(f"Reminder notification failed: {e}")
+        return len(due)
+
+    def _on_habit_changed(self, habit_tracker, habit_id):
+        if habit_tracker.habits_db_file != self.habit_tracker.habits_db_file:
+            return
+        if habit_id is None:
+            # Bulk change (import, sync): rebuild everything
+            self.reload()
+        else:
+            self.update_habit(habit_id)
+
+    def _entry(self, fire_at, habit_id, version, time_str):
+        self._sequence += 1
+        return (fire_at, self._sequence, habit_id, version, time_str)
+
+    def _schedule_locked(self, habit_id, name, time_strs, now):
+        """Bump a habit's version and return fresh entries for its preferred times."""
+        version = self._versions.get(habit_id, 0) + 1
+        self._versions[habit_id] = version
+        self._names[habit_id] = name
+        entries = [self._entry(next_fire_time(time_str, now), habit_id, version, time_str)
+                   for time_str in dict.fromkeys(time_strs)]
+        return entries
+
+    def _drop_stale_locked(self):
+        while self._heap and self._versions.get(self._heap[0][2]) != self._heap[0][3]:
+            heapq.heappop(self._heap)
+
+    def _run(self):
+        with self._condition:
+            while not self._stopping:
+                self._drop_stale_locked()
+                if not self._heap:
+                    # Nothing scheduled: sleep until a habit changes
+                    self._condition.wait()
+                    continue
+                delay = self._heap[0][0] - self.clock()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                self._condition.release()
+                try:
+                    self.fire_due()
+                finally:
+                    self._condition.acquire()
@@ -0,0 +1,148 @@
+"""
+Period rollover: settle every habit's streak when a period ends.
+
+Streaks used to be corrected only when the next completion was recorded, so a habit that had
+lapsed kept showing its old streak. RolloverScheduler runs HabitTracker.rollover at every local
+period boundary instead. Every weekly, monthly and yearly boundary is also a local midnight, so
+the scheduler wakes at each local midnight (following DST changes) and once right after start.
+
+One rollover, in a single transaction on the habits database with the completions database
+attached:
+
+    * lapsed streaks    one UPDATE resets every habit whose last completion is too old for the
+                        next one to count as consecutive (the record_completion rule, LAPSE_DAYS),
+                        stamping streak_reset_at like a hardcore reset so recompute_streaks and
+                        delta sync keep it
+    * hardcore mode     one GROUP BY (habit, period) pass over the periods that ended since the
+                        last rollover (hardcore.py)
+
+Both are idempotent: a lapse only depends on last_completed and a reset streak is 1, which isn't
+picked up again, and the end of the range hardcore mode has evaluated is stored in rollover_state. Running rollover after the app was closed across
+several boundaries therefore catches up on all of them at once, and running it twice does nothing
+the second time.
+"""
+import threading
+import time as time_module
+
+import hardcore
+import periods
+
+# Whole days after the last completion from which the next one can no longer be consecutive
+# (one more than the largest gap HabitTracker._is_consecutive accepts)
+LAPSE_DAYS = {
+    'daily': 2,
+    'weekly': 10,
+    'monthly': 36,
+    'yearly': 381,
+}
+
+# Longest single sleep; waking up now and then catches clock changes and suspended devices
+MAX_SLEEP = 300
+
+
+def lapse_seconds_sql(frequency_type_column):
+    """SQL CASE expression giving the lapse time in seconds for each row's frequency type."""
+    cases = " ".join(f"WHEN '{frequency_type}' THEN {days * 86400}" for frequency_type, days in LAPSE_DAYS.items())
+    return f"CASE {frequency_type_column} {cases} END"
+
+
+def find_lapsed(cursor, now):
+    """IDs of the habits with a streak (above 1) whose last completion is too old to continue it."""
+    cursor.execute(f'''
+    SELECT id FROM habits
+    WHERE streak > 1 AND last_completed IS NOT NULL
+      AND last_completed <= ? - {lapse_seconds_sql('frequency_type')}
+    ''', (now,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def run(cursor, now):
+    """
+    Reset lapsed streaks and enforce hardcore mode up to `now`.
+
+    Runs inside the caller's transaction on the habits database, with the completions database
+    attached as hardcore.COMPLETIONS_ALIAS; the caller commits.
+
+    Returns:
+        dict: 'lapsed' (habit IDs reset for lapsing) and 'hardcore' (see hardcore.enforce)
+    """
+    hardcore.ensure_schema(cursor)
+    lapsed = find_lapsed(cursor, now)
+    hardcore.reset_streaks(cursor, {habit_id: now for habit_id in lapsed})
+    failures = hardcore.enforce(cursor, now)
+    return {'lapsed': lapsed, 'hardcore': failures}
+
+
+def next_rollover(after):
+    """Epoch seconds of the first period boundary (a local midnight) after `after`."""
+    return periods.next_boundary(after, 'daily')
+
+
+class RolloverScheduler:
+    """
+    Runs HabitTracker.rollover at every period boundary on a background thread.
+
+    Args:
+        habit_tracker (HabitTracker): Tracker whose habits are rolled over
+        on_rollover (callable, optional): on_rollover(result) after each run, on the scheduler thread
+        clock (callable, optional): Returns the current epoch seconds (for tests)
+    """
+
+    def __init__(self, habit_tracker, on_rollover=None, clock=None):
+        self.habit_tracker = habit_tracker
+        self.on_rollover = on_rollover
+        self.clock = clock if clock is not None else (lambda: int(time_module.time()))
+        self.last_result = None
+
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        """Start the background thread; it catches up on missed boundaries right away."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="RolloverScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the background thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self, now=None):
+        """Roll over up to now and return the result."""
+        now = self.clock() if now is None else now
+        try:
+            result = self.habit_tracker.rollover(now)
+        except Exception as e:
+            print(f"Period rollover failed: {e}")
+            return None
+        self.last_result = result
+        if self.on_rollover:
+            try:
+                self.on_rollover(result)
+            except Exception as e:
+                print(f"Rollover callback failed: {e}")
+        return result
+
+    def _run(self):
+        due = self.clock()
+        with self._condition:
+            while not self._stopping:
+                now = self.clock()
+                if now < due:
+                    self._condition.wait(min(due - now, MAX_SLEEP))
+                    continue
+                # The database work happens outside the lock so stop() never waits on it
+                self._condition.release()
+                try:
+                    self.run_once(now)
+                finally:
+                    self._condition.acquire()
+                due = next_rollover(now)
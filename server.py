@@ -0,0 +1,348 @@
+"""
+Local HTTP/JSON API server for the habit tracker.
+
+Lets several clients (desktop app, phone emulator, scripts) share one store without each of them
+opening the SQLite files. Uses only the standard library and does not load Kivy.
+
+Run with:
+    python server.py --port 8765
+
+Endpoints:
+    GET    /habits                      all habits (supports ETag / If-None-Match)
+    POST   /habits                      add a habit
+    POST   /habits/bulk                 add a list of habits
+    GET    /habits/<id>                 one habit
+    PATCH  /habits/<id>                 update a habit
+    DELETE /habits/<id>                 delete a habit
+    POST   /habits/<id>/complete        record a completion
+    GET    /habits/<id>/completions     completions for a habit (?start_date=&end_date=)
+    GET    /completions                 all completions
+    POST   /completions/bulk            record a list of completions
+    POST   /bonus_codes/redeem          redeem a bonus code ({"code": ..., "habit_id": ...})
+    GET    /stats                       summary statistics
+"""
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import storage
+from main import HabitTracker, default_data_dir
+from sql_profiler import SQLProfiler
+
+# Expected types of request body fields: (check, description for the error message)
+STRING = (lambda value: isinstance(value, str), "a string")
+INTEGER = (lambda value: isinstance(value, int) and not isinstance(value, bool), "an integer")
+BOOLEAN = (lambda value: isinstance(value, bool), "a boolean")
+STRINGS = (lambda value: isinstance(value, list) and all(isinstance(item, str) for item in value), "a list of strings")
+
+HABIT_FIELDS = {
+    'name': STRING,
+    'description': STRING,
+    'frequency_type': STRING,
+    'frequency_count': INTEGER,
+    'duration_seconds': INTEGER,
+    'preferred_times': STRINGS,
+}
+# What PATCH /habits/<id> may change
+HABIT_UPDATE_FIELDS = dict(HABIT_FIELDS, hardcore=BOOLEAN)
+COMPLETION_FIELDS = {'habit_id': INTEGER, 'duration_seconds': INTEGER, 'notes': STRING}
+REDEEM_FIELDS = {'code': STRING, 'habit_id': INTEGER}
+
+
+class HabitAPIServer(ThreadingHTTPServer):
+    """Threaded HTTP server that owns one HabitTracker shared by all request handlers."""
+
+    daemon_threads = True
+
+    def __init__(self, server_address, tracker):
+        super().__init__(server_address, HabitAPIHandler)
+        self.tracker = tracker
+        self.tracker.enable_wal()
+
+        # PRAGMA data_version changes whenever another connection commits, so this dedicated
+        # connection tells us when the cached /habits response is stale without re-running it
+        self._version_conn = storage.connect(tracker.habits_db_file, check_same_thread=False)
+        self._habits_cache_lock = threading.Lock()
+        self._habits_cache = None  # (data_version, etag, body)
+
+    def get_habits_response(self):
+        """Return (etag, body) for GET /habits, rebuilding it only when the habits database changed."""
+        with self._habits_cache_lock:
+            data_version = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._habits_cache and self._habits_cache[0] == data_version:
+                return self._habits_cache[1], self._habits_cache[2]
+
+            body = json.dumps(self.tracker.get_habits()).encode("utf-8")
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            self._habits_cache = (data_version, etag, body)
+            return etag, body
+
+    def server_close(self):
+        super().server_close()
+        self._version_conn.close()
+
+
+class HabitAPIHandler(BaseHTTPRequestHandler):
+    """Routes JSON requests to HabitTracker methods."""
+
+    # HTTP/1.1 keeps connections alive between requests
+    protocol_version = "HTTP/1.1"
+
+    routes = [
+        ("GET", r"/habits", "get_habits"),
+        ("POST", r"/habits", "add_habit"),
+        ("POST", r"/habits/bulk", "add_habits"),
+        ("GET", r"/habits/(\d+)", "get_habit"),
+        ("PATCH", r"/habits/(\d+)", "update_habit"),
+        ("DELETE", r"/habits/(\d+)", "delete_habit"),
+        ("POST", r"/habits/(\d+)/complete", "complete_habit"),
+        ("GET", r"/habits/(\d+)/completions", "get_completions"),
+        ("GET", r"/completions", "get_all_completions"),
+        ("POST", r"/completions/bulk", "record_completions"),
+        ("POST", r"/bonus_codes/redeem", "redeem_bonus_code"),
+        ("GET", r"/stats", "get_stats"),
+        ("GET", r"/leaderboard", "get_leaderboard"),
+        ("GET", r"/habits/(\d+)/rank", "get_rank"),
+    ]
+
+    @property
+    def tracker(self):
+        return self.server.tracker
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PATCH(self):
+        self.dispatch("PATCH")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method):
+        """Match the request path against the route table and call the handler."""
+        url = urlsplit(self.path)
+        self.query = parse_qs(url.query)
+
+        try:
+            # Always consume the body so the connection can be reused
+            body = self.read_body()
+            path_matched = False
+            for route_method, pattern, handler_name in self.routes:
+                match = re.fullmatch(pattern, url.path)
+                if not match:
+                    continue
+                path_matched = True
+                if route_method == method:
+                    args = [int(group) for group in match.groups()]
+                    getattr(self, "handle_" + handler_name)(*args, body=body)
+                    return
+
+            if path_matched:
+                self.send_json({'error': f"Method {method} not allowed"}, status=405)
+            else:
+                self.send_json({'error': f"Unknown path {url.path}"}, status=404)
+        except json.JSONDecodeError as e:
+            self.send_json({'error': f"Invalid JSON: {e}"}, status=400)
+        except LookupError as e:
+            self.send_json({'error': f"Missing field: {e}"}, status=400)
+        except ValueError as e:
+            status = 404 if "not found" in str(e) else 400
+            self.send_json({'error': str(e)}, status=status)
+        except sqlite3.OperationalError as e:
+            # Usually "database is locked" while another process writes; the client may retry
+            self.send_json({'error': f"Database unavailable: {e}"}, status=503, headers={"Retry-After": "1"})
+        except Exception as e:
+            # Answer rather than drop the connection; the cause is a bug, not the request
+            print(f"Error handling {method} {url.path}: {e!r}")
+            self.send_json({'error': "Internal server error"}, status=500)
+
+    @staticmethod
+    def expect_object(body, optional=False):
+        """Return a JSON object body; raises ValueError (400) for anything else."""
+        if body is None and optional:
+            return {}
+        if not isinstance(body, dict):
+            raise ValueError("Expected a JSON object body")
+        return body
+
+    @staticmethod
+    def expect_objects(body):
+        """Return a JSON array body of objects; raises ValueError (400) for anything else."""
+        if not isinstance(body, list) or not all(isinstance(item, dict) for item in body):
+            raise ValueError("Expected a JSON array of objects")
+        return body
+
+    @staticmethod
+    def check_fields(data, fields, required=(), nullable=(), only_known=False):
+        """
+        Check the types of a JSON object's fields before they reach the tracker.
+
+        Args:
+            data (dict): The object
+            fields (dict): Field name -> expected type (STRING, INTEGER, ...)
+            required (tuple): Fields that must be present
+            nullable (tuple): Fields that may be null
+            only_known (bool): Reject fields missing from `fields` instead of ignoring them
+
+        Returns:
+            dict: data, unchanged; raises ValueError (400) for a missing, unknown or mistyped field
+        """
+        for field in required:
+            if field not in data:
+                raise ValueError(f"Missing field: '{field}'")
+        for field, value in data.items():
+            if field not in fields:
+                if only_known:
+                    raise ValueError(f"Unknown field: '{field}'")
+                continue
+            if value is None and field in nullable:
+                continue
+            check, description = fields[field]
+            if not check(value):
+                raise ValueError(f"Field '{field}' must be {description}")
+        return data
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length))
+
+    def send_json(self, data, status=200, headers=None):
+        self.send_body(json.dumps(data).encode("utf-8"), status, headers)
+
+    def send_body(self, body, status=200, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep the console quiet under load; errors are still returned to the client
+        pass
+
+    # Route handlers
+    def handle_get_habits(self, body=None):
+        etag, response_body = self.server.get_habits_response()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_body(response_body, headers={"ETag": etag})
+
+    def handle_add_habit(self, body=None):
+        habit = self.check_fields(self.expect_object(body), HABIT_FIELDS, required=('name',))
+        self.send_json(self.add_habit_from(habit), status=201)
+
+    def handle_add_habits(self, body=None):
+        habits = [self.check_fields(habit, HABIT_FIELDS, required=('name',)) for habit in self.expect_objects(body)]
+        self.send_json([self.add_habit_from(habit) for habit in habits], status=201)
+
+    def add_habit_from(self, data):
+        return self.tracker.add_habit(
+            name=data['name'],
+            frequency_type=data.get('frequency_type', 'daily'),
+            frequency_count=data.get('frequency_count', 1),
+            duration_seconds=data.get('duration_seconds', 0),
+            preferred_times=data.get('preferred_times'),
+            description=data.get('description', "")
+        )
+
+    def handle_get_habit(self, habit_id, body=None):
+        habit = self.tracker.get_habit(habit_id)
+        if not habit:
+            raise ValueError(f"Habit with ID {habit_id} not found.")
+        self.send_json(habit)
+
+    def handle_update_habit(self, habit_id, body=None):
+        changes = self.check_fields(self.expect_object(body, optional=True), HABIT_UPDATE_FIELDS, only_known=True)
+        self.send_json(self.tracker.update_habit(habit_id, **changes))
+
+    def handle_delete_habit(self, habit_id, body=None):
+        self.tracker.delete_habit(habit_id)
+        self.send_json({'success': True})
+
+    def handle_complete_habit(self, habit_id, body=None):
+        body = self.check_fields(self.expect_object(body, optional=True), COMPLETION_FIELDS,
+                                 nullable=('duration_seconds',))
+        habit = self.tracker.record_completion(
+            habit_id, duration_seconds=body.get('duration_seconds'), notes=body.get('notes', "")
+        )
+        self.send_json(habit)
+
+    def handle_get_completions(self, habit_id, body=None):
+        start_date = self.query.get('start_date', [None])[0]
+        end_date = self.query.get('end_date', [None])[0]
+        self.send_json(self.tracker.get_completions(habit_id, start_date, end_date))
+
+    def handle_get_all_completions(self, body=None):
+        self.send_json(self.tracker.get_all_completions())
+
+    def handle_record_completions(self, body=None):
+        completions = [self.check_fields(completion, COMPLETION_FIELDS, required=('habit_id',),
+                                         nullable=('duration_seconds',))
+                       for completion in self.expect_objects(body)]
+        self.send_json(self.tracker.record_completions(completions))
+
+    def handle_redeem_bonus_code(self, body=None):
+        body = self.check_fields(self.expect_object(body), REDEEM_FIELDS, required=('code',), nullable=('habit_id',))
+        result = self.tracker.use_bonus_code(body['code'], habit_id=body.get('habit_id'))
+        self.send_json(result, status=200 if result['success'] else 409)
+
+    def handle_get_stats(self, body=None):
+        self.send_json(self.tracker.get_stats())
+
+    def handle_get_leaderboard(self, body=None):
+        metric = self.query.get('by', ['streak'])[0]
+        limit = int(self.query.get('limit', [10])[0])
+        offset = int(self.query.get('offset', [0])[0])
+        self.send_json(self.tracker.get_leaderboard(metric, limit=limit, offset=offset))
+
+    def handle_get_rank(self, habit_id, body=None):
+        rank = self.tracker.get_rank(habit_id, self.query.get('by', ['streak'])[0])
+        if rank is None:
+            raise ValueError(f"Habit with ID {habit_id} not found.")
+        self.send_json(rank)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the habit tracker over a local HTTP/JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data-dir", help="Directory holding the database files")
+    parser.add_argument("--profile-sql", metavar="LOGFILE", help="Log slow SQL statements with their query plans to this file")
+    parser.add_argument("--slow-ms", type=float, default=50, help="Statements at least this slow are logged by --profile-sql")
+    parser.add_argument("--profile-sql-params", action="store_true",
+                        help="Log bound parameter values with --profile-sql (only their types by default)")
+    args = parser.parse_args(argv)
+
+    # Asks for the passphrase when the data directory is encrypted (see storage.py)
+    storage.unlock(args.data_dir if args.data_dir is not None else default_data_dir())
+    tracker = HabitTracker(data_dir=args.data_dir)
+    if args.profile_sql:
+        SQLProfiler(args.profile_sql, slow_ms=args.slow_ms, log_params=args.profile_sql_params).attach(tracker)
+    server = HabitAPIServer((args.host, args.port), tracker)
+    print(f"Serving habit tracker API on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
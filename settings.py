@@ -0,0 +1,166 @@
+"""
+Cached, observable app settings.
+
+settings.json is read once per process. Every screen shares the same Settings object:
+
+    settings = get_settings()
+    settings["button_color"]                       # served from memory
+    settings.bind(callback)                        # callback(settings, changed) after each change
+    settings.update(button_color="pink")           # notifies listeners, schedules a save
+
+Saving is debounced, so several changes made in quick succession are written once, save_delay
+seconds after the last one. The file is written to a temporary file in the same directory and
+renamed over settings.json, so a crash mid-write never leaves a truncated file behind. Call
+flush() before exiting to write any pending change immediately (an atexit hook does this too).
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+
+DEFAULT_SETTINGS = {
+    "background_color": "white",
+    "button_color": "blue",
+}
+
+
+def write_json_atomic(path, data):
+    """Write data as JSON to path through a temporary file and a rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".settings-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(data, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class Settings:
+    """
+    Settings loaded once from a JSON file and kept in memory.
+
+    Args:
+        path (str): Settings file; created with the defaults if it doesn't exist
+        save_delay (float): Seconds to wait after the last change before writing the file
+    """
+
+    def __init__(self, path="settings.json", save_delay=0.5):
+        self.path = path
+        self.save_delay = save_delay
+        # Callables listener(settings, changed) where changed maps each changed key to its new value
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._timer = None
+        self._values = self._load()
+
+    def _load(self):
+        values = dict(DEFAULT_SETTINGS)
+        try:
+            with open(self.path, "r") as file:
+                values.update(json.load(file))
+        except FileNotFoundError:
+            write_json_atomic(self.path, values)
+        except json.JSONDecodeError as e:
+            print(f"Ignoring unreadable settings file {self.path}: {e}")
+        return values
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def as_dict(self):
+        """A copy of all settings."""
+        with self._lock:
+            return dict(self._values)
+
+    def update(self, **changes):
+        """
+        Change settings, notify listeners of the keys whose value actually changed and schedule a save.
+
+        Returns:
+            dict: The changed keys and their new values
+        """
+        with self._lock:
+            changed = {key: value for key, value in changes.items() if self._values.get(key) != value}
+            if not changed:
+                return changed
+            self._values.update(changed)
+            self._schedule_save_locked()
+
+        for listener in list(self.listeners):
+            try:
+                listener(self, changed)
+            except Exception as e:
+                print(f"Settings listener failed: {e}")
+        return changed
+
+    def __setitem__(self, key, value):
+        self.update(**{key: value})
+
+    def bind(self, listener):
+        """Call listener(settings, changed) after every change."""
+        self.listeners.append(listener)
+
+    def unbind(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def flush(self):
+        """Write a pending change now instead of waiting for the debounce delay."""
+        with self._lock:
+            if self._timer is None:
+                return
+            self._timer.cancel()
+            self._timer = None
+            values = dict(self._values)
+        write_json_atomic(self.path, values)
+
+    def _schedule_save_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.save_delay, self._save)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _save(self):
+        with self._lock:
+            # A newer change may have rescheduled (or flush() may have written) in the meantime
+            if self._timer is None or self._timer is not threading.current_thread():
+                return
+            self._timer = None
+            values = dict(self._values)
+        try:
+            write_json_atomic(self.path, values)
+        except OSError as e:
+            print(f"Saving settings failed: {e}")
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_settings(path="settings.json"):
+    """The shared Settings object for path (one per file per process)."""
+    key = os.path.abspath(path)
+    with _instances_lock:
+        settings = _instances.get(key)
+        if settings is None:
+            settings = _instances[key] = Settings(key)
+        return settings
+
+
+@atexit.register
+def _flush_all():
+    for settings in list(_instances.values()):
+        try:
+            settings.flush()
+        except OSError:
+            pass
@@ -0,0 +1,357 @@
+"""
+SQL statement profiler for HabitTracker.
+
+    profiler = SQLProfiler("slow_queries.log", slow_ms=20)
+    profiler.attach(tracker)
+
+While attached, every statement run on a connection the tracker opens is timed from execute()
+until its last row has been fetched. For each statement the profiler records:
+
+    * duration         wall time spent in execute and fetching
+    * vm_steps         SQLite virtual machine instructions, counted in steps of 100 by a progress
+                       handler; this is the work done, including rows scanned but not returned
+    * rows             rows handed back to Python
+    * statements       statements SQLite actually ran (sqlite3 trace callback); executemany and
+                       triggers run more than one
+
+Statements slower than slow_ms are written as JSON lines to a rotating log, together with their
+EXPLAIN QUERY PLAN (a plan containing "SCAN" rather than "SEARCH" means a full table scan). With
+slow_ms=0 every statement is logged. Aggregates for all statements are kept in memory as well.
+
+Bound parameters can hold personal data (habit names, notes, account emails), so the log only
+shows their types ("<str>", "<int>") unless log_params=True, or --profile-sql-params on the
+command line, asks for the raw values.
+
+Summarize a log, top statements by total time first:
+    python sql_profiler.py slow_queries.log --top 20
+
+cli.py and server.py enable the profiler with --profile-sql LOGFILE.
+"""
+import argparse
+import json
+import logging
+import logging.handlers
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+import storage
+from instrumentation import InstrumentedConnection
+
+# Progress handler granularity (VM instructions per callback)
+PROGRESS_STEPS = 100
+
+
+def normalize(sql):
+    """Collapse whitespace so the same statement always aggregates under one key."""
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+class _Statement:
+    """Measurements of the statement a cursor is currently running."""
+
+    __slots__ = ('sql', 'params', 'started', 'elapsed', 'vm_steps', 'rows', 'statements')
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.started = time.time()
+        self.elapsed = 0.0
+        self.vm_steps = 0
+        self.rows = 0
+        self.statements = 0
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Cursor that times execute plus fetching and hands the result to the profiler."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._current = None
+
+    def execute(self, sql, parameters=()):
+        return self._run(sql, parameters, lambda: super(ProfilingCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(sql, None, lambda: super(ProfilingCursor, self).executemany(sql, seq_of_parameters))
+
+    def executescript(self, sql_script):
+        return self._run(sql_script, None, lambda: super(ProfilingCursor, self).executescript(sql_script))
+
+    def fetchone(self):
+        return self._fetch(super().fetchone, single=True)
+
+    def fetchmany(self, size=None):
+        return self._fetch(lambda: super(ProfilingCursor, self).fetchmany(size if size is not None else self.arraysize))
+
+    def fetchall(self):
+        return self._fetch(super().fetchall, exhausts=True)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Statements whose rows were never fully fetched are recorded when the cursor goes away
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _run(self, sql, parameters, call):
+        """Time call(); parameters is None for statements that can't be EXPLAINed with one set."""
+        self._finish()
+        conn = self.connection
+        statement = _Statement(sql, parameters)
+        conn._active = statement
+        start = time.perf_counter()
+        try:
+            call()
+        finally:
+            statement.elapsed += time.perf_counter() - start
+            conn._active = None
+        self._current = statement
+        if self.description is None:
+            # Nothing to fetch (INSERT/UPDATE/DELETE/DDL)
+            self._finish()
+        return self
+
+    def _fetch(self, method, single=False, exhausts=False):
+        statement = self._current
+        if statement is None:
+            return method()
+        conn = self.connection
+        conn._active = statement
+        start = time.perf_counter()
+        try:
+            result = method()
+        finally:
+            statement.elapsed += time.perf_counter() - start
+            conn._active = None
+        if single:
+            if result is None:
+                self._finish()
+            else:
+                statement.rows += 1
+        else:
+            statement.rows += len(result)
+            if exhausts or not result:
+                self._finish()
+        return result
+
+    def _finish(self):
+        statement, self._current = self._current, None
+        if statement is not None:
+            self.connection._profiler.record(self.connection, statement)
+
+
+class ProfilingConnection(InstrumentedConnection):
+    """Connection whose cursors report to a SQLProfiler."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._profiler = None
+        self._active = None
+        self.db_file = args[0] if args else kwargs.get('database')
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def _on_progress(self):
+        if self._active is not None:
+            self._active.vm_steps += PROGRESS_STEPS
+        return 0
+
+    def _on_trace(self, statement):
+        if self._active is not None:
+            self._active.statements += 1
+
+
+class StatementStats:
+    """Aggregates for one normalized statement."""
+
+    __slots__ = ('count', 'total_ms', 'max_ms', 'rows', 'vm_steps')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.vm_steps = 0
+
+
+class SQLProfiler:
+    """
+    Profiles the SQL issued by the HabitTracker instances it is attached to.
+
+    Args:
+        log_file (str, optional): Slow-query log path (JSON lines); None keeps results in memory only
+        slow_ms (float): Statements at least this slow are logged with their query plan
+        max_bytes (int): Size at which the log is rotated
+        backup_count (int): Rotated log files to keep
+        log_params (bool): Log bound parameter values as they are instead of only their types
+    """
+
+    def __init__(self, log_file=None, slow_ms=50, max_bytes=1_000_000, backup_count=3, log_params=False):
+        self.slow_ms = slow_ms
+        self.log_params = log_params
+        self.statements = {}
+        self._lock = threading.Lock()
+
+        self.logger = None
+        if log_file:
+            self.logger = logging.getLogger(f"habit_tracker.sql_profiler.{id(self)}")
+            self.logger.setLevel(logging.INFO)
+            self.logger.propagate = False
+            self.logger.addHandler(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count
+            ))
+
+    def attach(self, habit_tracker):
+        """Profile every connection the tracker opens from now on."""
+        habit_tracker.sql_profiler = self
+        return self
+
+    def connect(self, db_file):
+        """Open a profiled connection (used by HabitTracker._connect)."""
+        conn = storage.connect(db_file, factory=ProfilingConnection)
+        return self.watch(conn)
+
+    def watch(self, conn):
+        """Start profiling a ProfilingConnection."""
+        conn._profiler = self
+        conn.set_progress_handler(conn._on_progress, PROGRESS_STEPS)
+        conn.trace_listeners.append(conn._on_trace)
+        return conn
+
+    def record(self, conn, statement):
+        """Aggregate a finished statement and log it if it was slow."""
+        elapsed_ms = statement.elapsed * 1000
+        key = normalize(statement.sql)
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = StatementStats()
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.rows += statement.rows
+            stats.vm_steps += statement.vm_steps
+
+        if self.logger is None or elapsed_ms < self.slow_ms:
+            return
+        entry = {
+            'time': round(statement.started, 3),
+            'db': conn.db_file,
+            'sql': key,
+            'params': _loggable(statement.params, self.log_params),
+            'duration_ms': round(elapsed_ms, 3),
+            'vm_steps': statement.vm_steps,
+            'rows': statement.rows,
+            'statements': statement.statements,
+            'plan': self._query_plan(conn, statement),
+        }
+        self.logger.info(json.dumps(entry))
+
+    def _query_plan(self, conn, statement):
+        """EXPLAIN QUERY PLAN for a single statement, or None when it can't be explained."""
+        if statement.params is None or not re.match(r"\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", statement.sql, re.I):
+            return None
+        try:
+            # The base class cursor keeps the EXPLAIN itself out of the profile
+            cursor = sqlite3.Cursor(conn)
+            rows = cursor.execute(f"EXPLAIN QUERY PLAN {statement.sql}", statement.params).fetchall()
+            cursor.close()
+        except sqlite3.Error:
+            return None
+        return [row[-1] for row in rows]
+
+    def report(self, top=20):
+        """The top statements by total time, as a list of dicts."""
+        with self._lock:
+            items = [(key, stats.count, stats.total_ms, stats.max_ms, stats.rows, stats.vm_steps)
+                     for key, stats in self.statements.items()]
+        return _top(items, top)
+
+
+def _loggable(params, raw=False):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: _loggable_value(value, raw) for key, value in params.items()}
+    return [_loggable_value(value, raw) for value in params]
+
+
+def _loggable_value(value, raw):
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    return value if raw else f"<{type(value).__name__}>"
+
+
+def _top(items, top):
+    items.sort(key=lambda item: item[2], reverse=True)
+    return [
+        {'sql': key, 'count': count, 'total_ms': round(total_ms, 3), 'mean_ms': round(total_ms / count, 3),
+         'max_ms': round(max_ms, 3), 'rows': rows, 'vm_steps': vm_steps}
+        for key, count, total_ms, max_ms, rows, vm_steps in items[:top]
+    ]
+
+
+def summarize_log(paths, top=20):
+    """Aggregate slow-query log files by statement, top statements by total time first."""
+    totals = {}
+    for path in paths:
+        with open(path, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                count, total_ms, max_ms, rows, vm_steps = totals.get(entry['sql'], (0, 0.0, 0.0, 0, 0))
+                totals[entry['sql']] = (count + 1, total_ms + entry['duration_ms'], max(max_ms, entry['duration_ms']),
+                                        rows + entry['rows'], vm_steps + entry['vm_steps'])
+    return _top([(key,) + values for key, values in totals.items()], top)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize SQL profiler slow-query logs.")
+    parser.add_argument("logs", nargs="+", help="Log files (include rotated ones, e.g. slow.log slow.log.1)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON output")
+    args = parser.parse_args(argv)
+
+    report = summarize_log(args.logs, args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"{'total ms':>10} {'count':>7} {'mean ms':>9} {'max ms':>9} {'rows':>8} {'vm steps':>10}  statement")
+    for item in report:
+        print(f"{item['total_ms']:>10.1f} {item['count']:>7} {item['mean_ms']:>9.2f} {item['max_ms']:>9.2f} "
+              f"{item['rows']:>8} {item['vm_steps']:>10}  {item['sql'][:100]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Database connections, optionally encrypted at rest.
+
+Every module opens its SQLite files through storage.connect. Normally that is sqlite3.connect
+and nothing else. A data directory can instead be encrypted with SQLCipher: every database file
+in it (habits, completions and the archive) is encrypted page by page, so emails, balances,
+bonus codes and notes are all protected, while SQL keeps working on them unchanged.
+
+Encryption needs the sqlite3 module to run on SQLCipher (a Python built or linked against
+libsqlcipher, e.g. the sqlcipher recipe on Android); supported() checks for it.
+
+    storage.encrypt_data_dir(data_dir, passphrase)   # once: convert the plaintext files
+    storage.enable_encryption(data_dir, passphrase)  # each session, before opening a HabitTracker
+
+HabitTracker unlocks an encrypted directory by itself when the passphrase is in the
+HABIT_TRACKER_PASSPHRASE environment variable; cli.py and server.py prompt for it otherwise.
+
+The passphrase goes through scrypt once per session with the directory's salt (kept next to the
+databases in encryption.salt), and the derived key is cached. Each connection then hands
+SQLCipher the raw key, which skips the PBKDF2 run SQLCipher would otherwise do on every open.
+The app opens a connection per operation, so that run would cost more than the operation itself.
+Encryption works on 4 KB pages, so its cost follows pages touched rather than rows, and
+executemany batches stay as cheap per row as in plaintext. benchmarks/bench_encryption.py
+compares both modes.
+"""
+import getpass
+import hashlib
+import os
+import secrets
+import sqlite3
+
+SALT_FILE = "encryption.salt"
+PASSPHRASE_ENV = "HABIT_TRACKER_PASSPHRASE"
+# scrypt cost: about 0.1 s and 32 MB once per session
+SCRYPT_N = 2 ** 15
+SCRYPT_R = 8
+SCRYPT_P = 1
+KEY_BYTES = 32
+
+# Hex raw keys of the encrypted data directories opened this session
+_keys = {}
+# Data directory -> whether it holds encrypted files, checked once per directory
+_encrypted_dirs = {}
+
+
+class EncryptionError(Exception):
+    """Raised when an encrypted data directory can't be opened."""
+
+
+def _directory(db_file):
+    return os.path.dirname(os.path.abspath(db_file))
+
+
+def supported():
+    """Whether the sqlite3 module runs on SQLCipher."""
+    conn = sqlite3.connect(":memory:")
+    try:
+        return conn.execute("PRAGMA cipher_version").fetchone() is not None
+    finally:
+        conn.close()
+
+
+def is_encrypted(data_dir):
+    """Whether a data directory was converted with encrypt_data_dir."""
+    return os.path.exists(os.path.join(data_dir, SALT_FILE))
+
+
+def is_unlocked(data_dir):
+    """Whether enable_encryption has unlocked a data directory this session."""
+    return os.path.abspath(data_dir) in _keys
+
+
+def unlock(data_dir, prompt=getpass.getpass):
+    """
+    Unlock a data directory if it is encrypted and still locked.
+
+    The passphrase comes from HABIT_TRACKER_PASSPHRASE, else from prompt(text) (None: don't ask).
+
+    Returns:
+        bool: Whether the directory is usable (plaintext or unlocked)
+    """
+    if not is_encrypted(data_dir) or is_unlocked(data_dir):
+        return True
+    passphrase = os.environ.get(PASSPHRASE_ENV)
+    if passphrase is None and prompt is not None:
+        passphrase = prompt(f"Passphrase for {os.path.abspath(data_dir)}: ")
+    if passphrase is None:
+        return False
+    enable_encryption(data_dir, passphrase)
+    return True
+
+
+def derive_key(passphrase, salt):
+    """The raw database key (hex) for a passphrase and salt."""
+    key = hashlib.scrypt(passphrase.encode("utf-8"), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P,
+                         maxmem=128 * SCRYPT_R * SCRYPT_N * 2, dklen=KEY_BYTES)
+    return key.hex()
+
+
+def _key_pragma(key, schema="main"):
+    return f"PRAGMA {schema}.key = \"x'{key}'\""
+
+
+def connect(db_file, **kwargs):
+    """
+    Open a database connection, keyed when its directory is encrypted.
+
+    Takes the same keyword arguments as sqlite3.connect (factory, check_same_thread, ...).
+
+    Raises:
+        EncryptionError: If the directory is encrypted and enable_encryption wasn't called
+    """
+    directory = _directory(db_file)
+    key = _keys.get(directory)
+    if key is None:
+        encrypted = _encrypted_dirs.get(directory)
+        if encrypted is None:
+            encrypted = _encrypted_dirs[directory] = is_encrypted(directory)
+        if encrypted:
+            raise EncryptionError(f"{directory} is encrypted; unlock it with storage.enable_encryption first")
+        return sqlite3.connect(db_file, **kwargs)
+
+    conn = sqlite3.connect(db_file, **kwargs)
+    # Must be the first statement on the connection
+    conn.execute(_key_pragma(key))
+    return conn
+
+
+def enable_encryption(data_dir, passphrase):
+    """
+    Unlock an encrypted data directory for this session.
+
+    Derives the key (the only slow step) and checks it against the habits database.
+
+    Raises:
+        EncryptionError: If SQLCipher isn't available, the directory isn't encrypted or the
+                         passphrase is wrong
+    """
+    if not supported():
+        raise EncryptionError("The sqlite3 module isn't built with SQLCipher")
+    directory = os.path.abspath(data_dir)
+    salt_path = os.path.join(directory, SALT_FILE)
+    if not os.path.exists(salt_path):
+        raise EncryptionError(f"{directory} isn't encrypted; convert it with encrypt_data_dir")
+    with open(salt_path, "rb") as file:
+        salt = file.read()
+
+    key = derive_key(passphrase, salt)
+    habits_db = os.path.join(directory, "habits_data.db")
+    if os.path.exists(habits_db):
+        conn = sqlite3.connect(habits_db)
+        try:
+            conn.execute(_key_pragma(key))
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        except sqlite3.DatabaseError:
+            raise EncryptionError("Wrong passphrase")
+        finally:
+            conn.close()
+
+    _keys[directory] = key
+    _encrypted_dirs[directory] = True
+
+
+def disable_encryption(data_dir):
+    """Forget a directory's key (connections opened afterwards fail until it's unlocked again)."""
+    _keys.pop(os.path.abspath(data_dir), None)
+
+
+def encrypt_data_dir(data_dir, passphrase):
+    """
+    Convert every plaintext database in a data directory to SQLCipher and unlock it.
+
+    Each file is copied into a new encrypted file with sqlcipher_export, which then replaces
+    the original; the app must not have the files open meanwhile.
+
+    Returns:
+        list: The database files converted
+    """
+    if not supported():
+        raise EncryptionError("The sqlite3 module isn't built with SQLCipher")
+    directory = os.path.abspath(data_dir)
+    if is_encrypted(directory):
+        raise EncryptionError(f"{directory} is already encrypted")
+
+    salt = secrets.token_bytes(16)
+    key = derive_key(passphrase, salt)
+    converted = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".db"):
+            continue
+        path = os.path.join(directory, name)
+        encrypted_path = path + ".encrypting"
+        conn = sqlite3.connect(path)
+        try:
+            # Fold any write-ahead log into the file first
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+            conn.execute("ATTACH DATABASE ? AS encrypted KEY ?", (encrypted_path, f"x'{key}'"))
+            conn.execute("SELECT sqlcipher_export('encrypted')").fetchall()
+            conn.execute(f"PRAGMA encrypted.user_version = {int(user_version)}")
+            conn.execute("DETACH DATABASE encrypted")
+        finally:
+            conn.close()
+        os.replace(encrypted_path, path)
+        converted.append(path)
+
+    # Written last: a directory with a salt file is treated as encrypted
+    with open(os.path.join(directory, SALT_FILE), "wb") as file:
+        file.write(salt)
+    _keys[directory] = key
+    _encrypted_dirs[directory] = True
+    return converted
@@ -0,0 +1,146 @@
+"""
+Streak milestone icons, loaded once and shared.
+
+The icons are icons/streak_<days>.png, where <days> is the streak at which an icon starts to
+apply. The available milestones come from whichever icons exist, so a missing file simply isn't
+a milestone (there is no streak_15.png; streaks of 14-20 days use streak_14.png). A streak is
+mapped to its icon with a bisect over the sorted thresholds.
+
+At build time the icons are scaled down and packed into one Kivy atlas:
+    python streak_icons.py build
+
+At runtime the atlas (icons/streak.atlas) is loaded once when it exists. Otherwise each PNG is
+loaded once as a texture. Either way, textures are cached, so showing an icon for a habit row
+does no filesystem I/O:
+
+    Image(texture=streak_texture(habit['streak']))
+"""
+import bisect
+import glob
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+ICONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icons')
+ATLAS_NAME = 'streak'
+ATLAS_FILE = os.path.join(ICONS_DIR, ATLAS_NAME + '.atlas')
+# Icons are shown at 24dp; packing them at 64px keeps them sharp on dense screens
+ATLAS_ICON_SIZE = 64
+
+_ICON_PATTERN = re.compile(r"streak_(\d+)\.png$")
+
+# Sorted milestone thresholds and their icon names, discovered on first use
+_thresholds = None
+_names = None
+_textures = {}
+
+
+def icon_files():
+    """{threshold: path} for every icons/streak_<days>.png."""
+    files = {}
+    for path in glob.glob(os.path.join(ICONS_DIR, 'streak_*.png')):
+        match = _ICON_PATTERN.search(os.path.basename(path))
+        if match:
+            files[int(match.group(1))] = path
+    return files
+
+
+def _milestones():
+    global _thresholds, _names
+    if _thresholds is None:
+        files = icon_files()
+        _thresholds = sorted(files)
+        _names = [f"streak_{threshold}" for threshold in _thresholds]
+    return _thresholds, _names
+
+
+def streak_icon_name(streak):
+    """
+    Name of the icon for a streak (e.g. 'streak_7'), or None if there are no icons.
+
+    Streaks below the lowest milestone use the lowest milestone's icon.
+    """
+    thresholds, names = _milestones()
+    if not thresholds:
+        return None
+    index = bisect.bisect_right(thresholds, streak or 0) - 1
+    return names[max(index, 0)]
+
+
+def milestone_reached(old_streak, new_streak):
+    """
+    The milestone a streak just reached going from old_streak to new_streak, or None.
+
+    The first icon (streak_1) is where every streak starts, so it doesn't count as a milestone.
+    """
+    thresholds, _ = _milestones()
+    index = bisect.bisect_right(thresholds, new_streak or 0) - 1
+    if index > 0 and (old_streak or 0) < thresholds[index]:
+        return thresholds[index]
+    return None
+
+
+def streak_texture(streak):
+    """The shared Kivy texture for a streak's icon, or None if there are no icons."""
+    name = streak_icon_name(streak)
+    if name is None:
+        return None
+    if not _textures:
+        _load_textures()
+    return _textures.get(name)
+
+
+def _load_textures():
+    """Load every icon once, from the atlas when it was built, otherwise from the PNG files."""
+    thresholds, names = _milestones()
+    if os.path.exists(ATLAS_FILE):
+        from kivy.atlas import Atlas
+        atlas = Atlas(ATLAS_FILE)
+        for name in names:
+            if name in atlas.textures:
+                _textures[name] = atlas.textures[name]
+        if len(_textures) == len(names):
+            return
+        # The atlas is older than the icons; load whatever it lacks from the files
+    from kivy.core.image import Image as CoreImage
+    files = icon_files()
+    for threshold, name in zip(thresholds, names):
+        if name not in _textures:
+            _textures[name] = CoreImage(files[threshold]).texture
+
+
+def build_atlas(icon_size=ATLAS_ICON_SIZE, atlas_size=512):
+    """
+    Scale the icons to icon_size and pack them into icons/streak.atlas (plus its PNG page).
+
+    Returns:
+        str: Path of the atlas file
+    """
+    from PIL import Image as PILImage
+    from kivy.atlas import Atlas
+
+    staging = tempfile.mkdtemp(prefix="streak_icons_")
+    try:
+        scaled = []
+        for threshold, path in sorted(icon_files().items()):
+            image = PILImage.open(path).convert("RGBA")
+            image.thumbnail((icon_size, icon_size), PILImage.LANCZOS)
+            # Keep the file name: the atlas uses it as the texture ID
+            target = os.path.join(staging, os.path.basename(path))
+            image.save(target)
+            scaled.append(target)
+        result = Atlas.create(os.path.join(ICONS_DIR, ATLAS_NAME), scaled, atlas_size)
+        if not result:
+            raise RuntimeError(f"The icons don't fit in a {atlas_size}px atlas")
+        return result[0]
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['build']:
+        print("usage: python streak_icons.py build")
+        sys.exit(2)
+    print(f"wrote {build_atlas()}")
@@ -0,0 +1,276 @@
+"""
+Offline-first reporting of completions, credits and bonus code redemptions.
+
+HabitTracker writes every completion, credit and redemption into the `outbox` table in the same
+transaction as the change itself, so nothing is lost while the device is offline. SyncWorker runs
+in the background and periodically sends everything queued as one gzip-compressed JSON batch to a
+configurable endpoint, deleting the events once the server accepts them. Failed sends are retried
+with exponential backoff, so a flaky connection doesn't keep waking the radio.
+
+The endpoint receives:
+    POST <endpoint>
+    Content-Type: application/json
+    Content-Encoding: gzip
+
+    {"username": "...", "events": [{"id": 1, "type": "completion", "created_at": 1700000000, "payload": {...}}, ...]}
+
+Any 2xx response acknowledges the whole batch. Network errors, 5xx, 408 and 429 responses are
+retried with backoff without limit. Any other 4xx is a rejection: it counts against each event's
+`attempts`, and after max_attempts rejections the batch is moved to the dead letter state
+(`dead_at` set) so the batches queued behind it can go through. Outbox.requeue_dead sends dead
+events again, e.g. after a server fix.
+
+Events are queued whether or not a SyncWorker runs (one only starts when a sync endpoint is set),
+so the prune_outbox maintenance job (maintenance.py) drops dead events after a while and caps how
+many queued events are kept.
+"""
+import gzip
+import json
+import random
+import threading
+import urllib.error
+import urllib.request
+
+import storage
+import timestamps
+
+# HTTP statuses that mean "try again later" rather than "this batch is bad"
+RETRYABLE_STATUSES = {408, 429}
+
+
+class BatchRejected(Exception):
+    """Raised by SyncWorker.send_batch when the server permanently refuses a batch (4xx)."""
+
+    def __init__(self, status, reason=""):
+        super().__init__(f"HTTP {status} {reason}".strip())
+        self.status = status
+
+
+class Outbox:
+    """Read and acknowledge queued events in a HabitTracker's outbox table."""
+
+    def __init__(self, habit_tracker):
+        self.habit_tracker = habit_tracker
+
+    def get_batch(self, limit=500):
+        """
+        Get the oldest queued events.
+
+        Args:
+            limit (int): Maximum number of events to return
+
+        Returns:
+            list: Event dicts with 'id', 'type', 'created_at', 'attempts' and decoded 'payload'
+        """
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id, event_type, payload, created_at, attempts FROM outbox WHERE dead_at IS NULL ORDER BY id LIMIT ?",
+            (limit,)
+        )
+        events = [
+            {'id': row[0], 'type': row[1], 'payload': json.loads(row[2]), 'created_at': row[3], 'attempts': row[4]}
+            for row in cursor.fetchall()
+        ]
+        conn.close()
+        return events
+
+    def acknowledge(self, event_ids):
+        """Remove events the server has accepted."""
+        self._update("DELETE FROM outbox WHERE id = ?", event_ids)
+
+    def mark_rejected(self, event_ids, max_attempts):
+        """
+        Count a rejection for each event and dead-letter those rejected max_attempts times.
+
+        Returns:
+            int: Number of events moved to the dead letter state
+        """
+        self._update("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", event_ids)
+        dead_at = timestamps.now()
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        try:
+            cursor = conn.executemany(
+                "UPDATE outbox SET dead_at = ? WHERE id = ? AND attempts >= ? AND dead_at IS NULL",
+                [(dead_at, event_id, max_attempts) for event_id in event_ids]
+            )
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def requeue_dead(self):
+        """Queue every dead-lettered event again with a fresh attempt count. Returns how many."""
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        try:
+            cursor = conn.execute("UPDATE outbox SET dead_at = NULL, attempts = 0 WHERE dead_at IS NOT NULL")
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def count(self, dead=False):
+        """Return the number of queued events (or, with dead=True, of dead-lettered ones)."""
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        condition = "dead_at IS NOT NULL" if dead else "dead_at IS NULL"
+        count = conn.execute(f"SELECT COUNT(*) FROM outbox WHERE {condition}").fetchone()[0]
+        conn.close()
+        return count
+
+    def _update(self, query, event_ids):
+        conn = storage.connect(self.habit_tracker.habits_db_file)
+        try:
+            conn.executemany(query, [(event_id,) for event_id in event_ids])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+
+class SyncWorker:
+    """
+    Background thread that drains the outbox to a server endpoint in batches.
+
+    Args:
+        habit_tracker (HabitTracker): Tracker whose outbox should be drained
+        endpoint (str): URL the batches are POSTed to
+        username (str, optional): Account email sent along with each batch (defaults to the
+                                  tracker's current account, see HabitTracker.get_current_account)
+        interval (float): Seconds between sends while things are working
+        batch_size (int): Maximum number of events per request
+        max_backoff (float): Upper limit in seconds for the retry delay after failures
+        timeout (float): Request timeout in seconds
+        max_attempts (int): Rejections (4xx) after which a batch is dead-lettered
+    """
+
+    def __init__(self, habit_tracker, endpoint, username=None, interval=300, batch_size=500,
+                 max_backoff=3600, timeout=30, max_attempts=5):
+        self.habit_tracker = habit_tracker
+        self.outbox = Outbox(habit_tracker)
+        self.endpoint = endpoint
+        self.username = username
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+
+        self.failures = 0
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="SyncWorker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the background thread, waiting up to timeout seconds for an in-flight send."""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def flush_soon(self):
+        """Wake the worker so it sends right away instead of waiting for the next interval."""
+        self._wake.set()
+
+    def next_delay(self):
+        """Seconds to wait before the next send: the interval, or a jittered exponential backoff after failures."""
+        if not self.failures:
+            return self.interval
+        backoff = min(self.max_backoff, self.interval * (2 ** (self.failures - 1)))
+        # Jitter keeps many devices from retrying in lockstep after an outage
+        return backoff * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Sync worker error: {e}")
+
+            self._wake.wait(self.next_delay())
+            self._wake.clear()
+
+    def flush(self):
+        """
+        Send queued events until the outbox is empty or a send fails.
+
+        A rejected batch stops the flush like any failure until it is dead-lettered; then the
+        flush goes on with the batches behind it.
+
+        Returns:
+            int: Number of events the server acknowledged
+        """
+        sent = 0
+        while not self._stopping.is_set():
+            events = self.outbox.get_batch(self.batch_size)
+            if not events:
+                break
+
+            event_ids = [event['id'] for event in events]
+            try:
+                accepted = self.send_batch(events)
+            except BatchRejected as e:
+                dead = self.outbox.mark_rejected(event_ids, self.max_attempts)
+                if dead:
+                    print(f"Sync to {self.endpoint} rejected {dead} events ({e}); moved them to the dead letter state")
+                    continue
+                accepted = False
+            if not accepted:
+                self.failures += 1
+                break
+
+            self.failures = 0
+            self.outbox.acknowledge(event_ids)
+            sent += len(events)
+
+            if len(events) < self.batch_size:
+                break
+        return sent
+
+    def send_batch(self, events):
+        """
+        POST one batch of events to the endpoint.
+
+        Returns:
+            bool: True if the server accepted the batch, False if it should be retried later
+
+        Raises:
+            BatchRejected: If the server refused the batch with a non-retryable 4xx status
+        """
+        body = json.dumps({
+            'username': self.username or self.habit_tracker.get_current_user(),
+            'events': [
+                {'id': event['id'], 'type': event['type'], 'created_at': event['created_at'],
+                 'payload': event['payload']}
+                for event in events
+            ]
+        }).encode("utf-8")
+
+        request = urllib.request.Request(
+            self.endpoint,
+            data=gzip.compress(body),
+            method="POST",
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        )
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return 200 <= response.status < 300
+        except urllib.error.HTTPError as e:
+            if 400 <= e.code < 500 and e.code not in RETRYABLE_STATUSES:
+                raise BatchRejected(e.code, e.reason)
+            print(f"Sync to {self.endpoint} failed: {e}")
+            return False
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Sync to {self.endpoint} failed: {e}")
+            return False
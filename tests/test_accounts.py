@@ -0,0 +1,137 @@
+"""
+Tests for keeping each account's habits and completions apart in one store.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+from main import HabitTracker
+
+
+class AccountScopingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_accounts_")
+        admin = HabitTracker(data_dir=self.data_dir)
+        account_a = admin.add_account("a@example.com")
+        account_b = admin.add_account("b@example.com")
+        self.tracker_a = HabitTracker(data_dir=self.data_dir, account_id=account_a['id'])
+        self.tracker_b = HabitTracker(data_dir=self.data_dir, account_id=account_b['id'])
+        self.habit_a = self.add_habit(self.tracker_a, "Exercise")
+        self.tracker_a.record_completion(self.habit_a['id'])
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def add_habit(self, tracker, name):
+        return tracker.add_habit(name=name, frequency_type="daily", frequency_count=1, duration_seconds=0)
+
+    def test_other_accounts_habit_is_not_found(self):
+        habit_id = self.habit_a['id']
+        self.assertIsNone(self.tracker_b.get_habit(habit_id))
+        self.assertEqual(self.tracker_b.get_completions(habit_id), [])
+        self.assertEqual(len(self.tracker_b.get_completion_columns(habit_id)), 0)
+        for action in (lambda: self.tracker_b.record_completion(habit_id),
+                       lambda: self.tracker_b.record_completions([{'habit_id': habit_id}]),
+                       lambda: self.tracker_b.update_habit(habit_id, description="mine now"),
+                       lambda: self.tracker_b.update_reward_balance(habit_id, 10),
+                       lambda: self.tracker_b.delete_habit(habit_id)):
+            with self.assertRaises(ValueError):
+                action()
+
+        self.tracker_b.add_bonus_code("GIFT", 5)
+        self.assertFalse(self.tracker_b.use_bonus_code("GIFT", habit_id)['success'])
+
+        habit = self.tracker_a.get_habit(habit_id)
+        self.assertEqual((habit['description'], habit['reward_balance']), ("", 0.25))
+        self.assertEqual(len(self.tracker_a.get_completions(habit_id)), 1)
+
+    def test_names_are_unique_per_account(self):
+        habit_b = self.add_habit(self.tracker_b, "Exercise")
+        self.assertNotEqual(habit_b['id'], self.habit_a['id'])
+        with self.assertRaises(ValueError):
+            self.add_habit(self.tracker_b, "Exercise")
+        self.assertEqual([habit['name'] for habit in self.tracker_b.get_habits()], ["Exercise"])
+
+    def test_leaderboards_and_raffles_only_see_the_account(self):
+        habit_b = self.add_habit(self.tracker_b, "Read")
+        self.assertEqual([entry['habit_id'] for entry in self.tracker_b.get_leaderboard('reward_balance')],
+                         [habit_b['id']])
+        self.assertIsNone(self.tracker_b.get_rank(self.habit_a['id']))
+        self.assertEqual(self.tracker_b.run_raffle()['winners'], [habit_b['id']])
+
+        # A tracker without an account ranks everyone
+        everyone = HabitTracker(data_dir=self.data_dir)
+        self.assertEqual(len(everyone.get_leaderboard('reward_balance')), 2)
+
+
+class HabitNameMigrationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_accounts_")
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def test_globally_unique_names_are_rebuilt_per_account(self):
+        # The habits table as releases before accounts created it
+        conn = storage.connect(os.path.join(self.data_dir, "habits_data.db"))
+        conn.execute('''
+        CREATE TABLE habits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            description TEXT,
+            frequency_type TEXT NOT NULL,
+            frequency_count INTEGER NOT NULL,
+            duration_seconds INTEGER,
+            streak INTEGER DEFAULT 1,
+            reward_balance REAL DEFAULT 0.0,
+            created_at INTEGER NOT NULL,
+            last_completed INTEGER
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE preferred_times (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            habit_id INTEGER NOT NULL,
+            time TEXT NOT NULL,
+            FOREIGN KEY (habit_id) REFERENCES habits (id) ON DELETE CASCADE
+        )
+        ''')
+        conn.execute("INSERT INTO habits (id, name, frequency_type, frequency_count, created_at, reward_balance) "
+                     "VALUES (7, 'Exercise', 'daily', 1, 1700000000, 1.5)")
+        conn.execute("INSERT INTO preferred_times (habit_id, time) VALUES (7, '08:00')")
+        conn.commit()
+        conn.close()
+
+        tracker = HabitTracker(data_dir=self.data_dir)
+        account_a = tracker.add_account("a@example.com")
+        account_b = tracker.add_account("b@example.com")
+
+        habit = HabitTracker(data_dir=self.data_dir, account_id=account_a['id']).get_habit(7)
+        self.assertEqual((habit['name'], habit['reward_balance'], habit['preferred_times']),
+                         ("Exercise", 1.5, ["08:00"]))
+        tracker_b = HabitTracker(data_dir=self.data_dir, account_id=account_b['id'])
+        self.assertEqual(tracker_b.add_habit("Exercise", "daily", 1)['name'], "Exercise")
+
+        # Habits without an account still can't share a name
+        conn = storage.connect(tracker.habits_db_file)
+        conn.execute("INSERT INTO habits (name, frequency_type, frequency_count, created_at) "
+                     "VALUES ('Read', 'daily', 1, 0)")
+        with self.assertRaises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO habits (name, frequency_type, frequency_count, created_at) "
+                         "VALUES ('Read', 'daily', 1, 0)")
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
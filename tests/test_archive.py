@@ -0,0 +1,67 @@
+"""
+Tests for reading completions back from the cold archive.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+import timestamps
+from main import HabitTracker
+
+DAY = 86400
+
+
+class ArchiveReadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_archive_")
+        self.tracker = HabitTracker(data_dir=self.data_dir)
+        self.read = self.tracker.add_habit(name="Read", frequency_type="daily", frequency_count=1, duration_seconds=60)
+        self.run = self.tracker.add_habit(name="Run", frequency_type="daily", frequency_count=1, duration_seconds=60)
+
+        now = timestamps.now()
+        self.times = {'old': now - 500 * DAY, 'older': now - 400 * DAY, 'recent': now - 10 * DAY}
+        conn = storage.connect(self.tracker.completions_db_file)
+        conn.executemany("INSERT INTO habit_completions (habit_id, completion_time, duration_seconds, notes) "
+                         "VALUES (?, ?, 60, ?)",
+                         [(self.read['id'], completion_time, label) for label, completion_time in self.times.items()]
+                         + [(self.run['id'], self.times['old'], "run")])
+        conn.commit()
+        conn.close()
+        self.before = self.tracker.get_completions(self.read['id'])
+        self.assertEqual(self.tracker.archive_completions(), 3)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def test_get_completions_reads_archived_rows(self):
+        # Same rows, same order (newest first), same shapes as before archiving
+        self.assertEqual(self.tracker.get_completions(self.read['id']), self.before)
+        self.assertEqual([row['notes'] for row in self.before], ["recent", "older", "old"])
+
+        conn = storage.connect(self.tracker.completions_db_file)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM habit_completions").fetchone()[0], 1)
+        conn.close()
+
+    def test_date_ranges_span_both_tiers(self):
+        habit_id = self.read['id']
+        notes = lambda **kwargs: [row['notes'] for row in self.tracker.get_completions(habit_id, **kwargs)]
+        self.assertEqual(notes(start_date=self.times['older']), ["recent", "older"])
+        self.assertEqual(notes(end_date=self.times['older']), ["older", "old"])
+        self.assertEqual(notes(start_date=self.times['older'] + 1, end_date=self.times['recent'] - 1), [])
+        self.assertEqual([row['notes'] for row in self.tracker.get_completions(self.run['id'])], ["run"])
+
+        totals = self.tracker.get_completion_totals()
+        self.assertEqual(totals[habit_id], (3, 180))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+Tests for the command-line interface's exit status.
+
+Run with:
+    python -m pytest tests
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cli
+
+
+class BatchExitStatusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_cli_")
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def run_batch(self, commands):
+        output = io.StringIO()
+        with mock.patch.object(sys, "stdin", io.StringIO(commands)), redirect_stdout(output):
+            status = cli.main(["--data-dir", self.data_dir, "batch"])
+        return status, output.getvalue()
+
+    def test_batch_succeeds_when_every_line_does(self):
+        status, output = self.run_batch('add "Read" --frequency daily --count 1\n# comment\n\ncomplete 1\n')
+        self.assertEqual(status, 0)
+        self.assertIn("Processed 2 commands (0 failed)", output)
+
+    def test_batch_fails_when_any_line_does(self):
+        status, output = self.run_batch('add "Read" --frequency daily --count 1\ncomplete 99\ncomplete 1\n')
+        self.assertEqual(status, 1)
+        self.assertIn("Processed 3 commands (1 failed)", output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Tests for the column store returned by HabitTracker.get_completion_columns.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+from completion_store import CompletionColumns
+from main import HabitTracker
+
+
+class CompletionColumnsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_completion_store_")
+        self.tracker = HabitTracker(data_dir=self.data_dir)
+        self.read = self.tracker.add_habit(name="Read", frequency_type="daily", frequency_count=1, duration_seconds=600)
+        self.run = self.tracker.add_habit(name="Run", frequency_type="daily", frequency_count=1, duration_seconds=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def test_columns_match_get_completions(self):
+        self.tracker.record_completion(self.read['id'], notes="chapter 1")
+        self.tracker.record_completion(self.run['id'], duration_seconds=1800)
+        self.tracker.record_completion(self.read['id'], duration_seconds=300, notes="chapter 2")
+
+        columns = self.tracker.get_completion_columns()
+        self.assertEqual(len(columns), 3)
+        self.assertEqual(columns.habit_counts(), {self.read['id']: 2, self.run['id']: 1})
+        self.assertEqual(columns.total_duration(), 600 + 1800 + 300)
+        self.assertEqual(columns[-1].habit_id, columns[2]['habit_id'])
+
+        # Same rows, same shapes (epoch seconds), notes loaded on demand
+        expected = self.tracker.get_completions(self.read['id'])
+        read_columns = self.tracker.get_completion_columns(self.read['id'])
+        self.assertEqual([view.as_dict() for view in read_columns],
+                         [{key: row[key] for key in ('id', 'habit_id', 'completion_time', 'duration_seconds', 'notes')}
+                          for row in expected])
+        self.assertIsInstance(read_columns[0].as_dict()['completion_time'], int)
+
+    def test_fractional_durations_are_whole_seconds(self):
+        habit = self.tracker.add_habit(name="Stretch", frequency_type="daily", frequency_count=1, duration_seconds=90.5)
+        self.assertEqual(habit['duration_seconds'], 90)
+        self.tracker.record_completion(habit['id'])
+        self.tracker.record_completion(habit['id'], duration_seconds=30.9)
+
+        # Rows written as floats by older versions still load
+        conn = storage.connect(self.tracker.completions_db_file)
+        conn.execute("INSERT INTO habit_completions (habit_id, completion_time, duration_seconds) VALUES (?, 1, 45.5)",
+                     (habit['id'],))
+        conn.commit()
+        conn.close()
+
+        columns = self.tracker.get_completion_columns(habit['id'])
+        self.assertEqual(sorted(view.duration_seconds for view in columns), [30, 45, 90])
+        self.assertEqual(self.tracker.recompute_streaks()[habit['id']], 2)
+
+    def test_sort_and_group_by_habit(self):
+        columns = CompletionColumns()
+        for completion_id, habit_id, completion_time in ((1, 7, 300), (2, 8, 100), (3, 7, 200)):
+            columns.append(completion_id, habit_id, completion_time, None, notes="")
+        columns.sort_by_time()
+
+        self.assertEqual(list(columns.ids), [1, 3, 2])
+        self.assertEqual(columns.times_by_habit(), {7: [300, 200], 8: [100]})
+        self.assertIsNone(columns[0].duration_seconds)
+        self.assertEqual(columns.total_duration(), 0)
+        with self.assertRaises(IndexError):
+            columns[3]
+
+
+if __name__ == '__main__':
+    unittest.main()
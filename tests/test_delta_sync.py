@@ -0,0 +1,182 @@
+"""
+Tests for delta sync between two (or three) local stores through InProcessTransport.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+from delta_sync import DeltaSyncEngine, InProcessTransport
+from main import HabitTracker
+
+
+def change_log_size(db_file):
+    conn = storage.connect(db_file)
+    count = conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0]
+    conn.close()
+    return count
+
+
+class DeltaSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dirs = []
+        self.tracker_a, self.engine_a = self.new_store()
+        self.tracker_b, self.engine_b = self.new_store()
+
+    def tearDown(self):
+        for data_dir in self.data_dirs:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    def new_store(self):
+        data_dir = tempfile.mkdtemp(prefix="habit_test_delta_sync_")
+        self.data_dirs.append(data_dir)
+        tracker = HabitTracker(data_dir=data_dir)
+        return tracker, DeltaSyncEngine(tracker)
+
+    def add_habit(self, tracker, name):
+        return tracker.add_habit(name=name, frequency_type="daily", frequency_count=1, duration_seconds=0)
+
+    def habits_by_name(self, tracker):
+        return {habit['name']: habit for habit in tracker.get_habits()}
+
+    def assertSameHabits(self):
+        habits_a, habits_b = self.habits_by_name(self.tracker_a), self.habits_by_name(self.tracker_b)
+        self.assertEqual(sorted(habits_a), sorted(habits_b))
+        for name in habits_a:
+            for field in ('description', 'frequency_type', 'frequency_count', 'streak', 'reward_balance'):
+                self.assertEqual(habits_a[name][field], habits_b[name][field], f"{name}.{field}")
+
+    def test_round_trip_merges_habits_and_completions(self):
+        read = self.add_habit(self.tracker_a, "Read")
+        self.tracker_a.record_completion(read['id'], notes="on a")
+        self.add_habit(self.tracker_b, "Run")
+
+        result = self.engine_a.sync(InProcessTransport(self.engine_b))
+        self.assertEqual(result['peer_id'], self.engine_b.device_id)
+        self.assertEqual(result['pulled']['habits'], 1)
+        self.assertEqual(result['pushed']['habits'], 1)
+        self.assertEqual(result['pushed']['completions'], 1)
+        self.assertSameHabits()
+
+        # Both devices complete the same habit; the completions are unioned and rewards recomputed
+        read_b = self.habits_by_name(self.tracker_b)["Read"]
+        self.tracker_b.record_completion(read_b['id'], notes="on b")
+        self.tracker_a.record_completion(read['id'], notes="on a again")
+        self.engine_b.sync(InProcessTransport(self.engine_a))
+
+        self.assertSameHabits()
+        notes_a = sorted(completion['notes'] for completion in self.tracker_a.get_all_completions())
+        notes_b = sorted(completion['notes'] for completion in self.tracker_b.get_all_completions())
+        self.assertEqual(notes_a, ["on a", "on a again", "on b"])
+        self.assertEqual(notes_a, notes_b)
+        self.assertEqual(self.habits_by_name(self.tracker_a)["Read"]['reward_balance'], 0.75)
+
+    def test_settings_conflict_is_last_writer_wins(self):
+        read = self.add_habit(self.tracker_a, "Read")
+        self.engine_a.sync(InProcessTransport(self.engine_b))
+
+        read_b = self.habits_by_name(self.tracker_b)["Read"]
+        self.tracker_a.update_habit(read['id'], description="older")
+        self.tracker_b.update_habit(read_b['id'], description="newer")
+        self.engine_a.sync(InProcessTransport(self.engine_b))
+
+        self.assertEqual(self.habits_by_name(self.tracker_a)["Read"]['description'], "newer")
+        self.assertSameHabits()
+
+    def test_deletes_propagate(self):
+        read = self.add_habit(self.tracker_a, "Read")
+        self.add_habit(self.tracker_a, "Run")
+        self.tracker_a.record_completion(read['id'])
+        self.engine_a.sync(InProcessTransport(self.engine_b))
+
+        self.tracker_b.delete_habit(self.habits_by_name(self.tracker_b)["Read"]['id'])
+        self.engine_b.sync(InProcessTransport(self.engine_a))
+
+        self.assertEqual(sorted(self.habits_by_name(self.tracker_a)), ["Run"])
+        self.assertEqual(self.tracker_a.get_all_completions(), [])
+
+    def test_acknowledged_changes_are_pruned(self):
+        read = self.add_habit(self.tracker_a, "Read")
+        for _ in range(5):
+            self.tracker_a.record_completion(read['id'])
+        self.add_habit(self.tracker_b, "Run")
+
+        # B logs what it applies from A's push; A acknowledges those entries on its next pull
+        for _ in range(3):
+            self.engine_a.sync(InProcessTransport(self.engine_b))
+        for tracker in (self.tracker_a, self.tracker_b):
+            self.assertEqual(change_log_size(tracker.habits_db_file), 0)
+            self.assertEqual(change_log_size(tracker.completions_db_file), 0)
+
+        # Cursors keep counting after pruning, so only new changes are exchanged
+        cursor = self.engine_a.get_cursor()
+        self.tracker_a.record_completion(read['id'])
+        self.assertGreater(self.engine_a.get_cursor()['completions'], cursor['completions'])
+        result = self.engine_a.sync(InProcessTransport(self.engine_b))
+        self.assertEqual(result['pushed']['completions'], 1)
+        self.assertSameHabits()
+
+    def test_new_peer_gets_a_snapshot_of_pruned_changes(self):
+        read = self.add_habit(self.tracker_a, "Read")
+        self.tracker_a.record_completion(read['id'])
+        self.engine_a.sync(InProcessTransport(self.engine_b))
+        self.engine_a.sync(InProcessTransport(self.engine_b))
+        self.assertEqual(change_log_size(self.tracker_a.completions_db_file), 0)
+
+        tracker_c, engine_c = self.new_store()
+        engine_c.sync(InProcessTransport(self.engine_a))
+
+        self.assertEqual(sorted(self.habits_by_name(tracker_c)), ["Read"])
+        self.assertEqual(len(tracker_c.get_all_completions()), 1)
+        self.assertEqual(self.habits_by_name(tracker_c)["Read"]['reward_balance'], 0.25)
+
+    def test_snapshot_includes_archived_completions(self):
+        read = self.add_habit(self.tracker_a, "Read")
+        for _ in range(3):
+            self.tracker_a.record_completion(read['id'])
+        conn = storage.connect(self.tracker_a.completions_db_file)
+        conn.execute("UPDATE habit_completions SET completion_time = completion_time - 800 * 86400 "
+                     "WHERE id IN (SELECT id FROM habit_completions ORDER BY id LIMIT 2)")
+        conn.commit()
+        conn.close()
+        self.assertEqual(self.tracker_a.archive_completions(), 2)
+        self.engine_a.sync(InProcessTransport(self.engine_b))
+        self.engine_a.sync(InProcessTransport(self.engine_b))
+
+        tracker_c, engine_c = self.new_store()
+        engine_c.sync(InProcessTransport(self.engine_a))
+        self.assertEqual(len(tracker_c.get_all_completions(include_archived=True)), 3)
+        self.assertEqual(self.habits_by_name(tracker_c)["Read"]['reward_balance'], 0.75)
+
+        # A second snapshot doesn't duplicate what the receiver has archived in the meantime
+        self.assertEqual(tracker_c.archive_completions(), 2)
+        self.assertEqual(engine_c.apply_changes(self.engine_a.get_changes())['completions'], 0)
+        self.assertEqual(len(tracker_c.get_all_completions(include_archived=True)), 3)
+        self.assertEqual(self.habits_by_name(tracker_c)["Read"]['reward_balance'], 0.75)
+
+    def test_tombstones_are_pruned_with_the_change_log(self):
+        run = self.add_habit(self.tracker_a, "Run")
+        self.engine_a.sync(InProcessTransport(self.engine_b))
+        self.tracker_a.delete_habit(run['id'])
+        self.engine_a.sync(InProcessTransport(self.engine_b))
+        self.assertEqual(self.habits_by_name(self.tracker_b), {})
+
+        # B logged the delete it applied; once A has acknowledged that too, no tombstone is left
+        self.engine_a.sync(InProcessTransport(self.engine_b))
+        self.engine_a.sync(InProcessTransport(self.engine_b))
+        for tracker in (self.tracker_a, self.tracker_b):
+            conn = storage.connect(tracker.habits_db_file)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM habit_versions").fetchone()[0], 0)
+            conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Tests for leaderboards catching up with writes from other connections.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import leaderboard
+import storage
+from main import HabitTracker
+
+
+class LeaderboardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_leaderboard_")
+        self.tracker = HabitTracker(data_dir=self.data_dir)
+        self.habit_ids = [
+            self.tracker.add_habit(name=f"Habit {i}", frequency_type="daily", frequency_count=1, duration_seconds=0)['id']
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def write_elsewhere(self, *statements):
+        """Commit on a connection of its own, as another process would."""
+        conn = storage.connect(self.tracker.habits_db_file)
+        for sql, params in statements:
+            conn.execute(sql, params)
+        conn.commit()
+        conn.close()
+
+    def test_other_connections_changes_are_ranked(self):
+        last = self.habit_ids[-1]
+        self.assertEqual(self.tracker.get_rank(last, 'reward_balance')['value'], 0)
+
+        self.write_elsewhere(("UPDATE habits SET reward_balance = 500 WHERE id = ?", (last,)))
+        self.assertEqual(self.tracker.get_rank(last, 'reward_balance'),
+                         {'habit_id': last, 'rank': 1, 'value': 500, 'entrants': 3})
+
+        self.write_elsewhere(("DELETE FROM habits WHERE id = ?", (last,)))
+        self.assertIsNone(self.tracker.get_rank(last, 'reward_balance'))
+        self.assertEqual(len(self.tracker.get_leaderboard('reward_balance', limit=10)), 2)
+
+    def test_trimmed_change_log_reloads_the_boards(self):
+        self.tracker.get_leaderboard('streak')
+        boards = leaderboard.get_leaderboards(self.tracker.habits_db_file)
+        self.write_elsewhere(("UPDATE habits SET streak = 7", ()),
+                             ("DELETE FROM leaderboard_changes WHERE seq <= ?", (boards.seq + 1,)))
+
+        page = self.tracker.get_leaderboard('streak')
+        self.assertEqual([entry['value'] for entry in page], [7, 7, 7])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Tests for the maintenance jobs.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import maintenance
+import storage
+import timestamps
+from main import HabitTracker
+from sync_queue import Outbox
+
+
+class MaintenanceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_maintenance_")
+        self.tracker = HabitTracker(data_dir=self.data_dir)
+        self.habit = self.tracker.add_habit(name="Read", frequency_type="daily", frequency_count=1, duration_seconds=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def test_prune_outbox_caps_queued_and_drops_old_dead_events(self):
+        self.tracker.record_completions([{'habit_id': self.habit['id']}] * 8)
+        outbox = Outbox(self.tracker)
+        oldest = [event['id'] for event in outbox.get_batch(limit=2)]
+        conn = storage.connect(self.tracker.habits_db_file)
+        conn.execute("UPDATE outbox SET dead_at = ? WHERE id = ?", (timestamps.now() - 40 * 86400, oldest[0]))
+        conn.execute("UPDATE outbox SET dead_at = ? WHERE id = ?", (timestamps.now(), oldest[1]))
+        conn.commit()
+        conn.close()
+
+        result = maintenance.prune_outbox(self.tracker, maintenance.Budget(5), max_events=4)
+
+        # The old dead event and the two oldest of the six queued ones go; the recent dead one stays
+        self.assertEqual(result['pruned'], 3)
+        self.assertEqual(outbox.count(), 4)
+        self.assertEqual(outbox.count(dead=True), 1)
+        self.assertEqual(min(event['id'] for event in outbox.get_batch()), oldest[1] + 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
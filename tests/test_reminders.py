@@ -0,0 +1,68 @@
+"""
+Tests for scheduling reminders at preferred times across midnight.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime, time, timedelta
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import HabitTracker
+from reminders import ReminderScheduler, next_fire_time
+
+
+def local(day, hour, minute=0):
+    return int(datetime.combine(day, time(hour, minute)).timestamp())
+
+
+class ReminderSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_reminders_")
+        self.tracker = HabitTracker(data_dir=self.data_dir)
+        self.today = date.today()
+        self.tomorrow = self.today + timedelta(days=1)
+        self.now = local(self.today, 23, 30)
+        self.notifications = []
+        self.scheduler = ReminderScheduler(self.tracker, clock=lambda: self.now,
+                                           notifier=lambda title, message: self.notifications.append(message))
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def test_next_fire_time_rolls_over_to_the_next_day(self):
+        self.assertEqual(next_fire_time("23:45", self.now), local(self.today, 23, 45))
+        self.assertEqual(next_fire_time("07:00", self.now), local(self.tomorrow, 7))
+        self.assertEqual(next_fire_time("00:00", self.now), local(self.tomorrow, 0))
+        # A reminder due exactly now is next due tomorrow
+        self.assertEqual(next_fire_time("23:30", self.now), local(self.tomorrow, 23, 30))
+
+    def test_reminders_fire_in_order_across_midnight(self):
+        self.tracker.add_habit(name="Stretch", frequency_type="daily", frequency_count=1,
+                               preferred_times=["07:00", "23:45"])
+        self.tracker.add_habit(name="Read", frequency_type="daily", frequency_count=1, preferred_times=["00:15"])
+        self.scheduler.reload()
+        self.assertEqual(len(self.scheduler), 3)
+        self.assertEqual(self.scheduler.next_due(), local(self.today, 23, 45))
+
+        self.assertEqual(self.scheduler.fire_due(local(self.today, 23, 50)), 1)
+        self.assertEqual(self.scheduler.next_due(), local(self.tomorrow, 0, 15))
+        self.assertEqual(self.scheduler.fire_due(local(self.tomorrow, 0, 15)), 1)
+        self.assertEqual(self.scheduler.next_due(), local(self.tomorrow, 7))
+        self.assertEqual(self.scheduler.fire_due(local(self.tomorrow, 7, 1)), 1)
+
+        # Each reminder was pushed back one day, to the same wall-clock time
+        self.assertEqual(self.scheduler.next_due(), local(self.tomorrow, 23, 45))
+        self.assertEqual(self.notifications, ["Time for 'Stretch' (23:45)", "Time for 'Read' (00:15)",
+                                              "Time for 'Stretch' (07:00)"])
+        self.assertEqual(len(self.scheduler), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
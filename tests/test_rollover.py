@@ -0,0 +1,106 @@
+"""
+Tests for settling streaks at period rollover.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import periods
+import storage
+import timestamps
+from main import HabitTracker
+
+HOUR = 3600
+DAY = 86400
+
+
+def store_completions(tracker, habit_id, times):
+    """Store completions at the given epoch seconds and rebuild streaks, as if recorded at the time."""
+    conn = storage.connect(tracker.completions_db_file)
+    conn.executemany("INSERT INTO habit_completions (habit_id, completion_time, duration_seconds) VALUES (?, ?, 0)",
+                     [(habit_id, completion_time) for completion_time in times])
+    conn.commit()
+    conn.close()
+    tracker.recompute_streaks()
+
+
+class HardcoreRolloverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_rollover_")
+        self.tracker = HabitTracker(data_dir=self.data_dir)
+        self.habit = self.tracker.add_habit(name="Read", frequency_type="daily", frequency_count=1,
+                                            duration_seconds=0, hardcore=True)
+        first_day = date.today() - timedelta(days=10)
+        self.midnights = [periods.local_midnight(first_day + timedelta(days=i)) for i in range(5)]
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def complete_at(self, *times):
+        conn = storage.connect(self.tracker.habits_db_file)
+        conn.execute("UPDATE habits SET hardcore_since = ? WHERE id = ?", (self.midnights[0], self.habit['id']))
+        conn.commit()
+        conn.close()
+        store_completions(self.tracker, self.habit['id'], times)
+
+    def test_late_rollover_keeps_completions_since_the_failed_period(self):
+        # Day 0 done, day 1 missed, days 2 and 3 done; the rollover only runs on day 3
+        day0, day1, day2, day3 = self.midnights[:4]
+        self.complete_at(day0 + 10 * HOUR, day2 + 9 * HOUR, day3 + 9 * HOUR)
+
+        result = self.tracker.rollover(day3 + 12 * HOUR)
+
+        self.assertEqual(result['hardcore'], {self.habit['id']: [(date.fromtimestamp(day1).isoformat(), 0, 1)]})
+        habit = self.tracker.get_habit(self.habit['id'])
+        self.assertEqual(habit['streak_reset_at'], day2)
+        self.assertEqual(habit['streak'], 2)
+        self.assertEqual(self.tracker.recompute_streaks()[self.habit['id']], 2)
+
+        # Running it again changes nothing
+        self.assertEqual(self.tracker.rollover(day3 + 13 * HOUR)['hardcore'], {})
+        self.assertEqual(self.tracker.get_habit(self.habit['id'])['streak'], 2)
+
+
+class LapseRolloverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_rollover_")
+        self.tracker = HabitTracker(data_dir=self.data_dir)
+        self.habit = self.tracker.add_habit(name="Read", frequency_type="daily", frequency_count=1, duration_seconds=0)
+        now = timestamps.now()
+        store_completions(self.tracker, self.habit['id'], [now - 10 * DAY, now - 9 * DAY, now - 8 * DAY])
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def streak(self):
+        return self.tracker.get_habit(self.habit['id'])['streak']
+
+    def test_lapse_reset_survives_recompute_streaks(self):
+        self.assertEqual(self.streak(), 3)
+
+        result = self.tracker.rollover()
+        self.assertEqual(result['lapsed'], [self.habit['id']])
+        self.assertEqual(self.streak(), 1)
+
+        # Rebuilding from the history must not bring the lapsed streak back
+        self.assertEqual(self.tracker.recompute_streaks()[self.habit['id']], 1)
+        self.assertEqual(self.streak(), 1)
+        self.assertEqual(self.tracker.rollover()['lapsed'], [])
+
+        # The next completion starts a new streak instead of chaining across the reset
+        self.assertEqual(self.tracker.record_completion(self.habit['id'])['streak'], 1)
+        self.assertEqual(self.tracker.recompute_streaks()[self.habit['id']], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
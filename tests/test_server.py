@@ -0,0 +1,82 @@
+"""
+Tests for the HTTP/JSON API server's handling of malformed request bodies.
+
+Run with:
+    python -m pytest tests
+"""
+import http.client
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import HabitTracker
+from server import HabitAPIServer
+
+
+class ServerValidationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_server_")
+        self.tracker = HabitTracker(data_dir=self.data_dir)
+        self.habit = self.tracker.add_habit(name="Read", frequency_type="daily", frequency_count=1, duration_seconds=0)
+        self.server = HabitAPIServer(("127.0.0.1", 0), self.tracker)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def request(self, method, path, body):
+        conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=5)
+        try:
+            conn.request(method, path, body=json.dumps(body), headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    def assertRejected(self, method, path, body):
+        status, response = self.request(method, path, body)
+        self.assertEqual(status, 400, response)
+        self.assertIn('error', response)
+
+    def test_mistyped_habit_fields_are_rejected(self):
+        self.assertRejected("POST", "/habits", {"name": "Run", "preferred_times": 5})
+        self.assertRejected("POST", "/habits", {"name": "Run", "preferred_times": [5]})
+        self.assertRejected("POST", "/habits", {"name": ["Run"]})
+        self.assertRejected("POST", "/habits", {"name": "Run", "duration_seconds": 90.5})
+        self.assertRejected("POST", "/habits/bulk", [{"name": "Walk"}, {"name": "Run", "frequency_count": "2"}])
+        self.assertEqual([habit['name'] for habit in self.tracker.get_habits()], ["Read"])
+
+    def test_patch_only_accepts_known_fields(self):
+        path = f"/habits/{self.habit['id']}"
+        self.assertRejected("PATCH", path, {"habit_id": 3})
+        self.assertRejected("PATCH", path, {"streak": 100})
+        self.assertRejected("PATCH", path, {"frequency_type": "hourly"})
+        self.assertEqual(self.tracker.get_habit(self.habit['id'])['frequency_type'], "daily")
+
+        status, habit = self.request("PATCH", path, {"description": "Before bed", "hardcore": True})
+        self.assertEqual(status, 200)
+        self.assertEqual(habit['description'], "Before bed")
+
+    def test_mistyped_completion_and_redeem_fields_are_rejected(self):
+        self.assertRejected("POST", f"/habits/{self.habit['id']}/complete", {"notes": 5})
+        self.assertRejected("POST", "/completions/bulk", [{"habit_id": str(self.habit['id'])}])
+        self.assertRejected("POST", "/bonus_codes/redeem", {"code": ["x"]})
+        self.assertRejected("POST", "/bonus_codes/redeem", {"code": "X", "habit_id": "1"})
+        self.assertEqual(self.tracker.get_all_completions(), [])
+
+        self.tracker.add_bonus_code("GIFT", 1.0)
+        status, result = self.request("POST", "/bonus_codes/redeem", {"code": "GIFT", "habit_id": None})
+        self.assertEqual((status, result['success']), (200, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
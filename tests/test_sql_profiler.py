@@ -0,0 +1,56 @@
+"""
+Tests for the SQL profiler's slow-query log.
+
+Run with:
+    python -m pytest tests
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import HabitTracker
+from sql_profiler import SQLProfiler
+
+
+class SQLProfilerLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_sql_profiler_")
+        self.log_file = os.path.join(self.data_dir, "slow.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def profiled_entries(self, **kwargs):
+        """Log every statement of adding and completing a habit; return the entries with parameters."""
+        profiler = SQLProfiler(self.log_file, slow_ms=0, **kwargs)
+        tracker = HabitTracker(data_dir=self.data_dir)
+        profiler.attach(tracker)
+        habit = tracker.add_habit(name="Therapy", frequency_type="weekly", frequency_count=1, duration_seconds=0)
+        tracker.record_completion(habit['id'], notes="talked about work")
+        for handler in profiler.logger.handlers:
+            handler.close()
+        with open(self.log_file) as file:
+            return [entry for entry in map(json.loads, file) if entry['params']]
+
+    def test_params_are_redacted_by_default(self):
+        entries = self.profiled_entries()
+        self.assertTrue(entries)
+        logged = json.dumps(entries)
+        self.assertNotIn("Therapy", logged)
+        self.assertNotIn("talked about work", logged)
+        self.assertIn("<str>", logged)
+
+    def test_raw_params_are_opt_in(self):
+        logged = json.dumps(self.profiled_entries(log_params=True))
+        self.assertIn("Therapy", logged)
+        self.assertIn("talked about work", logged)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Tests for the outbox sync worker against a local stand-in HTTP server.
+
+Run with:
+    python -m pytest tests
+"""
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import HabitTracker
+from sync_queue import SyncWorker
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Records each batch; answers server.status, or 400 for batches holding a server.reject_ids event."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        batch = json.loads(body)
+        self.server.batches.append(batch)
+
+        status = self.server.status
+        if any(event['id'] in self.server.reject_ids for event in batch['events']):
+            status = 400
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SyncWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_sync_")
+        self.tracker = HabitTracker(data_dir=self.data_dir)
+        self.habit = self.tracker.add_habit(name="Read", frequency_type="daily", frequency_count=1, duration_seconds=0)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.batches = []
+        self.server.status = 200
+        self.server.reject_ids = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = f"http://127.0.0.1:{self.server.server_port}/sync"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def queue_completions(self, count):
+        for _ in range(count):
+            self.tracker.record_completion(self.habit['id'])
+
+    def outbox_ids(self):
+        return [event['id'] for event in self.worker().outbox.get_batch()]
+
+    def worker(self, **kwargs):
+        return SyncWorker(self.tracker, self.endpoint, username="me@example.com", timeout=5, **kwargs)
+
+    def test_flush_sends_compressed_batches_and_empties_outbox(self):
+        self.queue_completions(5)
+        worker = self.worker(batch_size=2)
+
+        self.assertEqual(worker.flush(), 5)
+        self.assertEqual(worker.outbox.count(), 0)
+        self.assertEqual([len(batch['events']) for batch in self.server.batches], [2, 2, 1])
+        self.assertEqual(self.server.batches[0]['username'], "me@example.com")
+        self.assertEqual(self.server.batches[0]['events'][0]['type'], "completion")
+        self.assertEqual(self.server.batches[0]['events'][0]['payload']['habit_id'], self.habit['id'])
+
+    def test_server_errors_keep_events_queued_and_back_off(self):
+        self.queue_completions(3)
+        self.server.status = 503
+        worker = self.worker(interval=10)
+
+        self.assertEqual(worker.flush(), 0)
+        self.assertEqual(worker.flush(), 0)
+        self.assertEqual(worker.failures, 2)
+        self.assertEqual(worker.outbox.count(), 3)
+        self.assertGreaterEqual(worker.next_delay(), 10)
+
+        self.server.status = 200
+        self.assertEqual(worker.flush(), 3)
+        self.assertEqual(worker.failures, 0)
+        self.assertEqual(worker.next_delay(), 10)
+
+    def test_unreachable_server_keeps_events_queued(self):
+        self.queue_completions(2)
+        self.server.shutdown()
+        self.server.server_close()
+        worker = SyncWorker(self.tracker, self.endpoint, username="me@example.com", timeout=1)
+
+        self.assertEqual(worker.flush(), 0)
+        self.assertEqual(worker.outbox.count(), 2)
+
+    def test_rejected_batch_is_dead_lettered_and_unblocks_later_batches(self):
+        self.queue_completions(4)
+        first_id = self.outbox_ids()[0]
+        self.server.reject_ids = {first_id}
+        worker = self.worker(batch_size=2, max_attempts=2)
+
+        # First rejection: retried later, nothing behind it is sent yet
+        self.assertEqual(worker.flush(), 0)
+        self.assertEqual(worker.outbox.count(), 4)
+
+        # Second rejection: dead-lettered, and the next batch goes through
+        self.assertEqual(worker.flush(), 2)
+        self.assertEqual(worker.outbox.count(), 0)
+        self.assertEqual(worker.outbox.count(dead=True), 2)
+
+        self.server.reject_ids = set()
+        self.assertEqual(worker.outbox.requeue_dead(), 2)
+        self.assertEqual(worker.flush(), 2)
+        self.assertEqual(worker.outbox.count(dead=True), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
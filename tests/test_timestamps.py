@@ -0,0 +1,123 @@
+"""
+Tests for migrating ISO string timestamps from the first release to epoch seconds.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+from main import SCHEMA_VERSION, HabitTracker
+
+CREATED = "2024-03-01T08:30:00.123456"
+COMPLETED = "2024-03-02T07:15:00"
+
+
+def epoch(iso):
+    # The first release wrote naive local times with datetime.now().isoformat()
+    return int(datetime.fromisoformat(iso).timestamp())
+
+
+class TimestampMigrationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_timestamps_")
+
+        # The databases as the first release created and filled them
+        conn = storage.connect(os.path.join(self.data_dir, "habits_data.db"))
+        conn.execute('''
+        CREATE TABLE habits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            description TEXT,
+            frequency_type TEXT NOT NULL,
+            frequency_count INTEGER NOT NULL,
+            duration_seconds INTEGER,
+            streak INTEGER DEFAULT 1,
+            reward_balance REAL DEFAULT 0.0,
+            created_at TIMESTAMP NOT NULL,
+            last_completed TIMESTAMP
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE bonus_codes (
+            code TEXT PRIMARY KEY,
+            value REAL NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP NOT NULL,
+            expiry_date TIMESTAMP,
+            used BOOLEAN DEFAULT 0,
+            used_at TIMESTAMP
+        )
+        ''')
+        conn.executemany("INSERT INTO habits (id, name, frequency_type, frequency_count, created_at, last_completed) "
+                         "VALUES (?, ?, 'daily', 1, ?, ?)",
+                         [(1, "Read", CREATED, COMPLETED), (2, "Run", CREATED, "yesterday")])
+        conn.executemany("INSERT INTO bonus_codes (code, value, created_at, expiry_date) VALUES (?, 1.0, ?, ?)",
+                         [("GOOD", CREATED, "2999-01-01T00:00:00"), ("BLANK", CREATED, ""),
+                          ("BROKEN", "not a date", None)])
+        conn.commit()
+        conn.close()
+
+        conn = storage.connect(os.path.join(self.data_dir, "habit_completions.db"))
+        conn.execute('''
+        CREATE TABLE habit_completions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            habit_id INTEGER NOT NULL,
+            completion_time TIMESTAMP NOT NULL,
+            duration_seconds INTEGER,
+            notes TEXT
+        )
+        ''')
+        conn.execute("INSERT INTO habit_completions (habit_id, completion_time, notes) VALUES (1, ?, 'first')",
+                     (COMPLETED,))
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def rows(self, db_file, sql):
+        conn = storage.connect(db_file)
+        rows = conn.execute(sql).fetchall()
+        conn.close()
+        return rows
+
+    def test_iso_strings_become_epoch_seconds(self):
+        tracker = HabitTracker(data_dir=self.data_dir)
+
+        habit = tracker.get_habit(1)
+        self.assertEqual((habit['created_at'], habit['last_completed']), (epoch(CREATED), epoch(COMPLETED)))
+        self.assertEqual([(row['completion_time'], row['notes']) for row in tracker.get_completions(1)],
+                         [(epoch(COMPLETED), "first")])
+        self.assertEqual(self.rows(tracker.habits_db_file, "SELECT expiry_date FROM bonus_codes WHERE code = 'GOOD'"),
+                         [(epoch("2999-01-01T00:00:00"),)])
+        for db_file in (tracker.habits_db_file, tracker.completions_db_file):
+            self.assertEqual(self.rows(db_file, "PRAGMA user_version"), [(SCHEMA_VERSION,)])
+
+    def test_unparsable_values_dont_stop_the_migration(self):
+        tracker = HabitTracker(data_dir=self.data_dir)
+
+        # Nullable columns lose the bad value, NOT NULL ones keep it
+        self.assertIsNone(tracker.get_habit(2)['last_completed'])
+        self.assertEqual(self.rows(tracker.habits_db_file,
+                                   "SELECT code, created_at, expiry_date FROM bonus_codes ORDER BY code"),
+                         [("BLANK", epoch(CREATED), None), ("BROKEN", "not a date", None),
+                          ("GOOD", epoch(CREATED), epoch("2999-01-01T00:00:00"))])
+        self.assertTrue(tracker.use_bonus_code("GOOD", 1)['success'])
+
+        # The migration ran once; reopening leaves everything as it is
+        HabitTracker(data_dir=self.data_dir)
+        self.assertEqual(self.rows(tracker.habits_db_file, "SELECT created_at FROM bonus_codes WHERE code = 'BROKEN'"),
+                         [("not a date",)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Tests for crediting ad completions only with a verified token.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# Add the parent directory to the Python path to import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import verification
+from main import HabitTracker
+from verification import CompletionTokenSigner, CompletionVerifier, credit_verified_completion
+
+
+class CreditVerifiedCompletionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="habit_test_verification_")
+        self.tracker = HabitTracker(data_dir=self.data_dir)
+        self.habit = self.tracker.add_habit(name="Read", frequency_type="daily", frequency_count=1, duration_seconds=60)
+        self.secret = b"s" * 32
+        self.signer = CompletionTokenSigner(self.secret)
+        self.verifier = CompletionVerifier(self.secret)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def assertRefused(self, verifier, habit_id, token):
+        with self.assertRaises(ValueError):
+            credit_verified_completion(self.tracker, verifier, habit_id, token)
+
+    def test_callbacks_without_a_valid_token_are_refused(self):
+        habit_id = self.habit['id']
+        self.assertRefused(self.verifier, habit_id, None)
+        self.assertRefused(None, habit_id, self.signer.sign(habit_id, 60, 1))
+        self.assertRefused(self.verifier, habit_id, CompletionTokenSigner(b"x" * 32).sign(habit_id, 60, 1))
+        self.assertRefused(self.verifier, habit_id, self.signer.sign(habit_id + 1, 60, 1))
+        self.assertRefused(self.verifier, habit_id, self.signer.sign(habit_id, 60, 1, issued_at=1))
+        self.assertEqual(self.tracker.get_all_completions(), [])
+
+    def test_valid_token_is_credited_once(self):
+        token = self.signer.sign(self.habit['id'], 60, 1)
+        habit = credit_verified_completion(self.tracker, self.verifier, self.habit['id'], token)
+        self.assertEqual(habit['reward_balance'], 0.25)
+        self.assertRefused(self.verifier, self.habit['id'], token)
+        self.assertEqual(len(self.tracker.get_all_completions()), 1)
+
+    def test_load_secret_only_returns_a_provisioned_secret(self):
+        with mock.patch.dict(os.environ, {verification.SECRET_ENV_VAR: ""}):
+            self.assertIsNone(verification.load_secret(self.data_dir))
+            self.assertFalse(os.path.exists(os.path.join(self.data_dir, verification.SECRET_FILE_NAME)))
+
+            server_secret = verification.load_or_create_secret(os.path.join(self.data_dir, verification.SECRET_FILE_NAME))
+            self.assertEqual(verification.load_secret(self.data_dir), server_secret)
+
+        with mock.patch.dict(os.environ, {verification.SECRET_ENV_VAR: self.secret.hex()}):
+            self.assertEqual(verification.load_secret(self.data_dir), self.secret)
+
+
+if __name__ == '__main__':
+    unittest.main()
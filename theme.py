@@ -0,0 +1,115 @@
+"""
+App theme: the color palette as shared Kivy properties.
+
+Every palette color is converted to an RGBA tuple once, at import. The current colors live on
+a single Theme object, and widgets bind to its properties instead of looking up hex strings:
+
+    theme = get_theme()
+    theme.bind_color(button)                                  # button.background_color follows theme.button_color
+    theme.bind_color(label, 'color', 'background_color')
+
+Changing a setting (see settings.py) sets one Theme property, and Kivy pushes the new value to
+every bound widget. Bindings hold the widget weakly, so widgets that go away (popup buttons,
+rebuilt rows) don't keep receiving updates or stay alive because of the theme.
+"""
+import weakref
+
+from kivy.core.window import Window
+from kivy.event import EventDispatcher
+from kivy.properties import ListProperty
+
+from settings import DEFAULT_SETTINGS, get_settings
+
+BUTTON_COLORS = {
+    "blue": "#2196F3",
+    "green": "#088F8F",
+    "pink": "#E91E63",
+}
+BACKGROUND_COLORS = {
+    "white": "#FFFFFF",
+    "gray": "#CCCCCC",
+    "black": "#000000",
+    "dark gray": "#666666",
+}
+
+
+def rgba(hex_color):
+    """'#RRGGBB' or '#RRGGBBAA' as an (r, g, b, a) tuple of floats in 0..1."""
+    value = hex_color.lstrip("#")
+    channels = [int(value[i:i + 2], 16) / 255.0 for i in range(0, len(value), 2)]
+    if len(channels) == 3:
+        channels.append(1.0)
+    return tuple(channels)
+
+
+# Precomputed once; looking a color up never parses hex again
+BUTTON_RGBA = {name: rgba(hex_color) for name, hex_color in BUTTON_COLORS.items()}
+BACKGROUND_RGBA = {name: rgba(hex_color) for name, hex_color in BACKGROUND_COLORS.items()}
+
+
+class _Binding:
+    """Copies a theme property onto one widget property while the widget is alive."""
+
+    def __init__(self, widget, widget_property):
+        self.widget = weakref.ref(widget)
+        self.widget_property = widget_property
+
+    def update(self, theme, value):
+        widget = self.widget()
+        if widget is not None:
+            setattr(widget, self.widget_property, value)
+
+
+class Theme(EventDispatcher):
+    """The current theme colors; bind widgets to these instead of setting colors by hand."""
+
+    button_color = ListProperty(BUTTON_RGBA[DEFAULT_SETTINGS["button_color"]])
+    background_color = ListProperty(BACKGROUND_RGBA[DEFAULT_SETTINGS["background_color"]])
+
+    def apply_settings(self, settings):
+        """Set the theme from a settings mapping ("button_color", "background_color" names)."""
+        self.set_button_color(settings.get("button_color"))
+        self.set_background_color(settings.get("background_color"))
+
+    def set_button_color(self, name):
+        self.button_color = BUTTON_RGBA.get(name, BUTTON_RGBA[DEFAULT_SETTINGS["button_color"]])
+
+    def set_background_color(self, name):
+        self.background_color = BACKGROUND_RGBA.get(name, BACKGROUND_RGBA[DEFAULT_SETTINGS["background_color"]])
+
+    def bind_color(self, widget, widget_property='background_color', theme_property='button_color'):
+        """
+        Set widget_property to the theme color now and whenever the theme changes.
+
+        Returns:
+            widget, so it can wrap a widget constructor call
+        """
+        binding = _Binding(widget, widget_property)
+        # The widget keeps its binding alive; the theme only holds it weakly (bind(), unlike
+        # fbind(), keeps bound methods as weak references)
+        widget.__dict__.setdefault('_theme_bindings', []).append(binding)
+        self.bind(**{theme_property: binding.update})
+        binding.update(self, getattr(self, theme_property))
+        return widget
+
+    def _on_settings_changed(self, settings, changed):
+        if "button_color" in changed:
+            self.set_button_color(changed["button_color"])
+        if "background_color" in changed:
+            self.set_background_color(changed["background_color"])
+
+
+_theme = None
+
+
+def get_theme():
+    """The app-wide Theme, following the shared settings and driving the window background."""
+    global _theme
+    if _theme is None:
+        _theme = Theme()
+        settings = get_settings()
+        _theme.apply_settings(settings)
+        settings.bind(_theme._on_settings_changed)
+        Window.clearcolor = _theme.background_color
+        _theme.fbind('background_color', lambda theme, value: setattr(Window, 'clearcolor', value))
+    return _theme
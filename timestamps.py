@@ -0,0 +1,112 @@
+"""
+Timestamp handling for the habit tracker databases.
+
+All timestamps (created_at, last_completed, completion_time, expiry_date, used_at, ...) are
+stored as integer Unix epoch seconds, which are UTC by definition. Time zones only matter at the
+edges: values coming in are converted with to_epoch, and values shown to the user are converted
+back with to_local.
+
+to_epoch is also the compatibility layer for data written before the switch. It accepts ints,
+datetimes and ISO strings; naive datetimes and ISO strings without an offset are taken to be
+local time, which is how the old code wrote them (datetime.now().isoformat()). HabitTracker runs
+migrate_columns once per database to convert old rows in place.
+"""
+import time
+from datetime import datetime
+
+
+def now():
+    """The current time as epoch seconds."""
+    return int(time.time())
+
+
+def to_epoch(value):
+    """
+    Convert a timestamp to epoch seconds.
+
+    Args:
+        value: int/float epoch seconds, a datetime, an ISO format string or None
+
+    Returns:
+        int: Epoch seconds, or None for None
+
+    Raises:
+        ValueError: If a string isn't a valid ISO timestamp
+    """
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value)
+    if isinstance(value, datetime):
+        # Naive datetimes are local time, aware ones carry their own offset
+        return int(value.timestamp())
+    value = str(value).strip()
+    if value.lstrip("-").isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def to_local(epoch):
+    """Convert epoch seconds to a naive datetime in the local time zone (None for None)."""
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(to_epoch(epoch))
+
+
+def local_date(epoch):
+    """The local calendar date of epoch seconds as 'YYYY-MM-DD'."""
+    return to_local(epoch).strftime("%Y-%m-%d")
+
+
+def format_local(epoch, fmt="%Y-%m-%d %H:%M:%S"):
+    """Format epoch seconds in the local time zone for display."""
+    if epoch is None:
+        return ""
+    return to_local(epoch).strftime(fmt)
+
+
+def migrate_columns(conn, columns, version):
+    """
+    Convert ISO string timestamps to epoch seconds in place, once per database file.
+
+    The database's PRAGMA user_version records that the migration ran. Rows that already hold
+    integers are left alone, so an interrupted migration can simply run again. Values that aren't
+    timestamps at all (e.g. an empty expiry_date) are logged and set to NULL, or left as they are
+    in NOT NULL columns, so one bad row can't keep the app from starting.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database (the caller commits)
+        columns (dict): table name -> list of timestamp columns
+        version (int): user_version to set once the columns are converted
+
+    Returns:
+        bool: Whether anything had to be migrated
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+        return False
+
+    unparsable = []
+
+    def migrate_value(table, column, rowid, value, fallback):
+        try:
+            return to_epoch(value)
+        except (ValueError, OverflowError, OSError):
+            unparsable.append((table, column, rowid, value, "kept" if fallback is not None else "set to NULL"))
+            return fallback
+
+    conn.create_function("migrate_timestamp", 5, migrate_value)
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table, table_columns in columns.items():
+        if table not in existing:
+            continue
+        not_null = {row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[3]}
+        for column in table_columns:
+            fallback = column if column in not_null else "NULL"
+            conn.execute(f"""
+            UPDATE {table} SET {column} = migrate_timestamp('{table}', '{column}', rowid, {column}, {fallback})
+            WHERE typeof({column}) = 'text'
+            """)
+    for table, column, rowid, value, outcome in unparsable:
+        print(f"Timestamp migration: {table}.{column} of row {rowid} isn't a timestamp ({value!r}); {outcome}")
+    conn.execute(f"PRAGMA user_version = {int(version)}")
+    return True
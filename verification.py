@@ -0,0 +1,335 @@
+"""
+Verification of ad-completion callbacks.
+
+The ad page hands back a signed completion token when the user finishes watching. The token is
+HMAC-SHA256 signed with a secret shared between the server and the app, and carries the habit ID,
+the watched duration, the streak it was issued for, when it was issued and a random nonce:
+
+    <base64url(habit_id:duration_seconds:streak:issued_at:nonce)>.<base64url(signature)>
+
+CompletionVerifier checks the signature in constant time, rejects expired tokens and, through a
+ReplayStore, rejects tokens that were already used. Callbacks queued while offline can be checked
+together with verify_batch, which records all used nonces in a single transaction. The app only
+credits an ad completion through credit_verified_completion, which refuses callbacks without a
+valid token for that habit.
+
+Provisioning the secret: tokens are minted by the ad server, so the app has to hold the server's
+secret. Create it once on the server with load_or_create_secret(path) and install the same file as
+verification_secret.key in each app's data directory, or set HABIT_TRACKER_VERIFICATION_SECRET to
+its hex. load_secret never makes one up (a secret only the device knows can't verify anything), so
+without a provisioned secret every ad callback is refused. Anyone who can read the secret can mint
+tokens: it stops forged and replayed callbacks, not a user who extracts the key from the device.
+
+Run benchmarks/bench_verification.py to measure verifications per second.
+"""
+import base64
+import binascii
+import hashlib
+import heapq
+import hmac
+import os
+import secrets
+import time
+
+import storage
+
+SECRET_ENV_VAR = "HABIT_TRACKER_VERIFICATION_SECRET"
+SECRET_FILE_NAME = "verification_secret.key"
+
+
+def load_or_create_secret(path):
+    """
+    Load the shared signing secret from a file, creating a random one if it doesn't exist.
+
+    Meant for the ad server, which owns the secret; apps use load_secret.
+
+    Args:
+        path (str): Location of the secret file
+
+    Returns:
+        bytes: The secret
+    """
+    try:
+        with open(path, "r") as file:
+            return bytes.fromhex(file.read().strip())
+    except FileNotFoundError:
+        secret = secrets.token_bytes(32)
+        # Readable by the current user only
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as file:
+            file.write(secret.hex())
+        return secret
+
+
+def load_secret(data_dir):
+    """
+    The signing secret provisioned to this app: HABIT_TRACKER_VERIFICATION_SECRET (hex), else the
+    verification_secret.key file in data_dir.
+
+    Returns:
+        bytes: The secret, or None when none was provisioned
+    """
+    value = os.environ.get(SECRET_ENV_VAR)
+    if value:
+        return bytes.fromhex(value.strip())
+    try:
+        with open(os.path.join(data_dir, SECRET_FILE_NAME), "r") as file:
+            return bytes.fromhex(file.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def credit_verified_completion(habit_tracker, verifier, habit_id, token):
+    """
+    Record an ad completion, but only with a valid, unused token issued for that habit.
+
+    Args:
+        habit_tracker (HabitTracker): Tracker the completion is recorded in
+        verifier (CompletionVerifier): None when no secret was provisioned, which refuses everything
+        habit_id (int): The habit the callback is for
+        token (str): The signed token handed back by the ad page (None if it sent none)
+
+    Returns:
+        dict: The updated habit
+
+    Raises:
+        ValueError: If there is no verifier or token, or the token is invalid, used or for another habit
+    """
+    if verifier is None:
+        raise ValueError("Ad verification isn't set up on this device (no verification secret).")
+    if not token:
+        raise ValueError("The ad page didn't confirm the completion.")
+    claims = verifier.verify(token)
+    if claims['habit_id'] != habit_id:
+        raise ValueError("Verification token is for a different habit.")
+    return habit_tracker.record_completion(habit_id)
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class CompletionTokenSigner:
+    """Issue signed completion tokens (normally done server-side; useful for tests and benchmarks)."""
+
+    def __init__(self, secret):
+        self.secret = secret
+
+    def sign(self, habit_id, duration_seconds, streak, issued_at=None, nonce=None):
+        """
+        Create a signed completion token.
+
+        Args:
+            habit_id (int): The habit that was completed
+            duration_seconds (int): How long the ad/habit ran
+            streak (int): The streak the token was issued for
+            issued_at (int, optional): Unix time of issue, defaults to now
+            nonce (str, optional): Unique token ID, defaults to a random one
+
+        Returns:
+            str: The token
+        """
+        if issued_at is None:
+            issued_at = int(time.time())
+        if nonce is None:
+            nonce = secrets.token_urlsafe(12)
+        payload = _b64encode(f"{habit_id}:{duration_seconds}:{streak}:{issued_at}:{nonce}".encode("ascii"))
+        signature = hmac.new(self.secret, payload.encode("ascii"), hashlib.sha256).digest()
+        return f"{payload}.{_b64encode(signature)}"
+
+
+class ReplayStore:
+    """
+    Remembers used token nonces until they expire.
+
+    Lookups are answered from memory. Expiry is tracked with a min-heap, so pruning only touches
+    expired entries. When db_file is given, nonces are also persisted to a `used_tokens` table
+    (indexed on expires_at) so a restart can't be used to replay a token.
+
+    Args:
+        db_file (str, optional): SQLite database to persist used nonces in
+    """
+
+    def __init__(self, db_file=None):
+        self.db_file = db_file
+        self._expiry = {}
+        self._heap = []
+
+        if db_file:
+            conn = storage.connect(db_file)
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS used_tokens (
+                nonce TEXT PRIMARY KEY,
+                expires_at INTEGER NOT NULL
+            )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_used_tokens_expires_at ON used_tokens (expires_at)")
+            conn.commit()
+            now = int(time.time())
+            for nonce, expires_at in conn.execute("SELECT nonce, expires_at FROM used_tokens WHERE expires_at > ?", (now,)):
+                self._remember(nonce, expires_at)
+            conn.close()
+
+    def __contains__(self, nonce):
+        return nonce in self._expiry
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def add_many(self, entries):
+        """
+        Record used nonces.
+
+        Args:
+            entries (list): (nonce, expires_at) tuples
+        """
+        if not entries:
+            return
+        for nonce, expires_at in entries:
+            self._remember(nonce, expires_at)
+
+        if self.db_file:
+            conn = storage.connect(self.db_file)
+            try:
+                conn.executemany("INSERT OR IGNORE INTO used_tokens (nonce, expires_at) VALUES (?, ?)", entries)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def prune(self, now=None):
+        """
+        Forget nonces whose tokens have expired (they would be rejected as expired anyway).
+
+        Returns:
+            int: Number of nonces removed from memory
+        """
+        if now is None:
+            now = int(time.time())
+        removed = 0
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, nonce = heapq.heappop(self._heap)
+            if self._expiry.get(nonce) == expires_at:
+                del self._expiry[nonce]
+                removed += 1
+
+        if self.db_file and removed:
+            conn = storage.connect(self.db_file)
+            try:
+                conn.execute("DELETE FROM used_tokens WHERE expires_at <= ?", (now,))
+                conn.commit()
+            finally:
+                conn.close()
+        return removed
+
+    def _remember(self, nonce, expires_at):
+        self._expiry[nonce] = expires_at
+        heapq.heappush(self._heap, (expires_at, nonce))
+
+
+class CompletionVerifier:
+    """
+    Verify signed completion tokens.
+
+    Args:
+        secret (bytes): Shared signing secret
+        replay_store (ReplayStore, optional): Where used nonces are kept (in-memory if omitted)
+        max_age (int): Seconds a token stays valid after being issued (expired at exactly max_age)
+        clock_skew (int): Seconds a token's issue time may lie in the future
+    """
+
+    def __init__(self, secret, replay_store=None, max_age=900, clock_skew=60):
+        self.secret = secret
+        self.replay_store = replay_store if replay_store is not None else ReplayStore()
+        self.max_age = max_age
+        self.clock_skew = clock_skew
+        self._next_prune = 0
+
+    def verify(self, token, now=None):
+        """
+        Verify a single token and mark it as used.
+
+        Returns:
+            dict: The token's claims ('habit_id', 'duration_seconds', 'streak', 'issued_at', 'nonce')
+
+        Raises:
+            ValueError: If the token is malformed, forged, expired or already used
+        """
+        result = self.verify_batch([token], now)[0]
+        if not result['success']:
+            raise ValueError(result['message'])
+        return result['claims']
+
+    def verify_batch(self, tokens, now=None):
+        """
+        Verify many tokens, marking the valid ones as used in one write.
+
+        Args:
+            tokens (list): Tokens to check
+            now (int, optional): Current Unix time (defaults to the clock)
+
+        Returns:
+            list: One {'success': True, 'claims': {...}} or {'success': False, 'message': ...} per token
+        """
+        if now is None:
+            now = int(time.time())
+        if now >= self._next_prune:
+            self.replay_store.prune(now)
+            self._next_prune = now + 60
+
+        results = []
+        used = []
+        seen = set()
+
+        for token in tokens:
+            try:
+                claims = self._check(token, now)
+                nonce = claims['nonce']
+                if nonce in seen or nonce in self.replay_store:
+                    raise ValueError("Verification token has already been used.")
+            except ValueError as e:
+                results.append({'success': False, 'message': str(e)})
+                continue
+
+            seen.add(nonce)
+            used.append((nonce, claims['issued_at'] + self.max_age))
+            results.append({'success': True, 'claims': claims})
+
+        self.replay_store.add_many(used)
+        return results
+
+    def _check(self, token, now):
+        """Check signature and freshness, returning the claims."""
+        payload, separator, signature = token.partition(".")
+        if not separator:
+            raise ValueError("Malformed verification token.")
+
+        try:
+            expected = hmac.new(self.secret, payload.encode("ascii"), hashlib.sha256).digest()
+            provided = _b64decode(signature)
+        except (binascii.Error, ValueError):
+            raise ValueError("Malformed verification token.")
+
+        if not hmac.compare_digest(expected, provided):
+            raise ValueError("Invalid verification token signature.")
+
+        # The signature is valid, so the payload was produced by CompletionTokenSigner
+        habit_id, duration_seconds, streak, issued_at, nonce = _b64decode(payload).decode("ascii").split(":")
+        issued_at = int(issued_at)
+
+        # Expired from issued_at + max_age on, the moment ReplayStore.prune forgets the nonce
+        if now - issued_at >= self.max_age:
+            raise ValueError("Verification token has expired.")
+        if issued_at - now > self.clock_skew:
+            raise ValueError("Verification token was issued in the future.")
+
+        return {
+            'habit_id': int(habit_id),
+            'duration_seconds': int(duration_seconds),
+            'streak': int(streak),
+            'issued_at': issued_at,
+            'nonce': nonce
+        }